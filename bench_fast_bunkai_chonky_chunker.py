@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fast_bunkai_chonky_chunker のベンチマーク。
+
+startup（毎回新しいプロセスで計測し、import キャッシュの影響を受けないようにする）:
+    - import:       モジュール import の時間と、その時点で torch / transformers / fast_bunkai が読み込まれていないか
+    - model_free:   load_model=False での構築 + 最初の split_sentences（FastBunkai のロード込み）
+    - first_chunk:  モデル込みの構築時間と最初の chunk() のレイテンシ
+
+throughput（1 プロセスでモデルを 1 回ロードして計測）:
+    - 合成コーパス（日本語 / 英語）と実コーパス（reports / gemma4_reports の Markdown、VTT 字幕）を
+      1KB〜1MB に切りそろえて、tokens/sec・windows/sec・ピーク RSS・モデルロード時間・
+      段階別の所要時間（normalize / split / tokenize / inference / alignment / assembly）を出す
+    - --save-baseline でチャンク境界を保存し、--baseline で現在の境界と比べる
+      （高速化の変更でチャンクが黙って変わっていないかの確認用）
+
+calibrate（ホストごとに 1 回）:
+    - スレッド数・バッチサイズ・inference_mode・bf16 の候補を測り、最速の設定を
+      InferenceProfile として保存する。以後このホストで作るチャンカーは自動でそれを使う
+
+使い方:
+    uv run bench_fast_bunkai_chonky_chunker.py --mode startup --repeat 3
+    uv run bench_fast_bunkai_chonky_chunker.py --max-import-sec 0.5   # 超えたら終了コード 1
+    uv run bench_fast_bunkai_chonky_chunker.py --mode throughput --sizes 1k,100k --save-baseline bench_baseline.json
+    uv run bench_fast_bunkai_chonky_chunker.py --mode throughput --sizes 1k,100k --baseline bench_baseline.json
+    uv run bench_fast_bunkai_chonky_chunker.py --mode calibrate --backend torch
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent
+
+DEFAULT_MODEL_NAME = "mirth/chonky_mmbert_small_multilingual_1"
+
+SAMPLE_TEXT = (
+    "教室や職場の人間関係について考えている時、「見た目がいい人の方が発言権が強いのではないか」"
+    "と感じたことがあるかもしれません。韓国の研究では、自分の容姿に自信を持っている従業員は"
+    "職場で積極的に発言し、アイデアを共有する可能性が高いという研究結果が示されました。\n\n"
+    "Employees who feel attractive are more likely to share ideas at work. "
+    "The researchers surveyed 153 full-time employees in South Korea."
+)
+
+HEAVY_MODULES = ("torch", "transformers", "fast_bunkai")
+
+# throughput 計測のコーパスサイズ（UTF-8 バイト数）
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+CORPORA = ("synthetic_ja", "synthetic_en", "real_ja_reports", "real_ja_transcript")
+
+STAGES = ("normalize", "split", "tokenize", "inference", "alignment", "assembly")
+
+_JA_SENTENCES = [
+    "教室や職場の人間関係について考えている時、見た目がいい人の方が発言権が強いのではないかと感じたことがあるかもしれません。",
+    "韓国の研究では、自分の容姿に自信を持っている従業員は職場で積極的に発言する可能性が高いという結果が示されました。",
+    "研究チームは、韓国の正社員153人を対象にアンケート調査を行いました。",
+    "被験者は製造業・小売業・情報技術といったさまざまな分野で働いていました。",
+    "今日は春夏に使える大人のスタイリングについてお話しします。",
+    "色選びの正解は、肌の色や髪の色との相性から考えるのが近道です。",
+    "新しいモデルは推論速度が従来の約三倍になったと発表されました。",
+    "東京では午後から雨が降り、夜には気温が大きく下がる見込みです。",
+    "エンジニアはキャッシュを導入して、同じ記事の再処理を省けるようにしました。",
+    "一方で、外見の媒介性を重視していない従業員には同じ傾向は見られませんでした。",
+]
+
+_EN_SENTENCES = [
+    "Employees who feel attractive are more likely to share ideas at work.",
+    "The researchers surveyed 153 full-time employees across several industries.",
+    "Participants completed two surveys that were administered one week apart.",
+    "The new release cuts inference latency by roughly a factor of three.",
+    "Heavy rain is expected in the afternoon, with temperatures dropping overnight.",
+    "The team added a cache so that unchanged articles are not processed again.",
+    "However, the effect only held for people who believed appearance brings influence.",
+    "Trending repositories this week focus on agents, retrieval and evaluation tooling.",
+    "Caption files repeat each line several times as rolling cues.",
+    "A stable baseline makes it easy to notice when chunk boundaries drift.",
+]
+
+_IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import fast_bunkai_chonky_chunker
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    "import_sec": elapsed,
+    "heavy_modules_loaded": [m for m in %(heavy)r if m in sys.modules],
+}))
+"""
+
+_MODEL_FREE_PROBE = """
+import json, time
+t0 = time.perf_counter()
+from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker
+chunker = FastBunkaiChonkyChunker(load_model=False)
+init_sec = time.perf_counter() - t0
+t1 = time.perf_counter()
+sentences = chunker.split_sentences(chunker.normalize_newlines(%(text)r))
+first_call_sec = time.perf_counter() - t1
+print(json.dumps({"init_sec": init_sec, "first_call_sec": first_call_sec, "num_sentences": len(sentences)}))
+"""
+
+_FIRST_CHUNK_PROBE = """
+import json, time
+t0 = time.perf_counter()
+from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker
+chunker = FastBunkaiChonkyChunker(model_name=%(model_name)r)
+init_sec = time.perf_counter() - t0
+t1 = time.perf_counter()
+chunks = chunker.chunk(%(text)r)
+first_call_sec = time.perf_counter() - t1
+t2 = time.perf_counter()
+chunker.chunk(%(text)r)
+warm_call_sec = time.perf_counter() - t2
+print(json.dumps({
+    "init_sec": init_sec,
+    "first_call_sec": first_call_sec,
+    "warm_call_sec": warm_call_sec,
+    "num_chunks": len(chunks),
+}))
+"""
+
+
+def _run_probe(code: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"probe failed (exit {proc.returncode}):\n{proc.stderr.strip()}")
+    # transformers 等が stdout に何か出しても最後の行だけ読む
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _median_of(runs: List[dict]) -> Dict[str, object]:
+    out: Dict[str, object] = {}
+    for key, value in runs[0].items():
+        if isinstance(value, float):
+            out[key] = statistics.median(r[key] for r in runs)
+        else:
+            out[key] = value
+    return out
+
+
+def run_startup_benchmark(
+    model_name: str = DEFAULT_MODEL_NAME,
+    repeat: int = 3,
+    include_model: bool = True,
+) -> Dict[str, dict]:
+    """起動系の計測結果（各項目は repeat 回の中央値）を返す。"""
+    probes = {
+        "import": _IMPORT_PROBE % {"heavy": HEAVY_MODULES},
+        "model_free": _MODEL_FREE_PROBE % {"text": SAMPLE_TEXT},
+    }
+    if include_model:
+        probes["first_chunk"] = _FIRST_CHUNK_PROBE % {"text": SAMPLE_TEXT, "model_name": model_name}
+
+    results: Dict[str, dict] = {}
+    for name, code in probes.items():
+        results[name] = _median_of([_run_probe(code) for _ in range(repeat)])
+    return results
+
+
+def synthetic_text(lang: str, size_bytes: int, seed: int = 0) -> str:
+    """例文をシャッフルして段落にまとめ、UTF-8 で size_bytes 程度のテキストを作る（seed 固定で再現可能）。"""
+    rng = random.Random(seed)
+    sentences = _JA_SENTENCES if lang == "ja" else _EN_SENTENCES
+    joiner = "" if lang == "ja" else " "
+    paragraphs: List[str] = []
+    total = 0
+    while total < size_bytes:
+        paragraph = joiner.join(rng.choice(sentences) for _ in range(rng.randint(2, 6)))
+        paragraphs.append(paragraph)
+        total += len(paragraph.encode("utf-8")) + 2
+    return _truncate_bytes("\n\n".join(paragraphs), size_bytes)
+
+
+def _truncate_bytes(text: str, size_bytes: int) -> str:
+    return text.encode("utf-8")[:size_bytes].decode("utf-8", errors="ignore")
+
+
+def real_text(name: str) -> str:
+    """リポジトリ内の実データを連結したテキスト。"""
+    if name == "real_ja_reports":
+        paths = sorted(ROOT.glob("reports/*/report_*.md")) + sorted(ROOT.glob("gemma4_reports/*.md"))
+        return "\n\n".join(p.read_text(encoding="utf-8", errors="replace") for p in paths)
+    if name == "real_ja_transcript":
+        # WebVTT のヘッダ・タイムスタンプ・重複した cue は除き、チャンカーに渡すのと同じ本文にする
+        from fast_bunkai_chonky_vtt import load_transcript
+
+        return load_transcript(ROOT / "temp_transcript.ja.vtt").text
+    raise ValueError(f"unknown corpus: {name}")
+
+
+def build_corpora(sizes: List[str], corpora: List[str]) -> Dict[str, str]:
+    """{"synthetic_ja/10k": text, ...}。実データが指定サイズに足りない場合はその組み合わせを省く。"""
+    out: Dict[str, str] = {}
+    for corpus in corpora:
+        full = None if corpus.startswith("synthetic_") else real_text(corpus)
+        for size in sizes:
+            size_bytes = SIZES[size]
+            if full is None:
+                out[f"{corpus}/{size}"] = synthetic_text(corpus.split("_", 1)[1], size_bytes)
+            elif len(full.encode("utf-8")) >= size_bytes:
+                out[f"{corpus}/{size}"] = _truncate_bytes(full, size_bytes)
+    return out
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KiB、macOS は byte 単位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_throughput_benchmark(
+    corpora: Dict[str, str],
+    model_name: str = DEFAULT_MODEL_NAME,
+    repeat: int = 1,
+    **chunker_kwargs,
+) -> Dict[str, object]:
+    """モデルを 1 回ロードし、コーパスごとのスループット・段階別時間・チャンク境界を返す。"""
+    from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker
+
+    started = time.perf_counter()
+    chunker = FastBunkaiChonkyChunker(model_name=model_name, **chunker_kwargs)
+    model_load_sec = time.perf_counter() - started
+    chunker.chunk(SAMPLE_TEXT)  # ウォームアップ（初回の FastBunkai ロード等を計測から外す）
+
+    results: Dict[str, dict] = {}
+    for name, text in corpora.items():
+        timings: Dict[str, float] = {}
+        chunker.stage_timings = timings
+        started = time.perf_counter()
+        for _ in range(repeat):
+            doc = chunker.score_many([text])[0]
+            chunks = chunker.chunk(doc)
+        elapsed = (time.perf_counter() - started) / repeat
+        chunker.stage_timings = None
+
+        stats = chunker.last_batch_stats
+        results[name] = {
+            "bytes": len(text.encode("utf-8")),
+            "tokens": stats.num_tokens,
+            "windows": stats.num_windows,
+            "chunks": len(chunks),
+            "elapsed_sec": elapsed,
+            "tokens_per_sec": stats.num_tokens / elapsed if elapsed > 0 else 0.0,
+            "windows_per_sec": stats.num_windows / elapsed if elapsed > 0 else 0.0,
+            "stages_sec": {stage: timings.get(stage, 0.0) / repeat for stage in STAGES},
+            "peak_rss_mb": _peak_rss_mb(),
+            "boundaries": [[start, end] for start, end, _ in chunker.chunk_spans(doc)],
+        }
+
+    return {
+        "model_name": model_name,
+        "settings": dict(chunker_kwargs),
+        "model_load_sec": model_load_sec,
+        "corpora": results,
+    }
+
+
+def compare_boundaries(current: Dict[str, object], baseline: Dict[str, object]) -> Dict[str, dict]:
+    """
+    コーパスごとにチャンク境界（チャンク終端の offset）を基準と比べ、
+    exact（完全一致）と precision / recall / f1 を返す。基準に無いコーパスは省く。
+    """
+    out: Dict[str, dict] = {}
+    for name, result in current["corpora"].items():
+        base = baseline.get("corpora", {}).get(name)
+        if base is None:
+            continue
+        ours = {end for _, end in result["boundaries"]}
+        theirs = {end for _, end in base["boundaries"]}
+        hits = len(ours & theirs)
+        precision = hits / len(ours) if ours else 1.0
+        recall = hits / len(theirs) if theirs else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        out[name] = {
+            "exact": result["boundaries"] == base["boundaries"],
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+        }
+    return out
+
+
+def _print_throughput(results: Dict[str, object]) -> None:
+    print(f"[model_load] {results['model_load_sec']:.3f}s ({results['model_name']})")
+    for name, r in results["corpora"].items():
+        rss = f"{r['peak_rss_mb']:.0f}MB" if r["peak_rss_mb"] is not None else "n/a"
+        stages = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in r["stages_sec"].items())
+        print(
+            f"[{name}] {r['bytes']}B {r['tokens']} tokens {r['windows']} windows {r['chunks']} chunks "
+            f"{r['elapsed_sec'] * 1000:.1f}ms {r['tokens_per_sec']:.0f} tok/s "
+            f"{r['windows_per_sec']:.1f} win/s peak_rss={rss}"
+        )
+        print(f"    {stages}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="fast_bunkai_chonky_chunker の起動コストとスループットを計測する"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("startup", "throughput", "all", "calibrate"),
+        default="all",
+        help=(
+            "startup: import / 初回呼び出し、throughput: コーパス別スループット（既定: all）、"
+            "calibrate: 推論設定を測ってプロファイルを保存"
+        ),
+    )
+    parser.add_argument("--model-name", default=DEFAULT_MODEL_NAME, help="Chonky モデル名またはローカルパス")
+    parser.add_argument("--repeat", type=int, default=3, help="各計測の繰り返し回数（中央値を採用）")
+    parser.add_argument("--skip-model", action="store_true", help="startup でモデルのロードを伴う計測を省く")
+    parser.add_argument(
+        "--sizes",
+        default="1k,10k,100k",
+        help=f"throughput のコーパスサイズ（カンマ区切り、{'/'.join(SIZES)}）",
+    )
+    parser.add_argument(
+        "--corpora",
+        default=",".join(CORPORA),
+        help=f"throughput のコーパス（カンマ区切り、{'/'.join(CORPORA)}）",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="1 回の forward に載せるウィンドウ数（既定: 推論プロファイルの値、無ければ 8）",
+    )
+    parser.add_argument(
+        "--no-profile",
+        action="store_true",
+        help="throughput で保存済みの推論プロファイルを使わない（fp32・no_grad・既定スレッド数）",
+    )
+    parser.add_argument("--backend", default="torch", help="torch / onnx / torch-int8")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="チャンク境界を基準として保存する JSON")
+    parser.add_argument("--baseline", type=Path, default=None, help="比較する基準 JSON（--save-baseline で作成）")
+    parser.add_argument(
+        "--min-boundary-f1",
+        type=float,
+        default=1.0,
+        help="--baseline との境界 F1 の下限。下回るコーパスがあれば終了コード 1",
+    )
+    parser.add_argument(
+        "--max-import-sec",
+        type=float,
+        default=None,
+        help="import 時間の上限。超えた場合や重い依存が import 時に読み込まれた場合は終了コード 1",
+    )
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力する")
+    return parser.parse_args()
+
+
+def _run_startup(args: argparse.Namespace, results: Dict[str, object]) -> bool:
+    startup = run_startup_benchmark(
+        model_name=args.model_name,
+        repeat=args.repeat,
+        include_model=not args.skip_model,
+    )
+    results["startup"] = startup
+    if not args.json:
+        for name, values in startup.items():
+            items = ", ".join(
+                f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in values.items()
+            )
+            print(f"[{name}] {items}")
+
+    failed = False
+    loaded = startup["import"]["heavy_modules_loaded"]
+    if loaded:
+        print(f"[FAIL] heavy modules loaded at import time: {loaded}", file=sys.stderr)
+        failed = True
+    if args.max_import_sec is not None and startup["import"]["import_sec"] > args.max_import_sec:
+        print(
+            f"[FAIL] import took {startup['import']['import_sec']:.3f}s "
+            f"(limit {args.max_import_sec:.3f}s)",
+            file=sys.stderr,
+        )
+        failed = True
+    return failed
+
+
+def _run_throughput(args: argparse.Namespace, results: Dict[str, object]) -> bool:
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    corpora_names = [c.strip() for c in args.corpora.split(",") if c.strip()]
+    unknown = [s for s in sizes if s not in SIZES] + [c for c in corpora_names if c not in CORPORA]
+    if unknown:
+        raise ValueError(f"unknown --sizes / --corpora: {unknown}")
+
+    throughput = run_throughput_benchmark(
+        build_corpora(sizes, corpora_names),
+        model_name=args.model_name,
+        repeat=args.repeat,
+        batch_size=args.batch_size,
+        backend=args.backend,
+        profile=None if args.no_profile else "auto",
+    )
+    results["throughput"] = throughput
+    if not args.json:
+        _print_throughput(throughput)
+
+    if args.save_baseline is not None:
+        args.save_baseline.write_text(
+            json.dumps(throughput, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"[INFO] baseline saved: {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline is None:
+        return False
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("model_name") != throughput["model_name"]:
+        print(
+            f"[WARNING] baseline model differs: {baseline.get('model_name')} != {throughput['model_name']}",
+            file=sys.stderr,
+        )
+    agreement = compare_boundaries(throughput, baseline)
+    results["boundary_agreement"] = agreement
+
+    failed = False
+    for name, a in agreement.items():
+        if not args.json:
+            print(
+                f"[boundary {name}] exact={a['exact']} precision={a['precision']:.3f} "
+                f"recall={a['recall']:.3f} f1={a['f1']:.3f}"
+            )
+        if a["f1"] < args.min_boundary_f1:
+            print(f"[FAIL] boundary f1 {a['f1']:.3f} < {args.min_boundary_f1} ({name})", file=sys.stderr)
+            failed = True
+    return failed
+
+
+def _run_calibrate(args: argparse.Namespace, results: Dict[str, object]) -> None:
+    from dataclasses import asdict
+
+    from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker
+
+    chunker = FastBunkaiChonkyChunker(model_name=args.model_name, backend=args.backend, profile=None)
+    profile = chunker.calibrate_inference_profile(repeat=args.repeat)
+    results["calibrate"] = asdict(profile)
+    if not args.json:
+        for c in profile.candidates:
+            note = f" (rejected: {c['rejected']})" if "rejected" in c else ""
+            print(
+                f"[candidate] batch_size={c['batch_size']} dtype={c['dtype']} "
+                f"inference_mode={c['inference_mode']} num_threads={c['num_threads']} "
+                f"{c['windows_per_sec']:.1f} win/s{note}"
+            )
+        print(
+            f"[best] batch_size={profile.batch_size} dtype={profile.dtype} "
+            f"inference_mode={profile.inference_mode} num_threads={profile.num_threads} "
+            f"{profile.windows_per_sec:.1f} win/s"
+        )
+    print(f"[INFO] profile saved: {chunker._profile_path()}", file=sys.stderr)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.repeat < 1:
+        raise ValueError("--repeat must be >= 1")
+
+    results: Dict[str, object] = {}
+    failed = False
+    if args.mode == "calibrate":
+        _run_calibrate(args, results)
+    if args.mode in ("startup", "all"):
+        failed |= _run_startup(args, results)
+    if args.mode in ("throughput", "all"):
+        failed |= _run_throughput(args, results)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
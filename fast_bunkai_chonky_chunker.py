@@ -1,12 +1,33 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import bisect
+import copy
+import hashlib
+import json
+import os
+import platform
 import re
-from dataclasses import dataclass
-from typing import List, Tuple, Dict, Optional
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional, Union
 
-import torch
-from fast_bunkai import FastBunkai
-from transformers import AutoModelForTokenClassification, AutoTokenizer
+import numpy as np
+
+# torch / transformers / fast_bunkai は重いので、使う箇所で初めて import する
+# （normalize_newlines だけ使う呼び出し元や load_model=False では読み込まない）
+
+# ONNX グラフ等の派生物を置く既定のキャッシュディレクトリ
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "fast_bunkai_chonky"
+
+# backend="torch" は従来どおり fp32 PyTorch。
+# "torch-int8" は Linear 層を動的量子化した PyTorch（CPU 専用）。
+# "onnx" は ONNX Runtime（CPU）。初回に ONNX グラフを書き出して DEFAULT_CACHE_DIR 以下に保存する。
+BACKENDS = ("torch", "onnx", "torch-int8")
 
 
 @dataclass
@@ -17,6 +38,233 @@ class SentenceSpan:
     separator_score: float = 0.0
 
 
+@dataclass
+class TokenScores:
+    """
+    token ごとの separator 確率を列指向の NumPy 配列で持つ。
+    starts / ends は元テキスト上の char offset（starts 昇順、同一 span は集約済み）。
+    """
+    starts: np.ndarray  # int32
+    ends: np.ndarray  # int32
+    probs: np.ndarray  # float32
+
+    @classmethod
+    def empty(cls) -> "TokenScores":
+        return cls(
+            starts=np.zeros(0, dtype=np.int32),
+            ends=np.zeros(0, dtype=np.int32),
+            probs=np.zeros(0, dtype=np.float32),
+        )
+
+    def __len__(self) -> int:
+        return int(self.starts.shape[0])
+
+
+@dataclass
+class ScoredDocument:
+    """
+    1 文書ぶんの推論結果。
+    正規化後テキスト・文 span・token ごとの separator 確率・文ごとの token 数を保持する。
+    chunk / debug はこれを受け取れるので、閾値や max_chunk_tokens を変えて
+    何度チャンク化してもモデル推論は最初の 1 回だけで済む。
+    """
+    text: str
+    sentences: List[SentenceSpan]
+    token_scores: TokenScores
+    sentence_token_counts: List[int]
+    # text の各文字が入力（正規化前）テキストの何文字目に当たるか。None なら text 自体が入力
+    raw_offsets: Optional[np.ndarray] = None
+
+
+@dataclass
+class BatchStats:
+    """score_many / chunk_many 1 回ぶんのスループット計測結果。"""
+    num_docs: int
+    num_tokens: int
+    num_windows: int
+    elapsed_sec: float
+    num_cache_hits: int = 0
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.num_docs / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.num_tokens / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.num_docs} docs / {self.num_tokens} tokens / {self.num_windows} windows "
+            f"({self.num_cache_hits} cache hits) in {self.elapsed_sec:.2f}s "
+            f"({self.docs_per_sec:.1f} docs/s, {self.tokens_per_sec:.0f} tokens/s)"
+        )
+
+
+class SeparatorScoreCache:
+    """
+    token ごとの separator 確率を SQLite に永続化するキャッシュ。
+
+    キーは (model_name, backend, dtype, max_length, stride, 正規化後テキスト) の SHA-256。
+    backend と dtype も含めるのは、量子化・ONNX・bf16 で確率がわずかに変わるため。
+    値は TokenScores の配列をそのまま bytes で持ち、合計サイズが max_bytes を超えたら
+    最終アクセスが古いものから消す（LRU）。
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS separator_scores (
+                    key TEXT PRIMARY KEY,
+                    starts BLOB NOT NULL,
+                    ends BLOB NOT NULL,
+                    probs BLOB NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_separator_scores_last_access "
+                "ON separator_scores (last_access)"
+            )
+
+    @staticmethod
+    def make_key(model_name: str, backend: str, dtype: str, max_length: int, stride: int, text: str) -> str:
+        h = hashlib.sha256()
+        h.update(f"{model_name}\0{backend}\0{dtype}\0{max_length}\0{stride}\0".encode("utf-8"))
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[TokenScores]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT starts, ends, probs FROM separator_scores WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE separator_scores SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+        starts, ends, probs = row
+        return TokenScores(
+            starts=np.frombuffer(starts, dtype=np.int32).copy(),
+            ends=np.frombuffer(ends, dtype=np.int32).copy(),
+            probs=np.frombuffer(probs, dtype=np.float32).copy(),
+        )
+
+    def put(self, key: str, tokens: TokenScores) -> None:
+        starts = tokens.starts.astype(np.int32).tobytes()
+        ends = tokens.ends.astype(np.int32).tobytes()
+        probs = tokens.probs.astype(np.float32).tobytes()
+        size = len(starts) + len(ends) + len(probs)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO separator_scores "
+                "(key, starts, ends, probs, size_bytes, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, starts, ends, probs, size, time.time()),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM separator_scores"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._conn.execute(
+            "SELECT key, size_bytes FROM separator_scores ORDER BY last_access ASC"
+        ):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM separator_scores WHERE key = ?", victims)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class BackendAgreement:
+    """check_backend_agreement の結果（fp32 torch を基準にした separator 確率と区切りの一致度）。"""
+    num_docs: int
+    max_abs_diff: float
+    mean_abs_diff: float
+    boundary_agreement: float  # 区切り位置が完全一致した文書の割合
+    mismatched_docs: List[int] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatched_docs
+
+
+@dataclass
+class InferenceProfile:
+    """
+    calibrate_inference_profile がこのホストで測った最速の推論設定。
+    cache_dir/profiles/ 以下に JSON で保存され、同じモデル・backend・device のチャンカーを
+    作るときに自動で読み込まれる（batch_size を明示した場合はそちらを優先）。
+    """
+    model_name: str
+    backend: str
+    device: str
+    host: str
+    batch_size: int
+    dtype: str = "float32"  # "float32" / "bfloat16"
+    inference_mode: bool = False  # True なら torch.no_grad の代わりに torch.inference_mode
+    num_threads: Optional[int] = None  # CPU の intra-op スレッド数（None なら既定のまま）
+    windows_per_sec: float = 0.0
+    created_at: str = ""
+    # 計測した全候補（設定と windows/sec）。確認用
+    candidates: List[dict] = field(default_factory=list)
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(asdict(self), ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "InferenceProfile":
+        return cls(**json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def _host_fingerprint() -> str:
+    """プロファイルが別マシンで測ったものでないかを見分けるための識別子（ホーム共有対策）。"""
+    return f"{platform.node()}|{platform.machine()}|{os.cpu_count()}"
+
+
+# calibrate_inference_profile で試すバッチサイズ
+CALIBRATION_BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+
+_CALIBRATION_TEXT = (
+    "教室や職場の人間関係について考えている時、見た目がいい人の方が発言権が強いのではないかと"
+    "感じたことがあるかもしれません。韓国の研究では、自分の容姿に自信を持っている従業員は"
+    "職場で積極的に発言する可能性が高いという結果が示されました。\n\n"
+    "Employees who feel attractive are more likely to share ideas at work. "
+    "The researchers surveyed 153 full-time employees across several industries.\n\n"
+)
+
+
+# normalize_newlines が改行として扱う文字（\r\n は 1 つの改行）
+_LINE_BREAK_RE = re.compile(r"\r\n|\r|\n|\u2028|\u2029")
+
+
+# chunk() の引数で「インスタンス側の設定を使う」を表す番兵（None は max_chunk_tokens 無効の意味で使う）
+_USE_DEFAULT = object()
+
+
 class FastBunkaiChonkyChunker:
     """
     セマンティックチャンキングを行うためのクラス。
@@ -41,7 +289,26 @@ class FastBunkaiChonkyChunker:
         strip_line_trailing_spaces: bool = True,
         merge_soft_linebreaks: bool = False,
         normalize_chunk_output: bool = False,
+        batch_size: Optional[int] = None,
+        sort_windows_by_length: bool = True,
+        backend: str = "torch",
+        cache_dir: Optional[Union[str, Path]] = None,
+        score_cache: Optional[Union[str, Path, SeparatorScoreCache]] = None,
+        load_model: bool = True,
+        profile: Union[str, Path, InferenceProfile, None] = "auto",
     ) -> None:
+        """
+        batch_size: 1 回の forward に載せるウィンドウ数。None ならプロファイルの値（無ければ 8）
+        profile: "auto" なら calibrate_inference_profile で保存したこのホスト用のプロファイルがあれば使う。
+            パス / InferenceProfile を渡すとそれを使い、None なら使わない（fp32・no_grad・既定スレッド数）
+        """
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"batch_size は 1 以上を指定してください: {batch_size}")
+        if backend not in BACKENDS:
+            raise ValueError(f"backend は {BACKENDS} のいずれかを指定してください: {backend!r}")
+        if backend != "torch" and device not in (None, "cpu"):
+            raise ValueError(f"backend={backend!r} は CPU 専用です: device={device!r}")
+
         self.model_name = model_name
         self.threshold = threshold
         self.max_length = max_length
@@ -53,10 +320,45 @@ class FastBunkaiChonkyChunker:
         self.strip_line_trailing_spaces = strip_line_trailing_spaces
         self.merge_soft_linebreaks = merge_soft_linebreaks
         self.normalize_chunk_output = normalize_chunk_output
+        self.batch_size = batch_size or 8
+        self.sort_windows_by_length = sort_windows_by_length
+        self.backend = backend
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else DEFAULT_CACHE_DIR
+        # score_cache にパスを渡すと SeparatorScoreCache（既定の上限サイズ）を開く
+        if score_cache is not None and not isinstance(score_cache, SeparatorScoreCache):
+            score_cache = SeparatorScoreCache(score_cache)
+        self.score_cache: Optional[SeparatorScoreCache] = score_cache
+
+        self._bunkai = None
+        self.tokenizer = None
+        self.model = None
+        self.onnx_session = None
+        self.load_model = load_model
+        # 直近の score_many / chunk_many の計測結果
+        self.last_batch_stats: Optional[BatchStats] = None
+        # dict を入れておくと処理段階ごとの所要秒数を加算していく（ベンチマーク用。None なら計測しない）
+        # 段階: normalize / split / tokenize / inference / alignment / assembly
+        self.stage_timings: Optional[Dict[str, float]] = None
+        # 適用中の推論プロファイル
+        self.profile: Optional[InferenceProfile] = None
+        # 推論に使っているモデルの dtype（プロファイルで bf16 にしたときだけ "bfloat16"。score_cache のキーに含める）
+        self.dtype = "float32"
+        self.use_inference_mode = False
+        # torch で推論している間だけ使う intra-op スレッド数（None ならプロセスの設定のまま）。
+        # torch.set_num_threads はプロセス全体に効くので、作成時には変えず推論のたびに切り替えて戻す
+        self.num_threads: Optional[int] = None
+
+        if not load_model:
+            # 正規化・文分割（と score_cache ヒット時の score）だけ使うモード。torch も読み込まない
+            self.device = device or "cpu"
+            self.separator_label_id = 1
+            return
+
+        self.device = "cpu" if backend != "torch" else (device or self._detect_device())
+        profile = self._resolve_profile(profile)
+
+        from transformers import AutoConfig, AutoModelForTokenClassification, AutoTokenizer
 
-        self.device = device or self._detect_device()
-
-        self.bunkai = FastBunkai()
         self.tokenizer = AutoTokenizer.from_pretrained(
             model_name,
             model_max_length=max_length,
@@ -66,16 +368,326 @@ class FastBunkaiChonkyChunker:
                 "offset_mapping が必要なので fast tokenizer が必要です。"
             )
 
-        self.model = AutoModelForTokenClassification.from_pretrained(model_name)
-        self.model.to(self.device)
-        self.model.eval()
+        if backend == "onnx":
+            self.onnx_session = self._load_onnx_session(
+                num_threads=profile.num_threads if profile is not None else None
+            )
+            config = AutoConfig.from_pretrained(model_name)
+        else:
+            self.model = AutoModelForTokenClassification.from_pretrained(model_name)
+            self.model.eval()
+            if backend == "torch-int8":
+                import torch
+
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            self.model.to(self.device)
+            config = self.model.config
 
         # label2id はモデル側設定を優先。無ければ model card の定義にフォールバック
-        label2id = getattr(self.model.config, "label2id", {}) or {}
+        label2id = getattr(config, "label2id", {}) or {}
         self.separator_label_id = label2id.get("separator", 1)
 
+        if profile is not None:
+            self._apply_profile(profile)
+            if batch_size is None:
+                self.batch_size = profile.batch_size
+
+    def _profile_path(self) -> Path:
+        return self.cache_dir / "profiles" / f"{self._safe_model_name()}__{self.backend}__{self.device}.json"
+
+    def _resolve_profile(
+        self, profile: Union[str, Path, InferenceProfile, None]
+    ) -> Optional[InferenceProfile]:
+        """profile 引数を InferenceProfile にする。"auto" で保存済みのものが無い・合わない場合は None。"""
+        if profile is None or isinstance(profile, InferenceProfile):
+            return profile
+        if profile != "auto":
+            return InferenceProfile.load(profile)
+
+        path = self._profile_path()
+        if not path.exists():
+            return None
+        try:
+            loaded = InferenceProfile.load(path)
+        except (ValueError, TypeError):
+            # 壊れた・古い形式のプロファイルは無視して既定の設定で動かす
+            return None
+        if (loaded.model_name, loaded.backend, loaded.device, loaded.host) != (
+            self.model_name, self.backend, self.device, _host_fingerprint()
+        ):
+            return None
+        return loaded
+
+    def _apply_profile(self, profile: InferenceProfile) -> None:
+        """
+        dtype / inference_mode / スレッド数をモデルに反映する（onnx のスレッド数はセッション作成時に反映済み）。
+        torch のスレッド数は self.num_threads に入れ、推論中だけ使う。
+        """
+        self.profile = profile
+        if self.model is None:
+            return
+        import torch
+
+        self.use_inference_mode = profile.inference_mode
+        self.num_threads = profile.num_threads if self.device == "cpu" else None
+        if profile.dtype == "bfloat16":
+            self.model.to(torch.bfloat16)
+            self.dtype = "bfloat16"
+
+    def _bf16_supported(self) -> bool:
+        if self.backend != "torch" or self.model is None:
+            return False
+        import torch
+
+        if self.device == "cuda":
+            return torch.cuda.is_bf16_supported()
+        if self.device == "cpu":
+            try:
+                return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+            except (AttributeError, RuntimeError):
+                return False
+        return False
+
+    def calibrate_inference_profile(
+        self,
+        *,
+        sample_text: Optional[str] = None,
+        num_windows: int = 8,
+        batch_sizes: Iterable[int] = CALIBRATION_BATCH_SIZES,
+        thread_counts: Optional[Iterable[int]] = None,
+        try_bf16: bool = True,
+        max_prob_diff: float = 0.02,
+        repeat: int = 2,
+        save: bool = True,
+    ) -> InferenceProfile:
+        """
+        このホストで推論設定の候補を測り、最速のものを InferenceProfile として返す（save=True なら保存）。
+        測定後、このチャンカーにも最速の設定を適用する。
+
+        候補は 1 項目ずつ順に絞り込む（全組み合わせだと CPU で時間がかかりすぎるため）:
+            1. intra-op スレッド数（CPU のみ。既定: 1, 2, 4, ... と CPU コア数）
+            2. バッチサイズ
+            3. torch.inference_mode（torch backend のみ）
+            4. bf16（対応 CPU / GPU のみ。fp32 との確率差が max_prob_diff を超えたら採用しない）
+        計測には sample_text（省略時は組み込みの日英テキスト）を num_windows ウィンドウ以上に
+        伸ばしたものを使い、各候補 repeat 回の最速値を windows/sec とする。
+        """
+        if self.tokenizer is None:
+            raise RuntimeError("load_model=False で作成したチャンカーではキャリブレーションできません。")
+
+        text = sample_text or _CALIBRATION_TEXT
+        while len(self._encode(text)["input_ids"]) < num_windows:
+            text = text + text
+        windows = self._encode(text)["input_ids"]
+
+        use_torch = self.model is not None
+        if use_torch:
+            import torch
+
+            default_threads = torch.get_num_threads()
+        else:
+            default_threads = self.onnx_session.get_session_options().intra_op_num_threads or None
+        fp32_model = self.model
+        bf16_model = None
+        candidates: List[dict] = []
+        current_threads = default_threads
+
+        def set_threads(num_threads: Optional[int]) -> None:
+            nonlocal current_threads
+            if self.device != "cpu" or num_threads == current_threads:
+                return
+            if use_torch:
+                self.num_threads = num_threads
+            else:
+                self.onnx_session = self._load_onnx_session(num_threads=num_threads)
+            current_threads = num_threads
+
+        def measure(config: dict) -> Tuple[float, np.ndarray]:
+            set_threads(config["num_threads"])
+            self.use_inference_mode = config["inference_mode"]
+            self.model = bf16_model if config["dtype"] == "bfloat16" else fp32_model
+
+            bs = config["batch_size"]
+            self._predict_windows(windows[:bs], batch_size=bs)  # ウォームアップ
+            best = float("inf")
+            for _ in range(max(repeat, 1)):
+                started = time.perf_counter()
+                probs = self._predict_windows(windows, batch_size=bs)
+                best = min(best, time.perf_counter() - started)
+            windows_per_sec = len(windows) / best if best > 0 else 0.0
+            candidates.append({**config, "windows_per_sec": windows_per_sec})
+            return windows_per_sec, np.concatenate(probs)
+
+        best = {
+            "batch_size": self.batch_size,
+            "dtype": "float32",
+            "inference_mode": False,
+            "num_threads": default_threads if self.device == "cpu" else None,
+        }
+        best_wps, reference = measure(best)
+
+        def try_candidates(key: str, values: Iterable) -> None:
+            nonlocal best, best_wps
+            for value in values:
+                if value == best[key]:
+                    continue
+                config = {**best, key: value}
+                wps, probs = measure(config)
+                if key == "dtype" and float(np.abs(probs - reference).max()) > max_prob_diff:
+                    candidates[-1]["rejected"] = "max_prob_diff"
+                    continue
+                if wps > best_wps:
+                    best, best_wps = config, wps
+
+        if self.device == "cpu":
+            if thread_counts is None:
+                cpu_count = os.cpu_count() or 1
+                thread_counts = sorted({min(1 << i, cpu_count) for i in range(cpu_count.bit_length() + 1)})
+            try_candidates("num_threads", thread_counts)
+        try_candidates("batch_size", batch_sizes)
+        if use_torch:
+            try_candidates("inference_mode", [True])
+            if try_bf16 and self._bf16_supported():
+                bf16_model = copy.deepcopy(fp32_model).to(torch.bfloat16)
+                try_candidates("dtype", ["bfloat16"])
+
+        profile = InferenceProfile(
+            model_name=self.model_name,
+            backend=self.backend,
+            device=self.device,
+            host=_host_fingerprint(),
+            windows_per_sec=best_wps,
+            created_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            candidates=candidates,
+            **best,
+        )
+
+        # 計測で切り替えた状態を戻してから最速の設定を適用する
+        self.model = fp32_model
+        self.dtype = "float32"
+        set_threads(best["num_threads"])
+        self.use_inference_mode = False
+        self.batch_size = profile.batch_size
+        self._apply_profile(profile)
+        if save:
+            profile.save(self._profile_path())
+        return profile
+
+    @contextmanager
+    def _stage(self, name: str):
+        if self.stage_timings is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_timings[name] = (
+                self.stage_timings.get(name, 0.0) + time.perf_counter() - started
+            )
+
+    @property
+    def bunkai(self):
+        """FastBunkai は最初の文分割で初めてロードする。"""
+        if self._bunkai is None:
+            from fast_bunkai import FastBunkai
+
+            self._bunkai = FastBunkai()
+        return self._bunkai
+
+    def _settings(self) -> dict:
+        """同じ設定のチャンカーを作り直すための __init__ 引数（backend / device 以外）。"""
+        return {
+            "model_name": self.model_name,
+            "threshold": self.threshold,
+            "max_length": self.max_length,
+            "stride": self.stride,
+            "min_sentences_per_chunk": self.min_sentences_per_chunk,
+            "max_chunk_tokens": self.max_chunk_tokens,
+            "normalize_input": self.normalize_input,
+            "max_consecutive_blank_lines": self.max_consecutive_blank_lines,
+            "strip_line_trailing_spaces": self.strip_line_trailing_spaces,
+            "merge_soft_linebreaks": self.merge_soft_linebreaks,
+            "normalize_chunk_output": self.normalize_chunk_output,
+            "batch_size": self.batch_size,
+            "sort_windows_by_length": self.sort_windows_by_length,
+            "cache_dir": self.cache_dir,
+            "score_cache": self.score_cache,
+        }
+
+    def _safe_model_name(self) -> str:
+        return re.sub(r"[^0-9A-Za-z_.-]+", "__", self.model_name)
+
+    def _onnx_path(self) -> Path:
+        return self.cache_dir / "onnx" / self._safe_model_name() / "model.onnx"
+
+    def _export_onnx(self, onnx_path: Path) -> None:
+        """
+        token classification モデルを logits だけ返す ONNX グラフとして書き出す。
+        batch / sequence 軸は dynamic にしてウィンドウ長・バッチサイズに依存させない。
+        """
+        import torch
+        from transformers import AutoModelForTokenClassification
+
+        model = AutoModelForTokenClassification.from_pretrained(
+            self.model_name, attn_implementation="eager"
+        )
+        model.eval()
+
+        class _LogitsOnly(torch.nn.Module):
+            def __init__(self, inner):
+                super().__init__()
+                self.inner = inner
+
+            def forward(self, input_ids, attention_mask):
+                return self.inner(input_ids=input_ids, attention_mask=attention_mask).logits
+
+        dummy = self.tokenizer("ダミー入力です。This is a dummy input.", return_tensors="pt")
+        onnx_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = onnx_path.with_name(onnx_path.name + ".tmp")
+        with torch.no_grad():
+            torch.onnx.export(
+                _LogitsOnly(model),
+                (dummy["input_ids"], dummy["attention_mask"]),
+                str(tmp_path),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch", 1: "sequence"},
+                },
+                opset_version=17,
+                dynamo=False,
+            )
+        tmp_path.replace(onnx_path)
+
+    def _load_onnx_session(self, num_threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise RuntimeError(
+                "backend='onnx' には onnxruntime が必要です（pip install onnxruntime）。"
+            ) from exc
+
+        onnx_path = self._onnx_path()
+        if not onnx_path.exists():
+            self._export_onnx(onnx_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        return ort.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+
     @staticmethod
     def _detect_device() -> str:
+        import torch
+
         if torch.cuda.is_available():
             return "cuda"
         if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():
@@ -152,6 +764,110 @@ class FastBunkaiChonkyChunker:
             text = re.sub(r"(?<=[^\n])\n(?=[^\n])", " ", text)
         return text
 
+    @staticmethod
+    def normalize_newlines_with_offsets(
+        text: str,
+        *,
+        max_consecutive_blank_lines: int = 1,
+        strip_line_trailing_spaces: bool = True,
+        merge_soft_linebreaks: bool = False,
+    ) -> Tuple[str, np.ndarray]:
+        """
+        normalize_newlines と同じ結果の文字列と、その各文字が元の text の何文字目かを表す
+        int64 配列（長さ = 正規化後の文字数）を返す。
+        正規化後テキスト上の span [s, e) は元テキストの [offsets[s], offsets[e - 1] + 1) に対応する。
+
+        行単位で「元テキストの連続区間」か「改行 1 文字」のセグメント列を組み立てるので、
+        文字ごとの Python ループは回さない。
+        """
+        if not text:
+            return "", np.zeros(0, dtype=np.int64)
+
+        # 1) 行に分ける: (行頭, 行末, 行末の改行の位置 or None)
+        lines: List[Tuple[int, int, Optional[int]]] = []
+        cursor = 0
+        for m in _LINE_BREAK_RE.finditer(text):
+            lines.append((cursor, m.start(), m.start()))
+            cursor = m.end()
+        lines.append((cursor, len(text), None))
+
+        # 2) 行末空白の除去・空白のみの行を空行に・連続空行の圧縮
+        max_blank = max(0, max_consecutive_blank_lines)
+        kept: List[Tuple[int, int, Optional[int]]] = []
+        blank_streak = 0
+        for start, end, brk in lines:
+            segment = text[start:end]
+            if not segment.strip():
+                blank_streak += 1
+                if blank_streak <= max_blank:
+                    kept.append((start, start, brk))
+                continue
+            blank_streak = 0
+            if strip_line_trailing_spaces:
+                end = start + len(segment.rstrip())
+            kept.append((start, end, brk))
+
+        # 3) 先頭・末尾の空行を落とす
+        first = 0
+        while first < len(kept) and kept[first][0] == kept[first][1]:
+            first += 1
+        last = len(kept)
+        while last > first and kept[last - 1][0] == kept[last - 1][1]:
+            last -= 1
+        kept = kept[first:last]
+        if not kept:
+            return "", np.zeros(0, dtype=np.int64)
+
+        # 4) "\n" で連結。連結用の改行はその行自身の行末改行の位置に対応付ける
+        pieces: List[str] = []
+        seg_raw_starts: List[int] = []
+        seg_lengths: List[int] = []
+        for k, (start, end, brk) in enumerate(kept):
+            if end > start:
+                pieces.append(text[start:end])
+                seg_raw_starts.append(start)
+                seg_lengths.append(end - start)
+            if k < len(kept) - 1:
+                pieces.append("\n")
+                seg_raw_starts.append(brk)
+                seg_lengths.append(1)
+        normalized = "".join(pieces)
+
+        raw_starts = np.asarray(seg_raw_starts, dtype=np.int64)
+        lengths = np.asarray(seg_lengths, dtype=np.int64)
+        norm_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        offsets = np.repeat(raw_starts - norm_starts, lengths) + np.arange(len(normalized), dtype=np.int64)
+
+        # 5) 改行の長い連続を抑える（_collapse_long_newline_runs と同じ規則）。残す改行は先頭側
+        if max_consecutive_blank_lines <= 0:
+            pattern, keep_n = r"\n{2,}", 1
+        else:
+            pattern = rf"\n{{{max_consecutive_blank_lines + 2},}}"
+            keep_n = max_consecutive_blank_lines + 1
+        drops = [(m.start() + keep_n, m.end()) for m in re.finditer(pattern, normalized)]
+        if drops:
+            mask = np.ones(len(normalized), dtype=bool)
+            for drop_start, drop_end in drops:
+                mask[drop_start:drop_end] = False
+            normalized = "".join(ch for ch, keep in zip(normalized, mask.tolist()) if keep)
+            offsets = offsets[mask]
+
+        # 6) 段落区切り以外の単独改行を空白へ（1 文字→1 文字なので offsets はそのまま）
+        if merge_soft_linebreaks:
+            normalized = re.sub(r"(?<=[^\n])\n(?=[^\n])", " ", normalized)
+
+        return normalized, offsets
+
+    def _maybe_normalize_with_offsets(self, text: str) -> Tuple[str, Optional[np.ndarray]]:
+        if not self.normalize_input:
+            return text, None
+        return self.normalize_newlines_with_offsets(
+            text,
+            max_consecutive_blank_lines=self.max_consecutive_blank_lines,
+            strip_line_trailing_spaces=self.strip_line_trailing_spaces,
+            merge_soft_linebreaks=self.merge_soft_linebreaks,
+        )
+
     def _maybe_normalize(self, text: str) -> str:
         if not self.normalize_input:
             return text
@@ -198,12 +914,134 @@ class FastBunkaiChonkyChunker:
 
         return spans
 
-    def _token_separator_scores(self, text: str) -> List[Tuple[int, int, float]]:
+    def _predict_windows(
+        self,
+        windows: List[List[int]],
+        batch_size: Optional[int] = None,
+    ) -> List[np.ndarray]:
         """
-        元テキスト上の各 token span に対して separator 確率を返す。
-        長文は stride 付きでスライディングウィンドウ推論する。
+        overflow ウィンドウ（input_ids の列）をまとめて推論し、
+        ウィンドウごとの token 単位 separator 確率を返す。
+        batch_size 件ずつ右パディングして 1 回の forward に載せる。
+        sort_windows_by_length=True なら長さ順に並べてパディングの無駄を減らす。
+        """
+        batch_size = batch_size or self.batch_size
+        order = list(range(len(windows)))
+        if self.sort_windows_by_length:
+            order.sort(key=lambda i: len(windows[i]), reverse=True)
+
+        pad_id = self.tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = 0
+
+        results: List[np.ndarray] = [np.zeros(0, dtype=np.float32) for _ in windows]
+        for batch_start in range(0, len(order), batch_size):
+            batch = order[batch_start:batch_start + batch_size]
+            seq_len = max(len(windows[i]) for i in batch)
+
+            input_ids = np.full((len(batch), seq_len), pad_id, dtype=np.int64)
+            attention_mask = np.zeros((len(batch), seq_len), dtype=np.int64)
+            for row, i in enumerate(batch):
+                ids = windows[i]
+                input_ids[row, : len(ids)] = ids
+                attention_mask[row, : len(ids)] = 1
+
+            probs = self._forward_probs(input_ids, attention_mask)
+            for row, i in enumerate(batch):
+                results[i] = probs[row, : len(windows[i])]
+
+        return results
+
+    @contextmanager
+    def _torch_threads(self):
+        """self.num_threads があれば、その間だけ torch のスレッド数を切り替えて終わったら戻す。"""
+        import torch
+
+        previous = torch.get_num_threads()
+        if not self.num_threads or self.device != "cpu" or self.num_threads == previous:
+            yield
+            return
+        torch.set_num_threads(self.num_threads)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(previous)
+
+    def _forward_probs(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """[batch, seq_len] の入力に対する separator 確率 [batch, seq_len] を backend ごとに計算する。"""
+        if self.onnx_session is not None:
+            logits = self.onnx_session.run(
+                ["logits"],
+                {"input_ids": input_ids, "attention_mask": attention_mask},
+            )[0].astype(np.float32)
+            logits -= logits.max(axis=-1, keepdims=True)
+            exp = np.exp(logits)
+            return exp[..., self.separator_label_id] / exp.sum(axis=-1)
+
+        import torch
+
+        grad_context = torch.inference_mode() if self.use_inference_mode else torch.no_grad()
+        with self._torch_threads(), grad_context:
+            logits = self.model(
+                input_ids=torch.from_numpy(input_ids).to(self.device),
+                attention_mask=torch.from_numpy(attention_mask).to(self.device),
+            ).logits  # [batch, seq_len, num_labels]
+            probs = torch.softmax(logits.float(), dim=-1)[..., self.separator_label_id]
+            return probs.detach().cpu().numpy()
+
+    @staticmethod
+    def _aggregate_token_scores(
+        offset_mappings: List[List[Tuple[int, int]]],
+        special_tokens_masks: List[List[int]],
+        window_probs: List[np.ndarray],
+    ) -> TokenScores:
         """
-        encoded = self.tokenizer(
+        ウィンドウごとの (offset, special, prob) を 1 本の TokenScores にまとめる。
+        special token と空 span は除外し、overlap で重複した token span は max で集約する。
+        """
+        if not window_probs:
+            return TokenScores.empty()
+
+        offsets = np.concatenate(
+            [np.asarray(o, dtype=np.int64).reshape(-1, 2) for o in offset_mappings]
+        )
+        special = np.concatenate(
+            [np.asarray(m, dtype=bool).reshape(-1) for m in special_tokens_masks]
+        )
+        probs = np.concatenate(
+            [np.asarray(p, dtype=np.float32).reshape(-1) for p in window_probs]
+        )
+
+        starts = offsets[:, 0]
+        ends = offsets[:, 1]
+        keep = ~special & (starts != ends)
+        starts, ends, probs = starts[keep], ends[keep], probs[keep]
+        if starts.size == 0:
+            return TokenScores.empty()
+
+        order = np.lexsort((ends, starts))
+        starts, ends, probs = starts[order], ends[order], probs[order]
+
+        # 同一 (start, end) の連続区間の先頭 index ごとに max を取る
+        is_new = np.empty(starts.size, dtype=bool)
+        is_new[0] = True
+        is_new[1:] = (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1])
+        heads = np.flatnonzero(is_new)
+
+        return TokenScores(
+            starts=starts[heads].astype(np.int32),
+            ends=ends[heads].astype(np.int32),
+            probs=np.maximum.reduceat(probs, heads).astype(np.float32),
+        )
+
+    def _encode(self, text: Union[str, List[str]]):
+        """stride 付き overflow ウィンドウに分けてトークナイズする（offset / special mask 付き）。"""
+        if self.tokenizer is None:
+            raise RuntimeError(
+                "load_model=False で作成したチャンカーでは separator 推論はできません"
+                "（normalize_newlines / split_sentences / score_cache ヒット時の score のみ使えます）。"
+            )
+        return self.tokenizer(
             text,
             truncation=True,
             max_length=self.max_length,
@@ -213,132 +1051,484 @@ class FastBunkaiChonkyChunker:
             return_special_tokens_mask=True,
         )
 
-        # overlap した token span は max で集約
-        span2score: Dict[Tuple[int, int], float] = {}
+    def _token_separator_scores(self, text: str) -> TokenScores:
+        """
+        元テキスト上の各 token span に対して separator 確率を返す。
+        長文は stride 付きでスライディングウィンドウ推論する（ウィンドウはバッチ推論）。
+        """
+        with self._stage("tokenize"):
+            encoded = self._encode(text)
+        with self._stage("inference"):
+            window_probs = self._predict_windows(encoded["input_ids"])
+        with self._stage("alignment"):
+            return self._aggregate_token_scores(
+                encoded["offset_mapping"], encoded["special_tokens_mask"], window_probs
+            )
 
-        with torch.no_grad():
-            num_windows = len(encoded["input_ids"])
-            for i in range(num_windows):
-                input_ids = torch.tensor(
-                    [encoded["input_ids"][i]], dtype=torch.long, device=self.device
-                )
-                attention_mask = torch.tensor(
-                    [encoded["attention_mask"][i]], dtype=torch.long, device=self.device
-                )
+    @staticmethod
+    def _align_sentences(sentences: List[SentenceSpan], tokens: TokenScores) -> List[int]:
+        """
+        各 sentence に、その sentence と重なる token の separator 最大確率を割り当て、
+        max_chunk_tokens 用の概算 token 数（重なる token 数, 最低 1）を返す。
 
-                logits = self.model(
-                    input_ids=input_ids,
-                    attention_mask=attention_mask,
-                ).logits[0]  # [seq_len, num_labels]
+        tokens は starts 昇順なので searchsorted で各文の token 範囲 [lo, hi) を求め、
+        最大値は np.maximum.reduceat でまとめて計算する（文数×token 数のループをしない）。
+        """
+        if not sentences:
+            return []
 
-                probs = torch.softmax(logits, dim=-1)[:, self.separator_label_id]
-                probs = probs.detach().cpu().tolist()
+        n_sent = len(sentences)
+        sent_starts = np.fromiter((s.start for s in sentences), dtype=np.int64, count=n_sent)
+        sent_ends = np.fromiter((s.end for s in sentences), dtype=np.int64, count=n_sent)
+
+        scores = np.zeros(n_sent, dtype=np.float32)
+        counts = np.zeros(n_sent, dtype=np.int64)
+        if len(tokens):
+            # token_end > sent.start となる最初の token（ends の累積 max で単調化して二分探索）
+            reach = np.maximum.accumulate(tokens.ends)
+            lo = np.searchsorted(reach, sent_starts, side="right")
+            # token_start < sent.end を満たす token の終端
+            hi = np.searchsorted(tokens.starts, sent_ends, side="left")
+            hi = np.maximum(hi, lo)
+            counts = hi - lo
+
+            nonempty = np.flatnonzero(counts > 0)
+            if nonempty.size:
+                # hi == len(tokens) も reduceat の index に使えるよう番兵を足す
+                padded = np.append(tokens.probs, np.float32(0.0))
+                idx = np.empty(nonempty.size * 2, dtype=np.int64)
+                idx[0::2] = lo[nonempty]
+                idx[1::2] = hi[nonempty]
+                scores[nonempty] = np.maximum.reduceat(padded, idx)[0::2]
+
+        for sent, score in zip(sentences, scores.tolist()):
+            sent.separator_score = score
+        return np.maximum(counts, 1).tolist()
+
+    def _build_document(
+        self,
+        text: str,
+        sentences: List[SentenceSpan],
+        token_scores: TokenScores,
+    ) -> ScoredDocument:
+        with self._stage("alignment"):
+            sentence_token_counts = self._align_sentences(sentences, token_scores)
+        return ScoredDocument(
+            text=text,
+            sentences=sentences,
+            token_scores=token_scores,
+            sentence_token_counts=sentence_token_counts,
+        )
+
+    def _score_cache_key(self, text: str) -> str:
+        return SeparatorScoreCache.make_key(
+            self.model_name, self.backend, self.dtype, self.max_length, self.stride, text
+        )
 
-                offsets = encoded["offset_mapping"][i]
-                special_mask = encoded["special_tokens_mask"][i]
+    def score(self, text: str, *, keep_offsets: bool = False) -> ScoredDocument:
+        """
+        正規化・文分割・トークナイズ・separator 推論を 1 回だけ行い、結果を ScoredDocument にまとめる。
+        score_cache があればヒット時はトークナイズ・推論を丸ごと省く。
+        keep_offsets=True なら正規化前テキストへの offset 対応（raw_offsets）も保持する（chunk_spans 用）。
+        """
+        raw_offsets = None
+        with self._stage("normalize"):
+            if keep_offsets:
+                text, raw_offsets = self._maybe_normalize_with_offsets(text)
+            else:
+                text = self._maybe_normalize(text)
+        doc = self._score_normalized(text)
+        doc.raw_offsets = raw_offsets
+        return doc
+
+    def _score_normalized(self, text: str) -> ScoredDocument:
+        with self._stage("split"):
+            sentences = self.split_sentences(text)
+        if not sentences:
+            return self._build_document(text, [], TokenScores.empty())
 
-                for (start, end), is_special, prob in zip(offsets, special_mask, probs):
-                    if is_special or start == end:
-                        continue
-                    key = (start, end)
-                    prev = span2score.get(key, 0.0)
-                    if prob > prev:
-                        span2score[key] = float(prob)
+        if self.score_cache is None:
+            return self._build_document(text, sentences, self._token_separator_scores(text))
 
-        return [(s, e, p) for (s, e), p in span2score.items()]
+        key = self._score_cache_key(text)
+        tokens = self.score_cache.get(key)
+        if tokens is None:
+            tokens = self._token_separator_scores(text)
+            self.score_cache.put(key, tokens)
+        return self._build_document(text, sentences, tokens)
 
-    def _attach_sentence_scores(self, text: str, sentences: List[SentenceSpan]) -> List[SentenceSpan]:
+    def score_many(
+        self,
+        texts: Iterable[str],
+        *,
+        batch_size: Optional[int] = None,
+        num_workers: int = 1,
+        keep_offsets: bool = False,
+    ) -> List[ScoredDocument]:
         """
-        各 sentence に対して、
-        その sentence 内にある token の separator 最大確率を割り当てる。
+        複数文書をまとめて score する。結果は score(text) を 1 件ずつ呼んだ場合と同じ。
+
+        1. 全文書を正規化し FastBunkai で文分割（num_workers > 1 ならスレッド並列）
+        2. score_cache にヒットした文書を除き、1 回のバッチトークナイズで overflow ウィンドウに分割
+        3. 文書をまたいで全ウィンドウを長さ順にバケツ化してバッチ推論
+        4. overflow_to_sample_mapping でウィンドウを元の文書へ戻して集約
+        計測結果は self.last_batch_stats に入る。
         """
-        token_scores = self._token_separator_scores(text)
+        started = time.perf_counter()
+        raw_offsets_list: List[Optional[np.ndarray]]
+        with self._stage("normalize"):
+            if keep_offsets:
+                normalized = [self._maybe_normalize_with_offsets(t) for t in texts]
+                texts = [t for t, _ in normalized]
+                raw_offsets_list = [offsets for _, offsets in normalized]
+            else:
+                texts = [self._maybe_normalize(t) for t in texts]
+                raw_offsets_list = [None] * len(texts)
+
+        with self._stage("split"):
+            if num_workers > 1 and len(texts) > 1:
+                self.bunkai  # スレッドから同時に初期化しないよう先にロードしておく
+                with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                    sentences_list = list(executor.map(self.split_sentences, texts))
+            else:
+                sentences_list = [self.split_sentences(t) for t in texts]
+
+        token_scores: List[TokenScores] = [TokenScores.empty() for _ in texts]
+        targets = [i for i, sentences in enumerate(sentences_list) if sentences]
+
+        cache_keys: dict = {}
+        num_cache_hits = 0
+        if self.score_cache is not None:
+            misses = []
+            for i in targets:
+                cache_keys[i] = self._score_cache_key(texts[i])
+                cached = self.score_cache.get(cache_keys[i])
+                if cached is None:
+                    misses.append(i)
+                else:
+                    token_scores[i] = cached
+                    num_cache_hits += 1
+            targets = misses
+
+        num_windows = 0
+        if targets:
+            with self._stage("tokenize"):
+                encoded = self._encode([texts[i] for i in targets])
+            with self._stage("inference"):
+                window_probs = self._predict_windows(encoded["input_ids"], batch_size=batch_size)
+            num_windows = len(window_probs)
+
+            windows_per_doc: List[List[int]] = [[] for _ in targets]
+            for window_idx, sample_idx in enumerate(encoded["overflow_to_sample_mapping"]):
+                windows_per_doc[sample_idx].append(window_idx)
+
+            for sample_idx, doc_idx in enumerate(targets):
+                window_ids = windows_per_doc[sample_idx]
+                with self._stage("alignment"):
+                    token_scores[doc_idx] = self._aggregate_token_scores(
+                        [encoded["offset_mapping"][w] for w in window_ids],
+                        [encoded["special_tokens_mask"][w] for w in window_ids],
+                        [window_probs[w] for w in window_ids],
+                    )
+                if self.score_cache is not None:
+                    self.score_cache.put(cache_keys[doc_idx], token_scores[doc_idx])
+
+        docs = [
+            self._build_document(text, sentences, tokens)
+            for text, sentences, tokens in zip(texts, sentences_list, token_scores)
+        ]
+        for doc, raw_offsets in zip(docs, raw_offsets_list):
+            doc.raw_offsets = raw_offsets
+
+        self.last_batch_stats = BatchStats(
+            num_docs=len(docs),
+            num_tokens=sum(len(t) for t in token_scores),
+            num_windows=num_windows,
+            elapsed_sec=time.perf_counter() - started,
+            num_cache_hits=num_cache_hits,
+        )
+        return docs
 
-        for sent in sentences:
-            sent.separator_score = max(
-                (
-                    score
-                    for tok_start, tok_end, score in token_scores
-                    if tok_start < sent.end and tok_end > sent.start
-                ),
-                default=0.0,
-            )
-        return sentences
+    def _as_scored(self, text: Union[str, ScoredDocument]) -> ScoredDocument:
+        if isinstance(text, ScoredDocument):
+            return text
+        return self.score(text)
 
-    def _sentence_token_counts(self, text: str, sentences: List[SentenceSpan]) -> List[int]:
+    def _chunk_bounds(
+        self,
+        doc: ScoredDocument,
+        threshold: Optional[float] = None,
+        max_chunk_tokens=_USE_DEFAULT,
+        min_sentences_per_chunk: Optional[int] = None,
+        first_sentence: int = 0,
+    ) -> List[Tuple[int, int, float]]:
         """
-        max_chunk_tokens 用の概算 token 数。
+        ScoredDocument を閾値・上限 token 数で区切り、
+        (start, end, 区切り位置の separator_score) を doc.text 上の char 範囲で返す。
+        引数を省略した項目はインスタンス側の設定を使う。
+        first_sentence を渡すとその文を新しいチャンクの先頭として、そこから後ろだけを区切る
+        （IncrementalChunker が確定済みの区切りより後ろだけを計算し直す用）。
         """
-        token_scores = self._token_separator_scores(text)
-        counts = []
-        for sent in sentences:
-            n = sum(
-                1
-                for tok_start, tok_end, _ in token_scores
-                if tok_start < sent.end and tok_end > sent.start
-            )
-            counts.append(max(n, 1))
-        return counts
-
-    def chunk(self, text: str) -> List[str]:
-        text = self._maybe_normalize(text)
-        sentences = self.split_sentences(text)
-        if not sentences:
+        if threshold is None:
+            threshold = self.threshold
+        if max_chunk_tokens is _USE_DEFAULT:
+            max_chunk_tokens = self.max_chunk_tokens
+        if min_sentences_per_chunk is None:
+            min_sentences_per_chunk = self.min_sentences_per_chunk
+
+        sentences = doc.sentences
+        if len(sentences) <= first_sentence:
             return []
 
-        sentences = self._attach_sentence_scores(text, sentences)
-        sentence_token_counts = self._sentence_token_counts(text, sentences)
+        bounds: List[Tuple[int, int, float]] = []
 
-        chunks: List[str] = []
-
-        chunk_start = sentences[0].start
+        chunk_start = sentences[first_sentence].start
         chunk_sent_count = 0
         chunk_token_count = 0
 
-        for i, sent in enumerate(sentences):
+        for i in range(first_sentence, len(sentences)):
+            sent = sentences[i]
             chunk_sent_count += 1
-            chunk_token_count += sentence_token_counts[i]
+            chunk_token_count += doc.sentence_token_counts[i]
 
             is_last = i == len(sentences) - 1
             if is_last:
                 continue
 
             score_based_split = (
-                sent.separator_score >= self.threshold
-                and chunk_sent_count >= self.min_sentences_per_chunk
+                sent.separator_score >= threshold
+                and chunk_sent_count >= min_sentences_per_chunk
             )
 
             size_based_split = False
-            if self.max_chunk_tokens is not None and chunk_token_count >= self.max_chunk_tokens:
+            if max_chunk_tokens is not None and chunk_token_count >= max_chunk_tokens:
                 size_based_split = True
 
             if score_based_split or size_based_split:
-                chunk_text = self._maybe_normalize_chunk(
-                    text[chunk_start:sent.end].strip()
-                )
-                if chunk_text:
-                    chunks.append(chunk_text)
+                bounds.append((chunk_start, sent.end, sent.separator_score))
 
                 chunk_start = sentences[i + 1].start
                 chunk_sent_count = 0
                 chunk_token_count = 0
 
         # tail
-        tail_text = self._maybe_normalize_chunk(
-            text[chunk_start:sentences[-1].end].strip()
+        bounds.append((chunk_start, sentences[-1].end, sentences[-1].separator_score))
+        return bounds
+
+    def chunk(
+        self,
+        text: Union[str, ScoredDocument],
+        *,
+        threshold: Optional[float] = None,
+        max_chunk_tokens=_USE_DEFAULT,
+        min_sentences_per_chunk: Optional[int] = None,
+    ) -> List[str]:
+        """
+        テキスト（または score() 済みの ScoredDocument）をチャンクに分ける。
+        threshold / max_chunk_tokens / min_sentences_per_chunk を渡すとその呼び出しだけ上書きする。
+        ScoredDocument を渡した場合はモデルを再実行しない。
+        """
+        doc = self._as_scored(text)
+        with self._stage("assembly"):
+            bounds = self._chunk_bounds(
+                doc,
+                threshold=threshold,
+                max_chunk_tokens=max_chunk_tokens,
+                min_sentences_per_chunk=min_sentences_per_chunk,
+            )
+            return self._materialize_chunks(doc.text, bounds)
+
+    def chunk_spans(
+        self,
+        text: Union[str, ScoredDocument],
+        *,
+        threshold: Optional[float] = None,
+        max_chunk_tokens=_USE_DEFAULT,
+        min_sentences_per_chunk: Optional[int] = None,
+    ) -> List[Tuple[int, int, float]]:
+        """
+        チャンクを文字列ではなく (start, end, score) のタプルで返す。
+        start / end は正規化前の入力テキスト上の char offset（前後の空白を除いた範囲）、
+        score はそのチャンク末尾の区切りの separator_score。
+        インデクサは text[start:end] の代わりに offset だけを保存でき、文字列はコピーされない。
+        ScoredDocument を渡す場合は score(..., keep_offsets=True) で作ったものなら入力テキスト基準、
+        そうでなければ doc.text 基準の offset になる。
+        """
+        doc = text if isinstance(text, ScoredDocument) else self.score(text, keep_offsets=True)
+        bounds = self._chunk_bounds(
+            doc,
+            threshold=threshold,
+            max_chunk_tokens=max_chunk_tokens,
+            min_sentences_per_chunk=min_sentences_per_chunk,
         )
-        if tail_text:
-            chunks.append(tail_text)
 
+        spans: List[Tuple[int, int, float]] = []
+        for start, end, score in bounds:
+            segment = doc.text[start:end]
+            start += len(segment) - len(segment.lstrip())
+            end -= len(segment) - len(segment.rstrip())
+            if end <= start:
+                continue
+            if doc.raw_offsets is not None:
+                start, end = int(doc.raw_offsets[start]), int(doc.raw_offsets[end - 1]) + 1
+            spans.append((start, end, score))
+        return spans
+
+    def materialize_spans(self, text: str, spans: List[Tuple[int, int, float]]) -> List[str]:
+        """
+        chunk_spans の結果を必要になった時点で文字列にする。
+        入力側の範囲を切り出して正規化するので、chunk() と同じ整形の文字列になる。
+        """
+        return [
+            self._maybe_normalize_chunk(self._maybe_normalize(text[start:end]))
+            for start, end, _ in spans
+        ]
+
+    def _materialize_chunks(self, text: str, bounds: List[Tuple[int, int, float]]) -> List[str]:
+        chunks: List[str] = []
+        for start, end, _ in bounds:
+            chunk_text = self._maybe_normalize_chunk(text[start:end].strip())
+            if chunk_text:
+                chunks.append(chunk_text)
         return chunks
 
-    def debug(self, text: str) -> List[dict]:
+    def iter_chunks(self, stream: Iterable[str]) -> Iterator[str]:
+        """
+        テキスト片の iterable（ファイルの行、伸びていく字幕、ソケットなど）を受け取り、
+        区切りが確定したチャンクから順に yield する。
+
+        バッファが max_length + stride token を超えたら score し、
+        末尾 stride token より前で終わるチャンク（右側の文脈が十分あり区切りが確定したもの）だけを出す。
+        残りは最初の未確定チャンクの先頭から持ち越すので、保持するのはおおむね
+        max_length + stride token ぶんの look-back だけになる。
+        句読点のない字幕などで確定域に文末が 1 つもないまま max(max_length + stride, max_chunk_tokens)
+        token を超えた場合は、確定域を token 境界で切って（max_chunk_tokens があればその長さで）出す。
+        この場合だけ chunk() と違い文の途中で区切られる。
+        ストリーム終端で残りをすべて出す。
+        """
+        budget = self.max_length + self.stride
+        force_at = max(budget, self.max_chunk_tokens or 0)
+        chars_per_token = 1.0  # 初回 score までの保守的な見積もり（score のたびに実測で更新）
+        buffer = ""
+        next_check = budget * chars_per_token
+
+        for piece in stream:
+            if not piece:
+                continue
+            buffer += piece
+            if len(buffer) < next_check:
+                continue
+
+            doc = self.score(buffer)
+            num_tokens = len(doc.token_scores)
+            if num_tokens:
+                chars_per_token = max(len(doc.text) / num_tokens, 0.5)
+            if num_tokens < budget:
+                next_check = len(buffer) + self.stride * chars_per_token
+                continue
+
+            cutoff = int(doc.token_scores.starts[num_tokens - self.stride]) if self.stride else len(doc.text)
+            bounds = self._chunk_bounds(doc)
+            final = [b for b in bounds[:-1] if b[1] <= cutoff]
+            if final:
+                carry_from = bounds[len(final)][0]
+            else:
+                # 予算を超えても区切りが出ない場合は、確定域の最後の文までを 1 チャンクとして出す
+                decided = [s for s in doc.sentences[:-1] if s.end <= cutoff]
+                if decided:
+                    final = [(doc.sentences[0].start, decided[-1].end, decided[-1].separator_score)]
+                    carry_from = doc.sentences[len(decided)].start
+                elif num_tokens < force_at:
+                    next_check = len(buffer) + self.stride * chars_per_token
+                    continue
+                else:
+                    # 文末が来ないまま上限を超えた。バッファと再 score の量を抑えるため確定域を token 境界で切る
+                    cut_token = num_tokens - self.stride
+                    if self.max_chunk_tokens is not None:
+                        cut_token = min(cut_token, self.max_chunk_tokens)
+                    carry_from = int(doc.token_scores.starts[cut_token]) if cut_token < num_tokens else len(doc.text)
+                    final = [(0, carry_from, float(doc.token_scores.probs[cut_token - 1]))]
+
+            yield from self._materialize_chunks(doc.text, final)
+
+            # 正規化で落ちた末尾の改行・空白は次の片との区切りとして残す
+            buffer = doc.text[carry_from:] + buffer[len(buffer.rstrip()):]
+            next_check = budget * chars_per_token
+
+        if buffer.strip():
+            yield from self.chunk(buffer)
+
+    def chunk_many(
+        self,
+        texts: Iterable[str],
+        *,
+        batch_size: Optional[int] = None,
+        num_workers: int = 1,
+        threshold: Optional[float] = None,
+        max_chunk_tokens=_USE_DEFAULT,
+        min_sentences_per_chunk: Optional[int] = None,
+    ) -> List[List[str]]:
+        """
+        コーパス単位のチャンク化。各文書の結果は chunk(text) と一致する。
+        推論は score_many で文書をまたいでバッチ化される（docs/sec・tokens/sec は self.last_batch_stats）。
+        """
+        docs = self.score_many(texts, batch_size=batch_size, num_workers=num_workers)
+        return [
+            self.chunk(
+                doc,
+                threshold=threshold,
+                max_chunk_tokens=max_chunk_tokens,
+                min_sentences_per_chunk=min_sentences_per_chunk,
+            )
+            for doc in docs
+        ]
+
+    def check_backend_agreement(
+        self,
+        texts: Iterable[str],
+        reference: Optional["FastBunkaiChonkyChunker"] = None,
+    ) -> BackendAgreement:
+        """
+        このチャンカーの separator 確率と区切り位置を、fp32 torch（CPU）の結果と比べる。
+        onnx / torch-int8 に切り替えたときにチャンク境界がずれていないかの確認用。
+        reference を省略すると同じ設定の backend="torch" のチャンカーを作る。
+        """
+        texts = list(texts)
+        if reference is None:
+            # プロファイル（bf16 等）は使わず素の fp32 を基準にする
+            reference = FastBunkaiChonkyChunker(
+                **self._settings(), device="cpu", backend="torch", profile=None
+            )
+
+        ours = self.score_many(texts)
+        theirs = reference.score_many(texts)
+
+        diffs: List[np.ndarray] = []
+        mismatched: List[int] = []
+        for i, (a, b) in enumerate(zip(ours, theirs)):
+            if not np.array_equal(a.token_scores.starts, b.token_scores.starts):
+                mismatched.append(i)
+                continue
+            diffs.append(np.abs(a.token_scores.probs - b.token_scores.probs))
+            ours_bounds = [(start, end) for start, end, _ in self._chunk_bounds(a)]
+            ref_bounds = [(start, end) for start, end, _ in reference._chunk_bounds(b)]
+            if ours_bounds != ref_bounds:
+                mismatched.append(i)
+
+        all_diffs = np.concatenate(diffs) if diffs else np.zeros(0, dtype=np.float32)
+        return BackendAgreement(
+            num_docs=len(texts),
+            max_abs_diff=float(all_diffs.max()) if all_diffs.size else 0.0,
+            mean_abs_diff=float(all_diffs.mean()) if all_diffs.size else 0.0,
+            boundary_agreement=1.0 - len(mismatched) / len(texts) if texts else 1.0,
+            mismatched_docs=mismatched,
+        )
+
+    def debug(self, text: Union[str, ScoredDocument]) -> List[dict]:
         """
         文ごとの separator_score を確認したいとき用。
         """
-        text = self._maybe_normalize(text)
-        sentences = self.split_sentences(text)
-        sentences = self._attach_sentence_scores(text, sentences)
+        doc = self._as_scored(text)
         return [
             {
                 "sentence": s.text,
@@ -346,10 +1536,244 @@ class FastBunkaiChonkyChunker:
                 "end": s.end,
                 "separator_score": round(s.separator_score, 4),
             }
-            for s in sentences
+            for s in doc.sentences
         ]
 
 
+class _GrowableArray:
+    """末尾の切り詰めと追記が追記量に比例するコストで済む 1 次元配列（容量を倍々で確保する）。"""
+
+    def __init__(self, dtype) -> None:
+        self._data = np.zeros(16, dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def view(self) -> np.ndarray:
+        """現在の中身（コピーしない。以降の truncate / extend で書き換わる）。"""
+        return self._data[:self._size]
+
+    def truncate(self, size: int) -> None:
+        self._size = min(size, self._size)
+
+    def extend(self, values: np.ndarray) -> None:
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+
+class IncrementalChunker:
+    """
+    末尾に追記されていく文書（ライブ字幕、更新され続けるスクラップページなど）を
+    前回までのスコア済み状態を使い回してチャンク化する。
+
+        inc = IncrementalChunker(chunker)
+        for piece in stream:
+            for index, chunk_text in inc.append(piece):
+                ...  # index 番目のチャンクが追加 or 変更された
+        inc.chunks  # 現時点の全チャンク（chunk(inc.raw_text) 相当）
+
+    append ごとに計算し直すのは次の範囲だけで、コストは追記量（と最後の文の長さ）にほぼ比例する。
+    - 正規化: 追記前の最後の非空白文字から後ろ（正規化後テキストは追記前のものが必ず接頭辞になる）
+    - 文分割: 追記前の最後の文から後ろ（最後の文は追記で伸びたり分かれたりしうる）
+    - トークナイズ・推論: 最後の文の stride token 手前の文頭から後ろ。この範囲の token の確率は今回の推論結果で置き換える
+    - チャンク化: 影響を受ける文より前で確定した最後の区切りから後ろ
+    offset・token の配列と文のリストは末尾だけを切り詰めて追記するので、全体はコピーしない。
+
+    全文を chunk() した場合とはウィンドウの切り方が違うので、文脈を見るモデルでは separator 確率が
+    全文推論と一致しない（特に推論し直す範囲の先頭付近の token は左側の文脈が stride token 程度しかない）。
+    区切りが全文推論と同じになることは保証しないので、確定版が必要なら最後に chunk(inc.raw_text) し直す。
+    """
+
+    def __init__(self, chunker: FastBunkaiChonkyChunker) -> None:
+        self.chunker = chunker
+        self.raw_text = ""
+        self.text = ""
+        self._raw_offsets: Optional[_GrowableArray] = (
+            _GrowableArray(np.int64) if chunker.normalize_input else None
+        )
+        # raw_text の最後の非空白文字の直後の位置
+        self._raw_content_end = 0
+        self.sentences: List[SentenceSpan] = []
+        self.sentence_token_counts: List[int] = []
+        self._token_starts = _GrowableArray(np.int32)
+        self._token_ends = _GrowableArray(np.int32)
+        self._token_probs = _GrowableArray(np.float32)
+        # 区切り (start, end, score) と、そのチャンクの最後の文の index
+        self._bounds: List[Tuple[int, int, float]] = []
+        self._bound_last_sentence: List[int] = []
+        self._chunks: List[str] = []
+        # 直近の append でトークナイズした文字数（追記量に比例しているかの確認用）
+        self.last_tokenized_chars = 0
+
+    @property
+    def chunks(self) -> List[str]:
+        return list(self._chunks)
+
+    @property
+    def raw_offsets(self) -> Optional[np.ndarray]:
+        return self._raw_offsets.view() if self._raw_offsets is not None else None
+
+    @property
+    def token_scores(self) -> TokenScores:
+        """現時点の token ごとの確率（コピーしないので次の append までに使う）。"""
+        return TokenScores(
+            starts=self._token_starts.view(),
+            ends=self._token_ends.view(),
+            probs=self._token_probs.view(),
+        )
+
+    @property
+    def doc(self) -> ScoredDocument:
+        """現時点のスコア済み文書のコピー（chunker.chunk_spans / debug にそのまま渡せる）。"""
+        tokens = self.token_scores
+        raw_offsets = self.raw_offsets
+        return ScoredDocument(
+            text=self.text,
+            sentences=list(self.sentences),
+            token_scores=TokenScores(
+                starts=tokens.starts.copy(), ends=tokens.ends.copy(), probs=tokens.probs.copy()
+            ),
+            sentence_token_counts=list(self.sentence_token_counts),
+            raw_offsets=raw_offsets.copy() if raw_offsets is not None else None,
+        )
+
+    def _append_normalized(self, piece: str) -> None:
+        """raw_text に piece を足し、正規化後テキストと raw_offsets を末尾だけ計算し直して伸ばす。"""
+        chunker = self.chunker
+        content_end = self._raw_content_end
+        self.raw_text += piece
+        if piece.strip():
+            self._raw_content_end = len(self.raw_text) - (len(piece) - len(piece.rstrip()))
+        if not chunker.normalize_input:
+            self.text = self.raw_text
+            return
+
+        # 追記前の最後の非空白文字から正規化し直す。
+        # その文字を含む行は空行にならないので、「先頭の空行の除去」「連続空行の数え方」
+        # 「行末空白の除去」「単独改行の置換」は全文の正規化と一致する
+        restart = max(content_end - 1, 0)
+        tail, tail_offsets = chunker._maybe_normalize_with_offsets(self.raw_text[restart:])
+        # 正規化後テキスト上での restart の位置
+        norm_restart = int(np.searchsorted(self._raw_offsets.view(), restart, side="left"))
+        keep = len(self.text) - norm_restart
+        if tail[:keep] != self.text[norm_restart:]:
+            raise RuntimeError("追記前の正規化結果が追記後の接頭辞になっていません（正規化規則の変更を確認してください）")
+
+        self.text += tail[keep:]
+        self._raw_offsets.extend(tail_offsets[keep:] + restart)
+
+    def append(self, piece: str) -> List[Tuple[int, str]]:
+        """
+        piece を末尾に追記し、追加・変更されたチャンクを (チャンク index, チャンク文字列) で返す。
+        チャンク数が減った場合（size 上限による区切りのずれ等）は len(self.chunks) 以降が消えたものとする。
+        """
+        chunker = self.chunker
+        self.last_tokenized_chars = 0
+        if not piece:
+            return []
+        self._append_normalized(piece)
+        text = self.text
+
+        # 1) 最後の文から後ろを分割し直す
+        num_kept = max(len(self.sentences) - 1, 0)
+        resplit_from = self.sentences[-1].start if self.sentences else 0
+        with chunker._stage("split"):
+            tail_sentences = [
+                SentenceSpan(s.text, s.start + resplit_from, s.end + resplit_from)
+                for s in chunker.split_sentences(text[resplit_from:])
+            ]
+        if not tail_sentences and not num_kept:
+            return []
+        sentences = self.sentences
+        del sentences[num_kept:]
+        sentences.extend(tail_sentences)
+
+        # 2) 最後の文の stride token 手前の文頭からトークナイズし直す
+        old = self.token_scores
+        first_changed = num_kept  # alignment をやり直す最初の文
+        if len(old):
+            old_tail = int(np.searchsorted(old.starts, resplit_from, side="left"))
+            context_token = max(old_tail - chunker.stride, 0)
+            if context_token < old_tail:
+                first_changed = bisect.bisect_right(
+                    sentences, int(old.starts[context_token]), hi=num_kept, key=lambda s: s.start
+                ) - 1
+                first_changed = max(first_changed, 0)
+        rescore_from = min(sentences[first_changed].start, resplit_from)
+
+        rescore_text = text[rescore_from:]
+        self.last_tokenized_chars = len(rescore_text)
+        fresh = chunker._token_separator_scores(rescore_text) if rescore_text.strip() else TokenScores.empty()
+
+        # 推論し直した範囲は今回の確率で置き換える（前回の確率と max を取ると、同じ token が
+        # append のたびに集約されて確率が上がり続ける）
+        keep_end = int(np.searchsorted(old.starts, rescore_from, side="left"))
+        with chunker._stage("alignment"):
+            for column, values in (
+                (self._token_starts, fresh.starts + rescore_from),
+                (self._token_ends, fresh.ends + rescore_from),
+                (self._token_probs, fresh.probs),
+            ):
+                column.truncate(keep_end)
+                column.extend(values)
+
+            # 3) 変わった文だけ separator_score / token 数を付け直す（token は重なりうる直前の分から渡す）
+            tokens = self.token_scores
+            first_token = int(np.searchsorted(tokens.starts, sentences[first_changed].start, side="left"))
+            while first_token > 0 and tokens.ends[first_token - 1] > sentences[first_changed].start:
+                first_token -= 1
+            counts = chunker._align_sentences(
+                sentences[first_changed:],
+                TokenScores(
+                    starts=tokens.starts[first_token:],
+                    ends=tokens.ends[first_token:],
+                    probs=tokens.probs[first_token:],
+                ),
+            )
+        del self.sentence_token_counts[first_changed:]
+        self.sentence_token_counts.extend(counts)
+
+        # 4) 変わった文より前で確定した最後の区切り（末尾チャンクは除く）から後ろを区切り直す
+        with chunker._stage("assembly"):
+            num_stable = min(
+                bisect.bisect_left(self._bound_last_sentence, first_changed),
+                max(len(self._bound_last_sentence) - 1, 0),
+            )
+            first_sentence = self._bound_last_sentence[num_stable - 1] + 1 if num_stable else 0
+            doc = ScoredDocument(
+                text=text,
+                sentences=sentences,
+                token_scores=tokens,
+                sentence_token_counts=self.sentence_token_counts,
+                raw_offsets=self.raw_offsets,
+            )
+            new_bounds = chunker._chunk_bounds(doc, first_sentence=first_sentence)
+            new_last = [
+                bisect.bisect_left(sentences, end, lo=first_sentence, key=lambda s: s.end)
+                for _, end, _ in new_bounds
+            ]
+
+            updates: List[Tuple[int, str]] = []
+            old_bounds = self._bounds[num_stable:]
+            del self._bounds[num_stable:]
+            self._bounds.extend(new_bounds)
+            del self._bound_last_sentence[num_stable:]
+            self._bound_last_sentence.extend(new_last)
+            del self._chunks[num_stable:]
+            for offset, (start, end, score) in enumerate(new_bounds):
+                chunk_text = chunker._maybe_normalize_chunk(text[start:end].strip())
+                self._chunks.append(chunk_text)
+                if offset >= len(old_bounds) or old_bounds[offset][:2] != (start, end):
+                    updates.append((num_stable + offset, chunk_text))
+        return updates
+
+
 if __name__ == "__main__":
 
     text = """「自分は見た目がいい」と思っている従業員は職場で発言しやすいという研究結果
@@ -402,10 +1826,13 @@ https://www.psypost.org/employees-who-feel-attractive-are-more-likely-to-share-i
         max_chunk_tokens=300,        # RAG 用なら上限を持たせると扱いやすい
     )
 
+    # 推論は 1 回だけ。debug / chunk はスコア済み文書を使い回す
+    doc = chunker.score(text)
+
     print("=== sentence scores ===")
-    for row in chunker.debug(text):
+    for row in chunker.debug(doc):
         print(f"{row['separator_score']:.4f}\t{row['sentence']}")
 
     print("\n=== chunks ===")
-    for i, chunk in enumerate(chunker.chunk(text), 1):
+    for i, chunk in enumerate(chunker.chunk(doc), 1):
         print(f"[chunk {i}] {chunk}")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FastBunkaiChonkyChunker を複数プロセスで動かすコーパス向けのプール。
+
+小さいウィンドウでは torch の intra-op スレッドがあまり伸びないので、
+1 プロセス 1〜少数スレッドのワーカーを CPU コア数だけ並べる。
+
+- 親プロセスで 1 回だけモデルと FastBunkai をロードし、fork でワーカーを作る。
+  重みは copy-on-write で共有されるので、ワーカーを増やしてもモデル分のメモリは増えない
+  （fork が使えない環境では spawn で各ワーカーがモデルをロードし直す）
+- 各ワーカーで torch.set_num_threads(threads_per_worker) を固定する
+  （backend="onnx" ではワーカーごとに intra_op_num_threads=threads_per_worker のセッションを作る）
+- 文書は推定 token 数の大きい順に、合計が最も小さいワーカーへ割り当てる（LPT）
+- 結果は入力順で返す
+
+使い方:
+    from fast_bunkai_chonky_pool import ChunkerPool
+
+    with ChunkerPool(num_workers=8, model_name="mirth/chonky_mmbert_small_multilingual_1") as pool:
+        chunks_per_doc = pool.chunk_many(texts)
+        print(pool.last_batch_stats.summary())
+
+ワーカー数ごとの docs/sec の確認:
+    uv run fast_bunkai_chonky_pool.py --workers 1,2,4,8 --docs 64
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fast_bunkai_chonky_chunker import (
+    BatchStats,
+    FastBunkaiChonkyChunker,
+    ScoredDocument,
+    SeparatorScoreCache,
+    _USE_DEFAULT,
+)
+
+# fork 前に親で作ったチャンカー（ワーカー側ではこれを copy-on-write で引き継ぐ）
+_WORKER_CHUNKER: Optional[FastBunkaiChonkyChunker] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークナイズせずに token 数を見積もる（割り当て用の目安）。
+    日本語は 1 文字 ≒ 1 token・3 byte、英語は 4 文字 ≒ 1 token なので UTF-8 の byte 数 / 3 で近似する。
+    """
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def assign_lpt(weights: List[int], num_bins: int) -> List[List[int]]:
+    """
+    重みの大きい順に、合計が最も小さいビンへ入れる（LPT スケジューリング）。
+    各ビンには元のインデックスが昇順で入る。
+    """
+    heap = [(0, b) for b in range(num_bins)]
+    bins: List[List[int]] = [[] for _ in range(num_bins)]
+    for i in sorted(range(len(weights)), key=lambda i: weights[i], reverse=True):
+        load, b = heapq.heappop(heap)
+        bins[b].append(i)
+        heapq.heappush(heap, (load + weights[i], b))
+    return [sorted(indices) for indices in bins if indices]
+
+
+def _init_worker(threads_per_worker: int, chunker_kwargs: Optional[dict]) -> None:
+    global _WORKER_CHUNKER
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+
+    if chunker_kwargs is not None:
+        # spawn: 親のチャンカーを引き継げないのでワーカーごとにロードする
+        _WORKER_CHUNKER = FastBunkaiChonkyChunker(**chunker_kwargs)
+    elif _WORKER_CHUNKER.score_cache is not None:
+        # SQLite の接続はプロセスをまたいで使えないので開き直す
+        cache = _WORKER_CHUNKER.score_cache
+        _WORKER_CHUNKER.score_cache = SeparatorScoreCache(cache.path, max_bytes=cache.max_bytes)
+
+    # プロファイルのスレッド数（1 プロセスで全コアを使う前提の値）で推論中に上書きされないようにする
+    _WORKER_CHUNKER.num_threads = threads_per_worker
+    if _WORKER_CHUNKER.backend == "onnx":
+        # InferenceSession は fork で引き継げず、スレッド数も torch.set_num_threads では変わらないので
+        # ワーカーごとに intra_op_num_threads を指定して作る
+        _WORKER_CHUNKER.onnx_session = _WORKER_CHUNKER._load_onnx_session(num_threads=threads_per_worker)
+
+
+def _score_shard(
+    indices: List[int],
+    texts: List[str],
+    batch_size: Optional[int],
+    keep_offsets: bool,
+) -> Tuple[List[int], List[ScoredDocument], BatchStats]:
+    docs = _WORKER_CHUNKER.score_many(texts, batch_size=batch_size, keep_offsets=keep_offsets)
+    return indices, docs, _WORKER_CHUNKER.last_batch_stats
+
+
+def _chunk_shard(
+    indices: List[int],
+    texts: List[str],
+    batch_size: Optional[int],
+    chunk_kwargs: dict,
+) -> Tuple[List[int], List[List[str]], BatchStats]:
+    chunks = _WORKER_CHUNKER.chunk_many(texts, batch_size=batch_size, **chunk_kwargs)
+    return indices, chunks, _WORKER_CHUNKER.last_batch_stats
+
+
+class ChunkerPool:
+    """
+    FastBunkaiChonkyChunker のマルチプロセス版（score_many / chunk_many のみ）。
+    各文書の結果は単体の FastBunkaiChonkyChunker で処理した場合と同じ。
+
+    num_workers: ワーカープロセス数（既定: CPU コア数 // threads_per_worker）
+    threads_per_worker: 各ワーカーの torch.set_num_threads（onnx では intra_op_num_threads）
+    chunker_kwargs: FastBunkaiChonkyChunker にそのまま渡す（CPU 前提。device は "cpu" に固定する）
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        threads_per_worker: int = 1,
+        start_method: Optional[str] = None,
+        **chunker_kwargs,
+    ) -> None:
+        if threads_per_worker < 1:
+            raise ValueError(f"threads_per_worker は 1 以上を指定してください: {threads_per_worker}")
+        if num_workers is None:
+            num_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+        if num_workers < 1:
+            raise ValueError(f"num_workers は 1 以上を指定してください: {num_workers}")
+        if chunker_kwargs.get("device") not in (None, "cpu"):
+            raise ValueError(f"ChunkerPool は CPU 専用です: device={chunker_kwargs['device']!r}")
+        chunker_kwargs["device"] = "cpu"
+
+        if start_method is None:
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.start_method = start_method
+        self.last_batch_stats: Optional[BatchStats] = None
+
+        global _WORKER_CHUNKER
+        if start_method == "fork":
+            # 推論はまだ走らせない（スレッドプールが起動した後の fork を避ける）
+            chunker = FastBunkaiChonkyChunker(**chunker_kwargs)
+            chunker.bunkai  # FastBunkai も共有したいので fork 前にロードしておく
+            if chunker.backend == "onnx":
+                # ONNX Runtime のセッション（とそのスレッドプール）は fork 前に捨て、ワーカーで作り直す
+                chunker.onnx_session = None
+            _WORKER_CHUNKER = chunker
+            initargs = (threads_per_worker, None)
+        else:
+            initargs = (threads_per_worker, chunker_kwargs)
+
+        ctx = multiprocessing.get_context(start_method)
+        self._pool = ctx.Pool(processes=num_workers, initializer=_init_worker, initargs=initargs)
+
+    def __enter__(self) -> "ChunkerPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        global _WORKER_CHUNKER
+        self._pool.close()
+        self._pool.join()
+        _WORKER_CHUNKER = None
+
+    def _run(self, func, texts: Iterable[str], *args) -> list:
+        texts = list(texts)
+        started = time.perf_counter()
+        shards = assign_lpt([estimate_tokens(t) for t in texts], self.num_workers)
+        pending = [
+            self._pool.apply_async(func, (indices, [texts[i] for i in indices], *args))
+            for indices in shards
+        ]
+
+        results: list = [None] * len(texts)
+        stats: List[BatchStats] = []
+        for async_result in pending:
+            indices, values, shard_stats = async_result.get()
+            for i, value in zip(indices, values):
+                results[i] = value
+            stats.append(shard_stats)
+
+        self.last_batch_stats = BatchStats(
+            num_docs=len(texts),
+            num_tokens=sum(s.num_tokens for s in stats),
+            num_windows=sum(s.num_windows for s in stats),
+            elapsed_sec=time.perf_counter() - started,
+            num_cache_hits=sum(s.num_cache_hits for s in stats),
+        )
+        return results
+
+    def score_many(
+        self,
+        texts: Iterable[str],
+        *,
+        batch_size: Optional[int] = None,
+        keep_offsets: bool = False,
+    ) -> List[ScoredDocument]:
+        return self._run(_score_shard, texts, batch_size, keep_offsets)
+
+    def chunk_many(
+        self,
+        texts: Iterable[str],
+        *,
+        batch_size: Optional[int] = None,
+        threshold: Optional[float] = None,
+        max_chunk_tokens=_USE_DEFAULT,
+        min_sentences_per_chunk: Optional[int] = None,
+    ) -> List[List[str]]:
+        chunk_kwargs: Dict[str, object] = {
+            "threshold": threshold,
+            "min_sentences_per_chunk": min_sentences_per_chunk,
+        }
+        if max_chunk_tokens is not _USE_DEFAULT:
+            chunk_kwargs["max_chunk_tokens"] = max_chunk_tokens
+        return self._run(_chunk_shard, texts, batch_size, chunk_kwargs)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ChunkerPool のワーカー数ごとの docs/sec を計測する")
+    parser.add_argument(
+        "--model-name",
+        default="mirth/chonky_mmbert_small_multilingual_1",
+        help="Chonky モデル名またはローカルパス",
+    )
+    parser.add_argument("--workers", default="1,2,4", help="試すワーカー数（カンマ区切り）")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="各ワーカーの torch スレッド数")
+    parser.add_argument("--docs", type=int, default=32, help="合成文書の数")
+    parser.add_argument("--doc-bytes", type=int, default=10_000, help="合成文書 1 件あたりの UTF-8 byte 数")
+    parser.add_argument("--backend", default="torch", help="torch / onnx / torch-int8")
+    return parser.parse_args()
+
+
+def main() -> None:
+    from bench_fast_bunkai_chonky_chunker import synthetic_text
+
+    args = parse_args()
+    texts = [
+        synthetic_text("ja" if i % 2 == 0 else "en", args.doc_bytes, seed=i)
+        for i in range(args.docs)
+    ]
+    baseline: Optional[List[List[str]]] = None
+    for num_workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        with ChunkerPool(
+            num_workers=num_workers,
+            threads_per_worker=args.threads_per_worker,
+            model_name=args.model_name,
+            backend=args.backend,
+        ) as pool:
+            chunks = pool.chunk_many(texts)
+            stats = pool.last_batch_stats
+        if baseline is None:
+            baseline = chunks
+        elif chunks != baseline:
+            print(f"[WARNING] workers={num_workers} の結果が最初のワーカー数の結果と一致しません", file=sys.stderr)
+        print(f"[workers={num_workers}] {stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
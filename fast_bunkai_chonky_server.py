@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FastBunkaiChonkyChunker を常駐させるローカル HTTP サーバーと、その薄いクライアント。
+
+torch / transformers の import・FastBunkai とモデルのロードはサーバー起動時の 1 回だけ。
+同時に届いたリクエストはまとめて score_many に流し、ウィンドウをバッチ推論する。
+閾値・max_chunk_tokens はリクエストごとに指定でき、チャンク化はスコア済み文書の上で行う。
+
+起動:
+    uv run fast_bunkai_chonky_server.py --port 8765
+
+エンドポイント:
+    POST /chunk   {"text": ..., "threshold": 0.5, "max_chunk_tokens": 300} -> {"chunks": [...]}
+    POST /debug   {"text": ...} -> {"sentences": [...]}
+    POST /score   {"text": ...} -> {"text": 正規化後テキスト, "sentences": [...]}
+    GET  /metrics リクエスト種別ごとのレイテンシヒストグラム
+    GET  /health
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib import error, request
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# レイテンシヒストグラムのバケット上限（ミリ秒）。最後は +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """リクエスト種別ごとのレイテンシを固定バケットで数える（スレッドセーフ）。"""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS) -> None:
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(name, [0] * (len(self.buckets_ms) + 1))
+            for i, bound in enumerate(self.buckets_ms):
+                if elapsed_ms <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[name] = self._sums.get(name, 0.0) + elapsed_ms
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            out = {}
+            for name, counts in self._counts.items():
+                total = sum(counts)
+                labels = [f"le_{b}ms" for b in self.buckets_ms] + ["le_inf"]
+                out[name] = {
+                    "count": total,
+                    "mean_ms": round(self._sums[name] / total, 3) if total else 0.0,
+                    "buckets": dict(zip(labels, counts)),
+                }
+            return out
+
+
+class ScoreBatcher:
+    """
+    score リクエストをキューに溜め、batch_wait_ms だけ待って集まった文書を
+    1 回の score_many にまとめる。モデルに触るのはこのワーカースレッドだけ。
+    バッチが例外で失敗したら 1 件ずつやり直し、同じバッチに入った無関係なリクエストは巻き込まない。
+    """
+
+    def __init__(self, chunker, max_batch_docs: int = 32, batch_wait_ms: float = 5.0) -> None:
+        self.chunker = chunker
+        self.max_batch_docs = max_batch_docs
+        self.batch_wait_sec = batch_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="score-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait_sec
+            while len(batch) < self.max_batch_docs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                docs = self.chunker.score_many(texts)
+            except Exception as exc:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(exc)
+                else:
+                    self._score_one_by_one(batch)
+                continue
+            for (_, future), doc in zip(batch, docs):
+                future.set_result(doc)
+
+    def _score_one_by_one(self, batch: "List[tuple[str, Future]]") -> None:
+        """まとめた score_many が失敗したとき、1 件ずつ score し直して失敗した文書のリクエストだけをエラーにする。"""
+        for text, future in batch:
+            try:
+                (doc,) = self.chunker.score_many([text])
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(doc)
+
+
+def _sentence_rows(chunker, doc) -> List[dict]:
+    rows = chunker.debug(doc)
+    for row, count in zip(rows, doc.sentence_token_counts):
+        row["token_count"] = count
+    return rows
+
+
+def make_handler(chunker, batcher: ScoreBatcher, metrics: LatencyHistogram):
+    class ChunkerRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler の引数名に合わせる
+            return
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok", "model_name": chunker.model_name})
+            elif self.path == "/metrics":
+                self._send_json(200, {"latency": metrics.snapshot()})
+            else:
+                self._send_json(404, {"error": f"unknown path: {self.path}"})
+
+        def do_POST(self) -> None:
+            kind = self.path.strip("/")
+            if kind not in ("chunk", "debug", "score"):
+                self._send_json(404, {"error": f"unknown path: {self.path}"})
+                return
+
+            started = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                text = payload.get("text")
+                if not isinstance(text, str):
+                    raise ValueError("'text' (string) is required")
+
+                doc = batcher.submit(text).result()
+
+                if kind == "chunk":
+                    overrides = {
+                        key: payload[key]
+                        for key in ("threshold", "max_chunk_tokens", "min_sentences_per_chunk")
+                        if key in payload
+                    }
+                    result = {"chunks": chunker.chunk(doc, **overrides)}
+                elif kind == "debug":
+                    result = {"sentences": chunker.debug(doc)}
+                else:
+                    result = {"text": doc.text, "sentences": _sentence_rows(chunker, doc)}
+            except (ValueError, TypeError) as exc:
+                self._send_json(400, {"error": str(exc)})
+                return
+            except Exception as exc:
+                self._send_json(500, {"error": f"{type(exc).__name__}: {exc}"})
+                return
+            finally:
+                metrics.observe(kind, (time.perf_counter() - started) * 1000.0)
+
+            self._send_json(200, result)
+
+    return ChunkerRequestHandler
+
+
+def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_batch_docs: int = 32,
+    batch_wait_ms: float = 5.0,
+    **chunker_kwargs,
+) -> None:
+    from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker
+
+    started = time.perf_counter()
+    chunker = FastBunkaiChonkyChunker(**chunker_kwargs)
+    print(
+        f"[INFO] model loaded in {time.perf_counter() - started:.1f}s: {chunker.model_name}",
+        file=sys.stderr,
+    )
+
+    batcher = ScoreBatcher(chunker, max_batch_docs=max_batch_docs, batch_wait_ms=batch_wait_ms)
+    metrics = LatencyHistogram()
+    server = ThreadingHTTPServer((host, port), make_handler(chunker, batcher, metrics))
+    print(f"[INFO] listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class ChunkerClient:
+    """
+    常駐サーバーへの薄いクライアント。
+    サーバーに接続できないときは fallback=True なら同じ設定のチャンカーを
+    このプロセス内に作って処理する（初回だけモデルのロード時間がかかる）。
+    """
+
+    def __init__(
+        self,
+        base_url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}",
+        timeout: float = 120.0,
+        fallback: bool = True,
+        **chunker_kwargs,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.fallback = fallback
+        self.chunker_kwargs = chunker_kwargs
+        self._local = None
+
+    def _local_chunker(self):
+        if self._local is None:
+            from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker
+
+            self._local = FastBunkaiChonkyChunker(**self.chunker_kwargs)
+        return self._local
+
+    def _post(self, kind: str, payload: dict) -> Optional[dict]:
+        """サーバーに投げて結果を返す。接続できなければ None（fallback 用）。"""
+        req = request.Request(
+            f"{self.base_url}/{kind}",
+            data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json; charset=utf-8"},
+            method="POST",
+        )
+        try:
+            with request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except error.HTTPError as exc:
+            detail = exc.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"chunker server returned HTTP {exc.code}: {detail}") from exc
+        except (error.URLError, ConnectionError) as exc:
+            if not self.fallback:
+                raise
+            print(f"[WARNING] chunker server unavailable, using in-process chunker: {exc}", file=sys.stderr)
+            return None
+
+    def chunk(self, text: str, **overrides) -> List[str]:
+        """overrides: threshold / max_chunk_tokens / min_sentences_per_chunk（省略時はサーバー側の設定）"""
+        result = self._post("chunk", {"text": text, **overrides})
+        if result is None:
+            return self._local_chunker().chunk(text, **overrides)
+        return result["chunks"]
+
+    def debug(self, text: str) -> List[dict]:
+        result = self._post("debug", {"text": text})
+        if result is None:
+            return self._local_chunker().debug(text)
+        return result["sentences"]
+
+    def score(self, text: str) -> dict:
+        result = self._post("score", {"text": text})
+        if result is None:
+            chunker = self._local_chunker()
+            doc = chunker.score(text)
+            return {"text": doc.text, "sentences": _sentence_rows(chunker, doc)}
+        return result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="FastBunkaiChonkyChunker を常駐させるローカル HTTP サーバー"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"待ち受けアドレス（既定: {DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"待ち受けポート（既定: {DEFAULT_PORT}）")
+    parser.add_argument(
+        "--model-name",
+        default="mirth/chonky_mmbert_small_multilingual_1",
+        help="Chonky モデル名またはローカルパス",
+    )
+    parser.add_argument("--threshold", type=float, default=0.55, help="既定の separator 閾値")
+    parser.add_argument("--max-chunk-tokens", type=int, default=None, help="既定の 1 チャンクあたり上限 token 数")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="1 回の forward に載せるウィンドウ数（既定: 推論プロファイルの値、無ければ 8）",
+    )
+    parser.add_argument("--backend", default="torch", help="torch / onnx / torch-int8")
+    parser.add_argument("--max-batch-docs", type=int, default=32, help="1 回の score_many にまとめる最大文書数")
+    parser.add_argument(
+        "--batch-wait-ms",
+        type=float,
+        default=5.0,
+        help="同時リクエストをまとめるために待つ時間（ミリ秒）",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.max_batch_docs < 1:
+        raise ValueError("--max-batch-docs must be >= 1")
+    serve(
+        host=args.host,
+        port=args.port,
+        max_batch_docs=args.max_batch_docs,
+        batch_wait_ms=args.batch_wait_ms,
+        model_name=args.model_name,
+        threshold=args.threshold,
+        max_chunk_tokens=args.max_chunk_tokens,
+        batch_size=args.batch_size,
+        backend=args.backend,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebVTT 字幕（YouTube の自動字幕など）を FastBunkaiChonkyChunker でチャンク化し、
+各チャンクに開始・終了時刻を付けるモジュール。
+
+YouTube の自動字幕は 1 行を 2〜3 回繰り返す「ローリング」形式になっている:
+
+    00:00:06.759 --> 00:00:09.030
+    チャンネルファッションカレジ講師の星吉正です。        ← 前の cue の行の再掲
+    こんばんは。<00:00:07.319><c>MC</c><00:00:07.640><c>の森千春です。</c>   ← 新しい行（単語ごとの時刻付き）
+
+    00:00:09.030 --> 00:00:09.040
+    こんばんは。MCの森千春です。                          ← 同じ行の再掲
+
+そのまま流すと token の大半が重複になるので、
+- cue を 1 つずつ読み（ファイル全体を読み込まずに処理できる）、
+- インラインの時刻タグ・<c> タグを除き、
+- 直前の cue の末尾の行と重なる先頭の行を捨てて新しい行だけを残し、
+- 残った行をつないだ文字列と「文字 offset → 時刻」の対応表（TimedTranscript）を作る。
+チャンク化は chunk_spans で行うので、各チャンクの offset から時刻を引ける。
+
+使い方:
+    uv run fast_bunkai_chonky_vtt.py temp_transcript.ja.vtt
+    uv run fast_bunkai_chonky_vtt.py temp_transcript.ja.vtt --json --max-chunk-tokens 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import re
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+_TIMING_RE = re.compile(
+    r"^\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})"
+)
+# 本文中の単語ごとの時刻 <00:00:04.359>
+_INLINE_TIME_RE = re.compile(r"<((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})>")
+# <c> / </c> / <c.colorE5E5E5> / <v 話者> などのタグ
+_TAG_RE = re.compile(r"</?[^>]*>")
+
+
+@dataclass
+class VttCue:
+    start: float
+    end: float
+    # 行ごとの [(行内の文字位置, 時刻), ...] 付きテキスト。タグは除去済み
+    lines: List[Tuple[str, List[Tuple[int, float]]]]
+
+
+@dataclass
+class TimedChunk:
+    text: str
+    start_sec: float
+    end_sec: float
+    # TimedTranscript.text 上の char 範囲
+    start: int
+    end: int
+
+
+@dataclass
+class TimedTranscript:
+    """
+    重複を除いた字幕テキストと、文字 offset → 時刻の対応表。
+    seg_starts[i] 文字目から始まる区間が [seg_start_sec[i], seg_end_sec[i]] に話されている。
+    """
+    text: str
+    seg_starts: np.ndarray
+    seg_start_sec: np.ndarray
+    seg_end_sec: np.ndarray
+    num_cues: int = 0
+    # 重複除去前の cue 本文の合計文字数（どれだけ削れたかの目安）
+    raw_chars: int = 0
+
+    def _segment(self, offset: int) -> int:
+        return max(int(np.searchsorted(self.seg_starts, offset, side="right")) - 1, 0)
+
+    def time_span(self, start: int, end: int) -> Tuple[float, float]:
+        """text[start:end] が話されている時間帯（秒）。"""
+        if not len(self.seg_starts):
+            return 0.0, 0.0
+        first = self._segment(start)
+        last = self._segment(max(end - 1, start))
+        return float(self.seg_start_sec[first]), float(self.seg_end_sec[last])
+
+
+def parse_timestamp(value: str) -> float:
+    """'01:02:03.456' / '02:03.456'（',' 区切りも可）を秒に。"""
+    parts = value.replace(",", ".").split(":")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_timestamp(seconds: float) -> str:
+    total = int(seconds)
+    return f"{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+
+
+def _clean_line(line: str, cue_start: float) -> Tuple[str, List[Tuple[int, float]]]:
+    """タグを除いた行と、行内の時刻の目印 [(文字位置, 時刻), ...] を返す。"""
+    pieces: List[str] = []
+    marks: List[Tuple[int, float]] = [(0, cue_start)]
+    length = 0
+    cursor = 0
+    for m in _INLINE_TIME_RE.finditer(line):
+        piece = html.unescape(_TAG_RE.sub("", line[cursor:m.start()]))
+        pieces.append(piece)
+        length += len(piece)
+        marks.append((length, parse_timestamp(m.group(1))))
+        cursor = m.end()
+    pieces.append(html.unescape(_TAG_RE.sub("", line[cursor:])))
+    text = "".join(pieces)
+
+    # 行頭・行末の空白を落とした分だけ目印をずらす
+    lead = len(text) - len(text.lstrip())
+    text = text.strip()
+    cleaned_marks: List[Tuple[int, float]] = []
+    for pos, sec in marks:
+        pos = min(max(pos - lead, 0), len(text))
+        if cleaned_marks and cleaned_marks[-1][0] == pos:
+            cleaned_marks[-1] = (pos, sec)
+        elif pos < len(text) or not cleaned_marks:
+            cleaned_marks.append((pos, sec))
+    return text, cleaned_marks
+
+
+def iter_vtt_cues(lines: Iterable[str]) -> Iterator[VttCue]:
+    """
+    WebVTT を行単位で読み、cue を順に返す（ファイルオブジェクトをそのまま渡せる）。
+    ヘッダ・NOTE / STYLE / REGION ブロック・cue 識別子は読み飛ばし、空の行は落とす。
+    """
+    timing: Optional[Tuple[float, float]] = None
+    payload: List[str] = []
+
+    def flush() -> Optional[VttCue]:
+        if timing is None:
+            return None
+        cleaned = [_clean_line(p, timing[0]) for p in payload]
+        return VttCue(start=timing[0], end=timing[1], lines=[c for c in cleaned if c[0]])
+
+    for raw_line in lines:
+        line = raw_line.rstrip("\r\n")
+        # cue の区切りは完全な空行。空白だけの行（自動字幕の行送り）は本文として扱う
+        if not line:
+            cue = flush()
+            if cue is not None:
+                yield cue
+            timing, payload = None, []
+            continue
+        if timing is None:
+            m = _TIMING_RE.match(line)
+            if m:
+                timing = (parse_timestamp(m.group(1)), parse_timestamp(m.group(2)))
+            # タイミング行より前はヘッダ・識別子・NOTE 等なので捨てる
+            continue
+        payload.append(line)
+
+    cue = flush()
+    if cue is not None:
+        yield cue
+
+
+def _rolling_overlap(previous: List[str], current: List[str]) -> int:
+    """current の先頭 k 行が previous の末尾 k 行と一致する最大の k。"""
+    for k in range(min(len(previous), len(current)), 0, -1):
+        if previous[-k:] == current[:k]:
+            return k
+    return 0
+
+
+def _separator(left: str, right: str) -> str:
+    """行をつなぐときの区切り。英数字どうしなら空白、日本語などは詰める。"""
+    if not left or not right:
+        return ""
+    if left[-1].isascii() and right[0].isascii() and not left[-1].isspace():
+        return " "
+    return ""
+
+
+def build_transcript(cues: Iterable[VttCue]) -> TimedTranscript:
+    """ローリング字幕の重複を除いて 1 本のテキストと時刻の対応表にまとめる。"""
+    parts: List[str] = []
+    length = 0
+    last_text = ""
+    seg_starts: List[int] = []
+    seg_start_sec: List[float] = []
+    seg_end_sec: List[float] = []
+    previous: List[str] = []
+    num_cues = 0
+    raw_chars = 0
+
+    for cue in cues:
+        num_cues += 1
+        current = [text for text, _ in cue.lines]
+        raw_chars += sum(len(t) for t in current)
+        if not current:
+            # 空の cue（行送りだけのもの）は重なり判定の基準にしない
+            continue
+        skip = _rolling_overlap(previous, current)
+        previous = current
+
+        for text, marks in cue.lines[skip:]:
+            sep = _separator(last_text, text)
+            parts.append(sep + text)
+            base = length + len(sep)
+            for i, (pos, sec) in enumerate(marks):
+                # 区間の終わりは同じ行の次の目印、行の最後の区間は cue の終わり
+                end_sec = marks[i + 1][1] if i + 1 < len(marks) else cue.end
+                seg_starts.append(base + pos)
+                seg_start_sec.append(sec)
+                seg_end_sec.append(max(end_sec, sec))
+            length = base + len(text)
+            last_text = text
+
+    return TimedTranscript(
+        text="".join(parts),
+        seg_starts=np.asarray(seg_starts, dtype=np.int64),
+        seg_start_sec=np.asarray(seg_start_sec, dtype=np.float64),
+        seg_end_sec=np.asarray(seg_end_sec, dtype=np.float64),
+        num_cues=num_cues,
+        raw_chars=raw_chars,
+    )
+
+
+def load_transcript(source: Union[str, Path, Iterable[str]]) -> TimedTranscript:
+    """VTT ファイルのパス、または行の iterable から TimedTranscript を作る。"""
+    if isinstance(source, (str, Path)):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            return build_transcript(iter_vtt_cues(f))
+    return build_transcript(iter_vtt_cues(source))
+
+
+def chunk_transcript(chunker, transcript: TimedTranscript, **chunk_kwargs) -> List[TimedChunk]:
+    """
+    transcript.text を chunker.chunk_spans でチャンク化し、各チャンクに時刻を付ける。
+    chunk_kwargs は threshold / max_chunk_tokens / min_sentences_per_chunk の上書き。
+    """
+    spans = chunker.chunk_spans(transcript.text, **chunk_kwargs)
+    texts = chunker.materialize_spans(transcript.text, spans)
+    chunks: List[TimedChunk] = []
+    for (start, end, _), text in zip(spans, texts):
+        start_sec, end_sec = transcript.time_span(start, end)
+        chunks.append(TimedChunk(text=text, start_sec=start_sec, end_sec=end_sec, start=start, end=end))
+    return chunks
+
+
+def chunk_vtt(
+    source: Union[str, Path, Iterable[str]],
+    chunker=None,
+    **chunk_kwargs,
+) -> List[TimedChunk]:
+    """VTT を読んで時刻付きチャンクを返す。chunker を省略すると既定設定の FastBunkaiChonkyChunker を作る。"""
+    if chunker is None:
+        from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker
+
+        chunker = FastBunkaiChonkyChunker()
+    return chunk_transcript(chunker, load_transcript(source), **chunk_kwargs)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="WebVTT 字幕を重複除去して時刻付きのセマンティックチャンクにする")
+    parser.add_argument("vtt", type=Path, help="WebVTT ファイル")
+    parser.add_argument(
+        "--model-name",
+        default="mirth/chonky_mmbert_small_multilingual_1",
+        help="Chonky モデル名またはローカルパス",
+    )
+    parser.add_argument("--threshold", type=float, default=0.55, help="separator 閾値")
+    parser.add_argument("--max-chunk-tokens", type=int, default=None, help="1 チャンクあたり上限 token 数")
+    parser.add_argument("--transcript-only", action="store_true", help="重複除去後のテキストだけ出力する（モデル不要）")
+    parser.add_argument("--json", action="store_true", help="チャンクを JSON で出力する")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    transcript = load_transcript(args.vtt)
+    print(
+        f"[INFO] {transcript.num_cues} cues, {transcript.raw_chars} chars -> {len(transcript.text)} chars "
+        f"after removing rolling duplicates",
+        file=sys.stderr,
+    )
+    if args.transcript_only:
+        print(transcript.text)
+        return
+
+    from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker
+
+    chunker = FastBunkaiChonkyChunker(
+        model_name=args.model_name,
+        threshold=args.threshold,
+        max_chunk_tokens=args.max_chunk_tokens,
+    )
+    chunks = chunk_transcript(chunker, transcript)
+    if args.json:
+        print(json.dumps([asdict(c) for c in chunks], ensure_ascii=False, indent=2))
+        return
+    for c in chunks:
+        print(f"[{format_timestamp(c.start_sec)} - {format_timestamp(c.end_sec)}] {c.text}\n")
+
+
+if __name__ == "__main__":
+    main()
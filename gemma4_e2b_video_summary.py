@@ -58,7 +58,12 @@ from urllib.parse import parse_qs, urlparse
 from zoneinfo import ZoneInfo
 
 import feedparser
-import requests
+
+try:
+    from scripts.http_client import get_default_client
+except ImportError:
+    # scripts/ から spec_from_file_location で読み込まれた場合
+    from http_client import get_default_client
 
 
 # ----------------------------------
@@ -201,7 +206,7 @@ def fetch_youtube_rss_feed(rss_url: str) -> bytes:
     last_exc: BaseException | None = None
     for attempt in range(1, RSS_RETRY_MAX + 1):
         try:
-            response = requests.get(
+            response = get_default_client().get(
                 rss_url,
                 timeout=RSS_REQUEST_TIMEOUT_SEC,
                 headers={
@@ -8,9 +8,13 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
-import requests
 from bs4 import BeautifulSoup
 
+try:
+    from http_client import get_default_client
+except ImportError:
+    from scripts.http_client import get_default_client
+
 
 @dataclass
 class Repository:
@@ -52,7 +56,7 @@ def _retrieve_repositories(language: str, limit: int) -> List[Repository]:
     }
 
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = get_default_client().get(url, headers=headers, timeout=30)
         resp.raise_for_status()
     except Exception as e:
         print(f"Error retrieving repositories for language {language}: {e}")
@@ -122,7 +126,7 @@ def _retrieve_repositories(language: str, limit: int) -> List[Repository]:
         # README全文を取得
         readme_content = None
         try:
-            repo_resp = requests.get(link, headers=headers, timeout=15)
+            repo_resp = get_default_client().get(link, headers=headers, timeout=15)
             repo_resp.raise_for_status()
             repo_soup = BeautifulSoup(repo_resp.text, "html.parser")
 
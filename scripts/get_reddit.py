@@ -1,10 +1,329 @@
 #!/usr/bin/env python3
 # scripts/get_reddit.py
 
+import argparse
+import email.utils
 import json
+import sqlite3
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from urllib import request, error
+from pathlib import Path
+
+import requests
+
+try:
+    from http_client import get_default_client
+except ImportError:
+    from scripts.http_client import get_default_client
+
+# 1 リクエストで取れる最大件数（Reddit API の上限）
+REDDIT_PAGE_LIMIT = 100
+# x-ratelimit-remaining がこれを下回ったら、残りをリセットまでの時間に均して間隔を空ける
+RATELIMIT_LOW_WATERMARK = 10
+# リトライ時の待ち時間の上限（秒）
+RETRY_MAX_WAIT_SEC = 60.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# コメント 1 件の本文の最大文字数（長い投稿は切り詰める）
+COMMENT_MAX_BODY_CHARS = 1200
+# コメントのレスポンスの最大サイズ（limit / depth で絞っているので通常は数百 KB に収まる）
+COMMENT_MAX_RESPONSE_BYTES = 4 * 1024 * 1024
+
+
+def _estimate_tokens(text):
+    """トークナイズせずに token 数を見積もる（UTF-8 の byte 数 / 3）。"""
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def _read_listing_children(resp, max_bytes=COMMENT_MAX_RESPONSE_BYTES):
+    """
+    /comments/{id}.json の [投稿の Listing, コメントの Listing] の children を 1 つのリストにして返す。
+    本文は stream で読み、max_bytes を超えたらそこでやめて RuntimeError にする（巨大なスレッドでメモリを使い切らないように）。
+    JSON のパースは読み終えてから一度に行う。
+    """
+    parts = []
+    size = 0
+    for chunk in resp.iter_content(chunk_size=64 * 1024):
+        size += len(chunk)
+        if size > max_bytes:
+            raise RuntimeError(f"コメントのレスポンスが {max_bytes} bytes を超えました")
+        parts.append(chunk)
+    return [
+        child
+        for listing in json.loads(b"".join(parts))
+        for child in listing.get("data", {}).get("children", [])
+    ]
+
+
+def _collect_comments(children, max_depth, max_comments, token_budget):
+    """
+    コメントの木を上位のコメントから順に（返信はその直後に）平らにし、
+    深さ max_depth（トップレベルが 0）・max_comments 件・token_budget token までに切り詰める。
+    """
+    comments = []
+    tokens = 0
+    for child in children:
+        if child.get("kind") != "t1":
+            continue  # 投稿本体（t3）と「続きを読む」（more）は飛ばす
+        stack = [(child, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if node.get("kind") != "t1" or depth > max_depth:
+                continue
+            data = node.get("data", {})
+            body = (data.get("body") or "").strip()
+            if not body or body in ("[deleted]", "[removed]"):
+                continue
+            if len(body) > COMMENT_MAX_BODY_CHARS:
+                body = body[:COMMENT_MAX_BODY_CHARS] + "…"
+            cost = _estimate_tokens(body)
+            if tokens + cost > token_budget:
+                return comments
+            tokens += cost
+            comments.append({
+                "author": data.get("author"),
+                "score": data.get("score"),
+                "depth": depth,
+                "body": body,
+            })
+            if len(comments) >= max_comments:
+                return comments
+            replies = data.get("replies")
+            if isinstance(replies, dict):
+                # 先頭の返信から見るように逆順に積む
+                for reply in reversed(replies.get("data", {}).get("children", [])):
+                    stack.append((reply, depth + 1))
+    return comments
+
+
+def _retry_after_seconds(resp):
+    """Retry-After（秒数か HTTP 日付）を秒にする。無ければ None。"""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RedditRateLimiter:
+    """
+    x-ratelimit-remaining / x-ratelimit-reset と 429 の Retry-After からリクエストの間隔を決める（スレッド間で共有）。
+
+    - 残りが RATELIMIT_LOW_WATERMARK 未満になったら、リセットまでの時間を残り回数で割った間隔で送る
+    - 残りが 0 か 429 を受けたら、リセット（Retry-After）まで全スレッドを止める
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._not_before = 0.0
+        self._interval = 0.0
+        self._last_sent = 0.0
+
+    def wait(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                ready_at = max(self._not_before, self._last_sent + self._interval)
+                if now >= ready_at:
+                    self._last_sent = now
+                    return
+            time.sleep(ready_at - now)
+
+    def block_for(self, seconds):
+        with self._lock:
+            self._not_before = max(self._not_before, time.monotonic() + seconds)
+
+    def update(self, resp):
+        try:
+            remaining = float(resp.headers["x-ratelimit-remaining"])
+            reset = float(resp.headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            if remaining < 1:
+                self._not_before = max(self._not_before, time.monotonic() + reset)
+                self._interval = 0.0
+            elif remaining < RATELIMIT_LOW_WATERMARK:
+                self._interval = reset / remaining
+            else:
+                self._interval = 0.0
+
+
+class RedditRequestBudget:
+    """
+    1 回の実行で使ってよいリクエスト数（スレッド間で共有）。
+    collect_reddit_raw_data を複数回呼ぶ場合も同じものを渡せば、合計で limit 回までになる。
+    """
+
+    def __init__(self, limit):
+        self._lock = threading.Lock()
+        self.limit = limit
+        self.used = 0
+
+    @property
+    def remaining(self):
+        with self._lock:
+            return max(self.limit - self.used, 0)
+
+    def take(self):
+        """1 回分を使う。残っていなければ False。"""
+        with self._lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+class RedditPostStore:
+    """
+    取得した投稿を id ごとに SQLite に保存するストア。
+
+    posts に投稿のメタデータと最新の score / num_comments を、snapshots に観測ごとの値を残す。
+    apply() は新しい投稿と、既知の投稿の score / num_comments の変化（delta）に分けて返すので、
+    変化の無い投稿は下流の要約に回さずに済む。top_by_velocity() で直近 N 時間の score の伸びの順に引ける。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS posts (
+                    id TEXT PRIMARY KEY,
+                    group_name TEXT,
+                    subreddit TEXT,
+                    title TEXT,
+                    permalink TEXT,
+                    url TEXT,
+                    author TEXT,
+                    created_utc REAL,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    score INTEGER,
+                    num_comments INTEGER
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id TEXT NOT NULL,
+                    observed_at REAL NOT NULL,
+                    score INTEGER,
+                    num_comments INTEGER,
+                    PRIMARY KEY (id, observed_at)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_observed ON snapshots (observed_at)")
+
+    def apply(self, group_name, items, observed_at=None):
+        """
+        今回取得した投稿（normalize 済み、id 必須）を記録し、(新しい投稿, 既知の投稿の delta, 変化なしの件数) を返す。
+        delta は {"id", "score", "num_comments", "score_delta", "num_comments_delta", "since"}。
+        """
+        observed_at = time.time() if observed_at is None else observed_at
+        new_items, deltas = [], []
+        unchanged = 0
+        with self._conn:
+            for item in items:
+                post_id = item.get("id")
+                if not post_id:
+                    new_items.append(item)
+                    continue
+                row = self._conn.execute(
+                    "SELECT score, num_comments, last_seen FROM posts WHERE id = ?", (post_id,)
+                ).fetchone()
+                score = item.get("score") or 0
+                num_comments = item.get("num_comments") or 0
+                if row is None:
+                    new_items.append(item)
+                    self._conn.execute(
+                        """
+                        INSERT INTO posts (id, group_name, subreddit, title, permalink, url, author,
+                                           created_utc, first_seen, last_seen, score, num_comments)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            post_id, group_name, item.get("subreddit"), item.get("title"), item.get("permalink"),
+                            item.get("url"), item.get("author"), item.get("created_utc"),
+                            observed_at, observed_at, score, num_comments,
+                        ),
+                    )
+                else:
+                    if (row["score"], row["num_comments"]) == (score, num_comments):
+                        unchanged += 1
+                    else:
+                        deltas.append({
+                            "id": post_id,
+                            "score": score,
+                            "num_comments": num_comments,
+                            "score_delta": score - (row["score"] or 0),
+                            "num_comments_delta": num_comments - (row["num_comments"] or 0),
+                            "since": datetime.fromtimestamp(row["last_seen"], tz=timezone.utc).isoformat(),
+                        })
+                    self._conn.execute(
+                        "UPDATE posts SET last_seen = ?, score = ?, num_comments = ? WHERE id = ?",
+                        (observed_at, score, num_comments, post_id),
+                    )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (id, observed_at, score, num_comments) VALUES (?, ?, ?, ?)",
+                    (post_id, observed_at, score, num_comments),
+                )
+        return new_items, deltas, unchanged
+
+    def top_by_velocity(self, hours=6.0, limit=10, group_name=None, now=None):
+        """
+        直近 hours 時間の score の伸び（score / 時間）の大きい順に投稿を返す。
+        期間内に作られた投稿は作成時刻の score を 0 とし、それ以外は期間内の最初の観測と比べる。
+        """
+        now = time.time() if now is None else now
+        since = now - hours * 3600
+        rows = self._conn.execute(
+            """
+            WITH latest AS (
+                SELECT id, MAX(observed_at) AS t_now, score AS score_now
+                FROM snapshots WHERE observed_at >= ? GROUP BY id
+            ),
+            earliest AS (
+                SELECT id, MIN(observed_at) AS t_then, score AS score_then
+                FROM snapshots WHERE observed_at >= ? GROUP BY id
+            )
+            SELECT p.*, latest.t_now, latest.score_now,
+                   CASE WHEN p.created_utc >= ? THEN p.created_utc ELSE earliest.t_then END AS t_base,
+                   CASE WHEN p.created_utc >= ? THEN 0 ELSE earliest.score_then END AS score_base
+            FROM latest
+            JOIN earliest ON earliest.id = latest.id
+            JOIN posts p ON p.id = latest.id
+            WHERE ? IS NULL OR p.group_name = ?
+            """,
+            (since, since, since, since, group_name, group_name),
+        ).fetchall()
+
+        ranked = []
+        for row in rows:
+            elapsed_hours = (row["t_now"] - row["t_base"]) / 3600
+            velocity = (row["score_now"] - row["score_base"]) / elapsed_hours if elapsed_hours > 0 else 0.0
+            post = {k: row[k] for k in ("id", "group_name", "subreddit", "title", "permalink", "url", "score")}
+            post["score_velocity"] = round(velocity, 2)
+            ranked.append(post)
+        ranked.sort(key=lambda p: p["score_velocity"], reverse=True)
+        return ranked[:limit]
+
+    def close(self):
+        self._conn.close()
 
 
 def collect_reddit_raw_data(
@@ -13,52 +332,119 @@ def collect_reddit_raw_data(
     num_articles=2,
     retry_max=3,
     timeout=30,
-    user_agent="CodexAgent/1.0 (contact: example@example.com)"
+    user_agent="CodexAgent/1.0 (contact: example@example.com)",
+    groups=None,
+    rate_limiter=None,
+    post_store=None,
+    fetch_comments=False,
+    comment_request_budget=10,
+    comment_workers=4,
+    max_comment_depth=2,
+    max_comments_per_post=20,
+    comment_token_budget=1500,
 ):
     """
     Reddit JSON API から生データを収集
-    
+
     Args:
         tech_subs: tech カテゴリのサブレディットリスト（デフォルト: ["artificial", "compsci", "coding"]）
         news_subs: news カテゴリのサブレディットリスト（デフォルト: ["technology", "Futurology"]）
-        num_articles: 各グループから取得する記事数
+        num_articles: 各グループから取得する記事数（100 件を超える分は after カーソルで次のページを取る）
         retry_max: 最大リトライ回数
         timeout: タイムアウト秒数
         user_agent: User-Agent 文字列
-        
+        groups: {グループ名: サブレディットリスト}。指定すると tech_subs / news_subs の代わりに使う
+        rate_limiter: RedditRateLimiter（複数回の呼び出しでレート制限を共有したいときに渡す）
+        post_store: RedditPostStore か SQLite のパス。指定すると各グループには新しい投稿だけを入れ、
+            既知の投稿は "deltas" に score / num_comments の変化だけを入れる（変化なしの件数は "num_unchanged"）
+        fetch_comments: True なら各グループに入った投稿の上位コメントを "comments" に付ける
+            （要約のときにブラウズせずに議論の内容を渡せるようにする）
+        comment_request_budget: コメント取得に使うリクエスト数の上限（全グループ合計・再試行を含む。超えた投稿には付けない）。
+            RedditRequestBudget を渡すと複数回の呼び出しで同じ上限を使い切るまで共有する
+        comment_workers: コメントを同時に取得する数
+        max_comment_depth: 返信をたどる深さ（0 ならトップレベルのコメントだけ）
+        max_comments_per_post: 1 投稿あたりのコメント数の上限
+        comment_token_budget: 1 投稿あたりのコメント本文の token 数の上限（見積もり）
+
     Returns:
-        dict: {"tech": [...], "news": [...], "fetched_at": "..."}
+        dict: {"tech": [...], "news": [...], "fetched_at": "..."}（groups 指定時はそのグループ名がキー）
+
+    グループは同時に取得する（接続は共有 HTTP クライアントのプールを使う）。
+    429 / 5xx は Retry-After（無ければ 1, 2, 4... 秒）だけ待って再試行し、
+    x-ratelimit-* ヘッダで残りが少なくなったら間隔を空ける。
     """
-    if tech_subs is None:
-        tech_subs = ["artificial", "compsci", "coding"]
-    if news_subs is None:
-        news_subs = ["technology", "Futurology"]
-    
-    def fetch_group(subs):
-        combined = "+".join(subs)
-        url = f"https://www.reddit.com/r/{combined}/top.json?t=day&limit={num_articles}"
+    if groups is None:
+        if tech_subs is None:
+            tech_subs = ["artificial", "compsci", "coding"]
+        if news_subs is None:
+            news_subs = ["technology", "Futurology"]
+        groups = {"tech": tech_subs, "news": news_subs}
+    if rate_limiter is None:
+        rate_limiter = RedditRateLimiter()
+    client = get_default_client()
+
+    def fetch_json(url, parse=None, take_request=None):
+        """
+        url を取得して JSON を返す。parse を渡すと 200 のレスポンス（stream=True）を parse(resp) で読む。
+        take_request を渡すと再試行も含めて送るたびに呼び、False ならそこでやめて RuntimeError にする。
+        """
         last_exc = None
-        
+
         for attempt in range(1, retry_max + 1):
+            if take_request is not None and not take_request():
+                raise RuntimeError("リクエスト数の上限に達しました") from last_exc
+            rate_limiter.wait()
             try:
-                req = request.Request(url, headers={"User-Agent": user_agent})
-                with request.urlopen(req, timeout=timeout) as resp:
-                    if resp.status != 200:
-                        raise RuntimeError(f"HTTP {resp.status}")
-                    payload = resp.read()
-                return json.loads(payload)
-            except (error.URLError, error.HTTPError, RuntimeError, json.JSONDecodeError) as exc:
+                resp = client.get(
+                    url, headers={"User-Agent": user_agent}, timeout=timeout, stream=parse is not None
+                )
+                if getattr(resp, "cache_status", "miss") in ("miss", "bypass"):
+                    rate_limiter.update(resp)
+                if resp.status_code != 200:
+                    resp.close()
+                    retry_after = _retry_after_seconds(resp)
+                    if resp.status_code == 429 and retry_after is not None:
+                        # 他のグループのリクエストも止める
+                        rate_limiter.block_for(retry_after)
+                    if resp.status_code not in RETRY_STATUS_CODES:
+                        raise RuntimeError(f"HTTP {resp.status_code}")
+                    last_exc = RuntimeError(f"HTTP {resp.status_code}")
+                elif parse is not None:
+                    with resp:
+                        return parse(resp)
+                else:
+                    return json.loads(resp.content)
+            except (requests.RequestException, ValueError) as exc:
                 last_exc = exc
-                if attempt == retry_max:
-                    raise
-                time.sleep(1)
+                retry_after = None
+            if attempt == retry_max:
+                raise last_exc
+            wait = retry_after if retry_after is not None else 2.0 ** (attempt - 1)
+            time.sleep(min(wait, RETRY_MAX_WAIT_SEC))
         raise last_exc
-    
+
+    def fetch_group(subs):
+        combined = "+".join(subs)
+        children = []
+        after = None
+        while len(children) < num_articles:
+            limit = min(num_articles - len(children), REDDIT_PAGE_LIMIT)
+            url = f"https://www.reddit.com/r/{combined}/top.json?t=day&limit={limit}"
+            if after:
+                url += f"&after={after}"
+            page = fetch_json(url).get("data", {})
+            children.extend(page.get("children", []))
+            after = page.get("after")
+            if not after or not page.get("children"):
+                break
+        return {"data": {"children": children[:num_articles]}}
+
     def normalize(items):
         normalized = []
         for child in items.get("data", {}).get("children", []):
             data = child.get("data", {})
             normalized.append({
+                "id": data.get("id"),
                 "title": data.get("title"),
                 "permalink": data.get("permalink"),
                 "url": data.get("url"),
@@ -69,40 +455,123 @@ def collect_reddit_raw_data(
                 "num_comments": data.get("num_comments"),
             })
         return normalized
-    
+
     def to_iso(ts):
         if ts is None:
             return None
         return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
-    
-    # データ取得
-    tech_raw = fetch_group(tech_subs)
-    news_raw = fetch_group(news_subs)
-    
-    tech_items = normalize(tech_raw)
-    news_items = normalize(news_raw)
-    
-    result = {
-        "tech": [
-            {**item, "created_iso": to_iso(item.get("created_utc"))}
-            for item in tech_items
-        ],
-        "news": [
+
+    # データ取得（グループごとに並列）
+    with ThreadPoolExecutor(max_workers=max(len(groups), 1)) as executor:
+        futures = {name: executor.submit(fetch_group, subs) for name, subs in groups.items()}
+        raw_by_group = {name: future.result() for name, future in futures.items()}
+
+    items_by_group = {
+        name: [
             {**item, "created_iso": to_iso(item.get("created_utc"))}
-            for item in news_items
-        ],
-        "fetched_at": datetime.now(tz=timezone.utc).isoformat(),
+            for item in normalize(raw)
+        ]
+        for name, raw in raw_by_group.items()
     }
-    
+
+    if post_store is None:
+        result = dict(items_by_group)
+    else:
+        store = post_store if isinstance(post_store, RedditPostStore) else RedditPostStore(post_store)
+        try:
+            result = {}
+            deltas, num_unchanged = {}, {}
+            observed_at = time.time()
+            for name, items in items_by_group.items():
+                result[name], deltas[name], num_unchanged[name] = store.apply(name, items, observed_at)
+            result["deltas"] = deltas
+            result["num_unchanged"] = num_unchanged
+        finally:
+            if store is not post_store:
+                store.close()
+
+    if fetch_comments:
+        budget = (
+            comment_request_budget
+            if isinstance(comment_request_budget, RedditRequestBudget)
+            else RedditRequestBudget(comment_request_budget)
+        )
+        count_lock = threading.Lock()
+        num_requests = [0]
+
+        def take_request():
+            # 429 / 5xx の再試行も 1 回として予算から引く
+            if not budget.take():
+                return False
+            with count_lock:
+                num_requests[0] += 1
+            return True
+
+        def parse_comments(resp):
+            return _collect_comments(
+                _read_listing_children(resp), max_comment_depth, max_comments_per_post, comment_token_budget
+            )
+
+        def attach_comments(item):
+            permalink = item.get("permalink")
+            if not permalink or not budget.remaining:
+                return
+            url = (
+                f"https://www.reddit.com{permalink.rstrip('/')}.json"
+                f"?sort=top&limit={max_comments_per_post}&depth={max_comment_depth + 1}"
+            )
+            try:
+                item["comments"] = fetch_json(url, parse=parse_comments, take_request=take_request)
+            except Exception as exc:
+                print(f"[WARNING] comment fetch failed: {permalink}: {exc}", file=sys.stderr)
+
+        # 各グループの上位から順に予算を使う
+        selected = [item for name in raw_by_group for item in result[name]]
+        with ThreadPoolExecutor(max_workers=max(comment_workers, 1)) as executor:
+            list(executor.map(attach_comments, selected))
+        result["num_comment_requests"] = num_requests[0]
+
+    result["fetched_at"] = datetime.now(tz=timezone.utc).isoformat()
+
     return result
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reddit の top 投稿を収集して JSON で出力する")
+    parser.add_argument("--num-articles", type=int, default=2, help="各グループから取得する記事数")
+    parser.add_argument("--store", type=Path, default=None, help="投稿を保存する SQLite（新しい投稿と delta だけを出力する）")
+    parser.add_argument(
+        "--velocity-hours",
+        type=float,
+        default=None,
+        help="取得せずに --store から直近 N 時間の score の伸びの上位を出力する",
+    )
+    parser.add_argument("--limit", type=int, default=10, help="--velocity-hours で出力する件数")
+    parser.add_argument("--comments", action="store_true", help="各投稿の上位コメントも取得する")
+    parser.add_argument("--comment-budget", type=int, default=10, help="コメント取得に使うリクエスト数の上限")
+    return parser.parse_args()
+
+
 def main():
     """スタンドアロン実行用（テスト）"""
-    result = collect_reddit_raw_data()
+    args = parse_args()
+    if args.velocity_hours is not None:
+        if args.store is None:
+            raise SystemExit("--velocity-hours には --store が必要です")
+        store = RedditPostStore(args.store)
+        try:
+            result = store.top_by_velocity(hours=args.velocity_hours, limit=args.limit)
+        finally:
+            store.close()
+    else:
+        result = collect_reddit_raw_data(
+            num_articles=args.num_articles,
+            post_store=args.store,
+            fetch_comments=args.comments,
+            comment_request_budget=args.comment_budget,
+        )
     print(json.dumps(result, ensure_ascii=False, indent=2))
 
 
 if __name__ == "__main__":
     main()
-
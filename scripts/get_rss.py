@@ -3,16 +3,66 @@
 
 from __future__ import annotations
 
+import argparse
+import codecs
+import hashlib
+import json
 import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
+from html.parser import HTMLParser
+from xml.etree import ElementTree
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
 import feedparser
+from feedparser.datetimes import _parse_date as _feedparser_parse_date
 import requests
 from bs4 import BeautifulSoup
 
+try:
+    from http_client import HttpClient
+except ImportError:
+    from scripts.http_client import HttpClient
+
+try:
+    # C 実装のパーサ。無ければ標準ライブラリの HTMLParser で読む
+    from lxml import etree as _lxml_etree
+except ImportError:
+    _lxml_etree = None
+
+# 記事本文ページから読む最大バイト数（meta description も段落も見つからなければここで打ち切る）
+ARTICLE_MAX_BYTES = 512 * 1024
+ARTICLE_MAX_PARAGRAPHS = 6
+
+# 同じ記事の URL から落とすトラッキング用クエリ（utm_* は前方一致で落とす）
+_TRACKING_PARAMS = {"fbclid", "gclid", "ref", "ref_src", "source", "mc_cid", "mc_eid", "sk"}
+
+# フィードの取得間隔（adaptive polling）。更新の見込みが薄いフィードでも、この時間が経てば必ず取り直す
+FEED_FORCE_REFRESH_HOURS = 24.0
+# 更新間隔の推定に使う直近の公開時刻の数
+FEED_HISTORY_SIZE = 20
+# cutoff より古いエントリに着いてからも読むエントリ数。固定表示・更新された記事が古い記事の後ろに
+# 並んでいるフィードで、期間内のエントリを取りこぼさないようにする
+FEED_CUTOFF_LOOKAHEAD = 3
+
+# ストリーミングでパースする RSS / Atom の要素（名前空間を外したローカル名）
+_FEED_ROOTS = {"rss", "feed", "RDF"}
+_FEED_ITEMS = {"item", "entry"}
+_ATOM_NS = "http://www.w3.org/2005/Atom"
+_CONTENT_NS = "http://purl.org/rss/1.0/modules/content/"
+_RDF_ABOUT = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about"
+# title / link / description などを読む名前空間（RSS 2.0 は名前空間なし、RSS 1.0、Atom）。
+# media:title や media:content などは読まない
+_CORE_NS = {"", "http://purl.org/rss/1.0/", _ATOM_NS}
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+
 
 @dataclass
 class FeedEntry:
@@ -48,30 +98,618 @@ def _parse_entry_datetime(entry) -> Optional[datetime]:
     return None
 
 
-def _extract_article_text(entry, url: str, session: requests.Session) -> str:
+class _StdlibArticleScan(HTMLParser):
+    """meta description と先頭の <p> の文字列を少しずつ読みながら集める（標準ライブラリ版）。"""
+
+    def __init__(self, max_paragraphs: int) -> None:
+        super().__init__(convert_charrefs=True)
+        self.max_paragraphs = max_paragraphs
+        self.description: Optional[str] = None
+        self.paragraphs: List[str] = []
+        self._parts: Optional[List[str]] = None
+
+    @property
+    def done(self) -> bool:
+        return self.description is not None or len(self.paragraphs) >= self.max_paragraphs
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag == "meta" and self.description is None:
+            attrs = dict(attrs)
+            content = (attrs.get("content") or "").strip()
+            if attrs.get("name") == "description" and content:
+                self.description = content
+        elif tag == "p":
+            # 閉じタグの無い <p> は次の <p> で閉じたものとみなす
+            self._close_paragraph()
+            self._parts = []
+
+    def handle_endtag(self, tag) -> None:
+        if tag == "p":
+            self._close_paragraph()
+
+    def handle_data(self, data) -> None:
+        if self._parts is not None:
+            self._parts.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._close_paragraph()
+
+    def _close_paragraph(self) -> None:
+        if self._parts is None:
+            return
+        # BeautifulSoup の get_text(" ", strip=True) と同じ連結
+        self.paragraphs.append(" ".join(t.strip() for t in self._parts if t.strip()))
+        self._parts = None
+
+
+class _LxmlArticleScan:
+    """_StdlibArticleScan と同じものを lxml の HTMLPullParser で集める。"""
+
+    def __init__(self, max_paragraphs: int) -> None:
+        self.max_paragraphs = max_paragraphs
+        self.description: Optional[str] = None
+        self.paragraphs: List[str] = []
+        self._parser = _lxml_etree.HTMLPullParser(events=("start", "end"))
+
+    @property
+    def done(self) -> bool:
+        return self.description is not None or len(self.paragraphs) >= self.max_paragraphs
+
+    def feed(self, text: str) -> None:
+        self._parser.feed(text)
+        for event, element in self._parser.read_events():
+            if event == "start" and element.tag == "meta" and self.description is None:
+                content = (element.get("content") or "").strip()
+                if element.get("name") == "description" and content:
+                    self.description = content
+            elif event == "end" and element.tag == "p":
+                self.paragraphs.append(" ".join(t.strip() for t in element.itertext() if t.strip()))
+            if self.done:
+                return
+
+    def close(self) -> None:
+        try:
+            self._parser.close()
+        except _lxml_etree.XMLSyntaxError:
+            pass
+
+
+def _response_encoding(resp: requests.Response, head: bytes) -> str:
+    """Content-Type の charset → 先頭の <meta charset> → UTF-8 の順で文字コードを決める。"""
+    if "charset=" in resp.headers.get("Content-Type", "").lower() and resp.encoding:
+        return resp.encoding
+    m = _META_CHARSET_RE.search(head)
+    if m:
+        try:
+            return codecs.lookup(m.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    同じ記事を同じキーにするための URL 正規化。
+    スキーム・ホストを小文字にし、フラグメントとトラッキング用クエリを落とし、残りのクエリを並べ替える。
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def _entry_content_hash(entry) -> str:
+    """タイトルと summary から作るハッシュ。同じ URL でも内容が更新されたら変わる。"""
+    title = getattr(entry, "title", "") or ""
+    summary = getattr(entry, "summary", "") or ""
+    return hashlib.sha256(f"{title}\n{summary}".encode("utf-8")).hexdigest()
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _to_iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _from_iso(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+
+
+def _next_feed_check(
+    published: List[datetime],
+    checked_at: datetime,
+    force_refresh: timedelta,
+) -> tuple[Optional[timedelta], datetime]:
+    """
+    公開時刻の履歴から (推定更新間隔, 次に取得する時刻) を決める。時刻はすべて naive な UTC。
+
+    - 更新間隔は直近の公開時刻の間隔の中央値（公開時刻が 1 つだけなら、その記事の経過時間）
+    - 次の更新の見込み（最新の公開時刻 + 間隔）までは取得しない
+    - 見込みを過ぎても更新が無ければ、間隔の 1/4 ごとに取得する
+    - どの場合も checked_at + force_refresh までには取得する
+    公開時刻が無いフィードは毎回取得する。
+    """
+    if not published:
+        return None, checked_at
+    times = sorted(published)
+    if len(times) >= 2:
+        gaps = sorted(b - a for a, b in zip(times, times[1:]))
+        interval = gaps[len(gaps) // 2]
+    else:
+        interval = checked_at - times[-1]
+    if interval <= timedelta(0):
+        return interval, checked_at
+    next_check = max(times[-1] + interval, checked_at + interval / 4)
+    return interval, min(next_check, checked_at + force_refresh)
+
+
+class SeenEntryIndex:
+    """
+    一度見た RSS エントリを SQLite に記録する索引。
+
+    canonical URL ごとに entry id・内容ハッシュ・初めて見た時刻（first_seen）・
+    最後にレポートへ出した時刻（last_reported）と、抽出済みの本文を持つ。
+    - 同じ内容ハッシュで本文があれば記事ページを取りに行かない
+    - レポート済み（かつ内容が変わっていない）エントリは only_new で候補から外せる
+    - runs に収集時刻を残すので「前回の実行以降に初めて見たエントリ」を引ける
+    時刻はすべて UTC の ISO 8601 文字列（文字列比較で前後が決まる）。
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    canonical_url TEXT PRIMARY KEY,
+                    entry_id TEXT,
+                    content_hash TEXT NOT NULL,
+                    title TEXT,
+                    feed_name TEXT,
+                    category TEXT,
+                    text TEXT,
+                    first_seen TEXT NOT NULL,
+                    last_reported TEXT,
+                    reported_hash TEXT
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_first_seen ON entries (first_seen)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS runs (run_at TEXT PRIMARY KEY)")
+            # フィードごとの公開時刻の履歴と取得スケジュール
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS feed_posts (
+                    feed_url TEXT NOT NULL,
+                    published_at TEXT NOT NULL,
+                    PRIMARY KEY (feed_url, published_at)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS feeds (
+                    feed_url TEXT PRIMARY KEY,
+                    last_checked TEXT NOT NULL,
+                    last_published TEXT,
+                    interval_sec REAL,
+                    next_check_at TEXT NOT NULL
+                )
+                """
+            )
+
+    def get(self, canonical_url: str) -> Optional[sqlite3.Row]:
+        return self._conn.execute(
+            "SELECT * FROM entries WHERE canonical_url = ?", (canonical_url,)
+        ).fetchone()
+
+    def is_reported(self, canonical_url: str, content_hash: str) -> bool:
+        """この内容のままレポートに出したことがあるか（内容が更新されていれば False）。"""
+        row = self.get(canonical_url)
+        return bool(row and row["last_reported"] and row["reported_hash"] == content_hash)
+
+    def cached_text(self, canonical_url: str, content_hash: str) -> Optional[str]:
+        row = self.get(canonical_url)
+        if row is None or row["content_hash"] != content_hash:
+            return None
+        return row["text"]
+
+    def record(
+        self,
+        canonical_url: str,
+        *,
+        entry_id: Optional[str],
+        content_hash: str,
+        title: Optional[str] = None,
+        feed_name: Optional[str] = None,
+        category: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> None:
+        """エントリを記録する。first_seen は初回だけ入り、内容ハッシュが変わったら本文は捨てる。"""
+        with self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO entries
+                    (canonical_url, entry_id, content_hash, title, feed_name, category, text, first_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(canonical_url) DO UPDATE SET
+                    entry_id = excluded.entry_id,
+                    title = excluded.title,
+                    feed_name = excluded.feed_name,
+                    category = excluded.category,
+                    text = CASE
+                        WHEN excluded.text IS NOT NULL THEN excluded.text
+                        WHEN entries.content_hash = excluded.content_hash THEN entries.text
+                        ELSE NULL
+                    END,
+                    content_hash = excluded.content_hash
+                """,
+                (canonical_url, entry_id, content_hash, title, feed_name, category, text, _utc_now_iso()),
+            )
+
+    def mark_reported(self, canonical_urls: Iterable[str]) -> None:
+        now = _utc_now_iso()
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE entries SET last_reported = ?, reported_hash = content_hash WHERE canonical_url = ?",
+                [(now, url) for url in canonical_urls],
+            )
+
+    def start_run(self) -> Optional[str]:
+        """今回の収集時刻を記録し、前回の収集時刻（初回は None）を返す。"""
+        row = self._conn.execute("SELECT MAX(run_at) AS run_at FROM runs").fetchone()
+        with self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO runs (run_at) VALUES (?)", (_utc_now_iso(),))
+        return row["run_at"] if row else None
+
+    def new_since(self, since: Optional[str]) -> List[sqlite3.Row]:
+        """since より後に初めて見たエントリ（since=None なら全件）。first_seen の古い順。"""
+        if since is None:
+            return self._conn.execute("SELECT * FROM entries ORDER BY first_seen").fetchall()
+        return self._conn.execute(
+            "SELECT * FROM entries WHERE first_seen > ? ORDER BY first_seen", (since,)
+        ).fetchall()
+
+    def record_feed_check(
+        self,
+        feed_url: str,
+        published: Iterable[datetime],
+        force_refresh: timedelta = timedelta(hours=FEED_FORCE_REFRESH_HOURS),
+    ) -> None:
+        """取得できたフィードの公開時刻（naive な UTC）を履歴に足し、次に取得する時刻を決め直す。"""
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO feed_posts (feed_url, published_at) VALUES (?, ?)",
+                [(feed_url, _to_iso(dt)) for dt in published if dt <= now],
+            )
+            rows = self._conn.execute(
+                "SELECT published_at FROM feed_posts WHERE feed_url = ? ORDER BY published_at DESC LIMIT ?",
+                (feed_url, FEED_HISTORY_SIZE),
+            ).fetchall()
+            history = [_from_iso(r["published_at"]) for r in rows]
+            interval, next_check = _next_feed_check(history, now, force_refresh)
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO feeds
+                    (feed_url, last_checked, last_published, interval_sec, next_check_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    feed_url,
+                    _to_iso(now),
+                    _to_iso(max(history)) if history else None,
+                    interval.total_seconds() if interval is not None else None,
+                    _to_iso(next_check),
+                ),
+            )
+
+    def due_feeds(self, feed_urls: Iterable[str]) -> tuple[List[str], List[str]]:
+        """
+        (今回取得するフィード, 飛ばすフィード) に分ける。
+        取得するフィードは予定時刻を過ぎている順（初めてのフィードが先頭）に並べる。
+        """
+        now = _utc_now_iso()
+        due: List[tuple[str, str]] = []
+        skipped: List[str] = []
+        for url in dict.fromkeys(feed_urls):
+            row = self._conn.execute(
+                "SELECT next_check_at FROM feeds WHERE feed_url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                due.append(("", url))
+            elif row["next_check_at"] <= now:
+                due.append((row["next_check_at"], url))
+            else:
+                skipped.append(url)
+        return [url for _, url in sorted(due)], skipped
+
+    def feed_schedule(self) -> List[Dict[str, object]]:
+        """フィードごとの取得スケジュール（次に取得する時刻の早い順）。"""
+        rows = self._conn.execute("SELECT * FROM feeds ORDER BY next_check_at").fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _extract_article_text(
+    entry,
+    url: str,
+    client: HttpClient,
+    max_bytes: int = ARTICLE_MAX_BYTES,
+    max_paragraphs: int = ARTICLE_MAX_PARAGRAPHS,
+) -> str:
     # 1) エントリの summary
     if hasattr(entry, "summary") and entry.summary:
         return BeautifulSoup(entry.summary, "html.parser").get_text(" ", strip=True)
 
     # 2) 本文ページから抽出（meta description → pタグ前方）
+    #    ページ全体は読まず、meta description か max_paragraphs 個の <p> が揃った時点
+    #    （どちらも無ければ max_bytes）で読むのをやめる
     try:
-        resp = session.get(url, timeout=15)
-        if resp.status_code != 200:
-            return ""
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        meta_desc = soup.find("meta", attrs={"name": "description"})
-        if meta_desc and meta_desc.get("content"):
-            return str(meta_desc.get("content")).strip()
-
-        paragraphs = soup.find_all("p")
-        if paragraphs:
-            texts = [p.get_text(" ", strip=True) for p in paragraphs[:6]]
-            return "\n".join([t for t in texts if t])
+        with client.get(url, timeout=15, stream=True) as resp:
+            if resp.status_code != 200:
+                return ""
+            content_type = resp.headers.get("Content-Type", "").lower()
+            if content_type and "html" not in content_type and "xml" not in content_type:
+                return ""
+
+            if _lxml_etree is not None:
+                scan = _LxmlArticleScan(max_paragraphs)
+            else:
+                scan = _StdlibArticleScan(max_paragraphs)
+            decoder = None
+            received = 0
+            for chunk in resp.iter_content(chunk_size=16 * 1024):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(_response_encoding(resp, chunk))(errors="replace")
+                received += len(chunk)
+                scan.feed(decoder.decode(chunk))
+                if scan.done or received >= max_bytes:
+                    break
+            scan.close()
     except Exception:
         return ""
 
-    return ""
+    if scan.description:
+        return scan.description
+    texts = scan.paragraphs[:max_paragraphs]
+    return "\n".join([t for t in texts if t])
+
+
+def _split_tag(tag: str) -> tuple[str, str]:
+    """'{namespace}local' を (namespace, local) に。"""
+    if tag.startswith("{"):
+        ns, _, local = tag[1:].partition("}")
+        return ns, local
+    return "", tag
+
+
+def _element_text(elem) -> str:
+    """要素の中身。Atom の type="xhtml" のように子要素を持つ場合はマークアップごと返す。"""
+    if len(elem) == 0:
+        return (elem.text or "").strip()
+    inner = (elem.text or "") + "".join(
+        ElementTree.tostring(child, encoding="unicode") for child in elem
+    )
+    return inner.strip()
+
+
+def _stream_entry(elem, base_url: str):
+    """<item> / <entry> 要素を feedparser のエントリと同じキーを持つ FeedParserDict にする。"""
+    entry = feedparser.FeedParserDict()
+    content = ""
+    for child in elem:
+        ns, name = _split_tag(child.tag)
+        if ns == _CONTENT_NS and name == "encoded":
+            content = content or _element_text(child)
+            continue
+        if name == "date" and "dc" in ns:
+            parsed = _feedparser_parse_date(_element_text(child))
+            if parsed:
+                entry.setdefault("published_parsed", parsed)
+            continue
+        if ns not in _CORE_NS:
+            continue
+        if name == "title":
+            entry["title"] = _element_text(child)
+        elif name == "link":
+            href = child.get("href")
+            if href is None:
+                entry.setdefault("link", _element_text(child))
+            elif child.get("rel", "alternate") == "alternate":
+                entry.setdefault("link", href)
+        elif name in ("guid", "id"):
+            entry["id"] = _element_text(child)
+        elif name in ("description", "summary"):
+            entry["summary"] = _element_text(child)
+        elif name == "content":
+            content = content or _element_text(child)
+        elif name in ("pubDate", "published", "issued"):
+            parsed = _feedparser_parse_date(_element_text(child))
+            if parsed:
+                entry["published_parsed"] = parsed
+        elif name in ("updated", "modified"):
+            parsed = _feedparser_parse_date(_element_text(child))
+            if parsed:
+                entry["updated_parsed"] = parsed
+    if "id" not in entry and elem.get(_RDF_ABOUT):
+        entry["id"] = elem.get(_RDF_ABOUT)
+    # feedparser と同じく link / id の相対 URL はフィードの URL から解決する
+    for key in ("link", "id"):
+        if key in entry:
+            entry[key] = urljoin(base_url, entry[key])
+    if not entry.get("summary") and content:
+        entry["summary"] = content
+    return entry
+
+
+def _stream_parse_feed(
+    resp: requests.Response,
+    cutoff: Optional[datetime],
+    limit: Optional[int],
+    chunk_size: int = 16 * 1024,
+):
+    """
+    RSS / Atom をレスポンスから少しずつ読みながらパースする。
+    エントリが新しい順に並んでいる間は、
+    - cutoff より古いエントリに着いてから、さらに FEED_CUTOFF_LOOKAHEAD 件読んだ時点
+    - cutoff 以降のエントリが limit 件そろった時点
+    でパースをやめる（残りのエントリのオブジェクトは作らない）。
+    cutoff の後の FEED_CUTOFF_LOOKAHEAD 件に新しいエントリが紛れていたら新しい順ではないとみなし、最後まで読む。
+    cutoff で止めた場合、読んだ期間外のエントリも entries に含める。
+    RSS / Atom として読めなかった場合は None を返す。
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    feed = feedparser.FeedParserDict()
+    entries: List[object] = []
+    depth = 0
+    in_item = False
+    date_sorted = True
+    previous_dt: Optional[datetime] = None
+    num_recent = 0
+    # 最初の期間外のエントリから数えて読んだエントリ数
+    num_past_cutoff = 0
+    stopped_early = False
+
+    def finish():
+        return feedparser.FeedParserDict(
+            feed=feed, entries=entries, bozo=False, streamed=True, stopped_early=stopped_early
+        )
+
+    try:
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                _, name = _split_tag(elem.tag)
+                if event == "start":
+                    if depth == 0 and name not in _FEED_ROOTS:
+                        return None
+                    depth += 1
+                    in_item = in_item or name in _FEED_ITEMS
+                    continue
+
+                depth -= 1
+                if name in _FEED_ITEMS:
+                    in_item = False
+                    entry = _stream_entry(elem, resp.url)
+                    elem.clear()
+                    entries.append(entry)
+                    dt = _parse_entry_datetime(entry)
+                    if dt is not None:
+                        if previous_dt is not None and dt > previous_dt:
+                            date_sorted = False
+                        previous_dt = dt
+                    if not date_sorted:
+                        continue
+                    if num_past_cutoff or (cutoff is not None and dt is not None and dt < cutoff):
+                        # 期間外のエントリも更新間隔の推定用に残す（期間での絞り込みは呼び出し側）
+                        num_past_cutoff += 1
+                        if num_past_cutoff > FEED_CUTOFF_LOOKAHEAD:
+                            stopped_early = True
+                            return finish()
+                        continue
+                    num_recent += 1
+                    if limit is not None and num_recent >= limit:
+                        stopped_early = True
+                        return finish()
+                elif name == "title" and not in_item and "title" not in feed:
+                    feed["title"] = _element_text(elem)
+        parser.close()
+    except ElementTree.ParseError:
+        return None
+    return finish()
+
+
+def _fetch_feed(
+    feed_url: str,
+    client: HttpClient,
+    timeout: float,
+    cutoff: Optional[datetime] = None,
+    limit: Optional[int] = None,
+):
+    """
+    フィードを取得してパースする（同じホストへの同時接続数は client が制限する）。
+    本文はキャッシュできるように最後まで取得し（変わっていなければ 304 かキャッシュで済む）、
+    パースはストリーミングで cutoff / limit に届いた時点でやめる。
+    壊れたフィードや RSS / Atom 以外は feedparser で全体をパースする。
+    """
+    with client.get(feed_url, timeout=timeout) as resp:
+        resp.raise_for_status()
+        parsed = _stream_parse_feed(resp, cutoff, limit)
+        if parsed is not None:
+            return parsed
+        body = resp.content
+    # 取得済みの bytes をパースする（feedparser 自身には取りに行かせない）。
+    # content-type は文字コード判定、content-location は相対リンクの解決に使われる
+    return feedparser.parse(
+        body,
+        response_headers={
+            "content-type": resp.headers.get("Content-Type", ""),
+            "content-location": resp.url,
+        },
+    )
+
+
+def _fetch_feeds(
+    feed_urls: List[str],
+    client: HttpClient,
+    max_workers: int,
+    timeout: float,
+    deadline_sec: Optional[float],
+    cutoff: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, object]:
+    """
+    フィードを並列に取得・パースして {feed_url: parsed} を返す。
+    cutoff / limit はストリーミングパースの打ち切り条件（_stream_parse_feed）。
+    取得に失敗したフィードと、deadline_sec までに終わらなかったフィードは結果に含めない（部分的な結果を返す）。
+    """
+    deadline = time.monotonic() + deadline_sec if deadline_sec is not None else None
+
+    # with 文にすると締め切り後も遅いフィードの完了を待ってしまうので、明示的に shutdown する
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {
+        executor.submit(_fetch_feed, url, client, timeout, cutoff, limit): url
+        for url in dict.fromkeys(feed_urls)
+    }
+    results: Dict[str, object] = {}
+    pending = set(futures)
+    try:
+        while pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except Exception as exc:
+                    print(f"[WARNING] feed fetch failed: {url}: {exc}", file=sys.stderr)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if pending:
+        skipped = ", ".join(sorted(futures[f] for f in pending))
+        print(f"[WARNING] feed deadline ({deadline_sec}s) exceeded; skipped: {skipped}", file=sys.stderr)
+    return results
 
 
 def _split_sentences(text: str, max_sentences: int) -> List[str]:
@@ -87,82 +725,261 @@ def collect_rss_sources(
     feed_file: Path,
     days: int = 2,     # 1日だと取れないことが多かったので2日にした
     limit_per_feed: int = 3,
+    max_workers: int = 8,
+    per_host_limit: int = 2,
+    fetch_timeout: float = 15.0,
+    deadline_sec: Optional[float] = 60.0,
+    seen_index: Optional[Union[str, Path, SeenEntryIndex]] = None,
+    only_new: bool = False,
+    adaptive_polling: bool = True,
+    force_refresh_hours: float = FEED_FORCE_REFRESH_HOURS,
+    http_client: Optional[HttpClient] = None,
 ) -> Dict[str, object]:
-    """RSSソースを機械的に収集して生データJSONを返す。LLM処理は含まない。"""
+    """RSSソースを機械的に収集して生データJSONを返す。LLM処理は含まない。
+
+    フィードは max_workers 本まで並列に取得する（同じホストへは per_host_limit 本まで）。
+    取得は http_client（省略時はディスクキャッシュ付きの HttpClient を作る）を通すので、
+    変わっていないフィード・記事ページは 304 かキャッシュで済む。
+    各取得は fetch_timeout 秒で打ち切り、deadline_sec 秒を過ぎたら終わっていないフィードを
+    飛ばしてそれまでの結果で続ける。
+
+    seen_index（SQLite のパスか SeenEntryIndex）を渡すと、期間内のエントリを記録し、
+    内容が変わっていないエントリは記事ページを取り直さずに記録済みの本文を使う。
+    レポート済みの記録はここでは行わない。レポートを書き終えてから、載せた sources を
+    mark_sources_reported(seen_index, sources) で記録する（書く前に失敗した記事を既出扱いにしない）。
+    only_new=True ならレポート済みのエントリを候補から外す（前日のレポートと同じ記事を選ばない）。
+
+    only_new=True かつ adaptive_polling=True なら、フィードごとの公開時刻の履歴から
+    次の更新の見込みを立て、まだ更新されそうにないフィードは取得しない（_next_feed_check）。
+    どのフィードも force_refresh_hours（収集期間 days の半分が上限）ごとには取り直すので、
+    期間内に公開された新しい記事は取りこぼさない。only_new=False では期間内の既出のエントリも
+    候補に入れるため、フィードは飛ばさない（スケジュールの記録だけ行う）。
+    スケジュールは SeenEntryIndex.feed_schedule() で見られる。
+    """
+    if only_new and seen_index is None:
+        raise ValueError("only_new=True には seen_index が必要です")
     config = _read_feed_config(feed_file)
+    index: Optional[SeenEntryIndex] = None
+    if seen_index is not None:
+        index = seen_index if isinstance(seen_index, SeenEntryIndex) else SeenEntryIndex(seen_index)
+    owns_client = http_client is None
+    try:
+        previous_run = index.start_run() if index is not None else None
+
+        all_feed_urls = [u for urls in config.values() for u in urls]
+        if owns_client:
+            # ホストごとの接続を per_host_limit 本まで使い回す
+            num_hosts = len({urlsplit(u).netloc for u in all_feed_urls})
+            http_client = HttpClient(per_host_limit=per_host_limit, max_hosts=max(num_hosts, 10))
+        cutoff = datetime.now() - timedelta(days=days)
+        feed_urls_to_fetch = all_feed_urls
+        skipped_feeds: List[str] = []
+        force_refresh = min(timedelta(hours=force_refresh_hours), timedelta(days=days) / 2)
+        if index is not None and adaptive_polling and only_new:
+            # 飛ばしたフィードの既出エントリは候補に戻せないので、既出を外す only_new のときだけ飛ばす
+            feed_urls_to_fetch, skipped_feeds = index.due_feeds(all_feed_urls)
+            if skipped_feeds:
+                print(
+                    f"[INFO] adaptive polling: {len(skipped_feeds)}/{len(set(all_feed_urls))} feeds not due yet",
+                    file=sys.stderr,
+                )
+        fetched = _fetch_feeds(
+            feed_urls_to_fetch,
+            http_client,
+            max_workers=max_workers,
+            timeout=fetch_timeout,
+            deadline_sec=deadline_sec,
+            cutoff=cutoff,
+            # only_new ではレポート済みを後から外すので、件数では打ち切らない（cutoff だけで止める）
+            limit=None if only_new else limit_per_feed,
+        )
+        if index is not None:
+            for feed_url, parsed in fetched.items():
+                published = [_parse_entry_datetime(e) for e in getattr(parsed, "entries", [])]
+                index.record_feed_check(feed_url, [dt for dt in published if dt is not None], force_refresh)
+
+        sources: List[Dict[str, object]] = []
+        num_skipped_reported = 0
+
+        for category, feed_urls in config.items():
+            category_entries: list[tuple[datetime, str, object]] = []  # (date, feed_name, entry)
+
+            for feed_url in feed_urls:
+                parsed = fetched.get(feed_url)
+                if parsed is None:
+                    continue
+                try:
+                    feed_name = (
+                        parsed.feed.title if hasattr(parsed, "feed") and hasattr(parsed.feed, "title") else feed_url
+                    )
+                    entries = list(getattr(parsed, "entries", []))
+
+                    filtered_per_feed: list[tuple[datetime, object]] = []
+                    for e in entries:
+                        dt = _parse_entry_datetime(e)
+                        if dt is None or dt >= cutoff:
+                            if index is not None and getattr(e, "link", None):
+                                canonical = canonicalize_url(e.link)
+                                content_hash = _entry_content_hash(e)
+                                index.record(
+                                    canonical,
+                                    entry_id=getattr(e, "id", None),
+                                    content_hash=content_hash,
+                                    title=getattr(e, "title", None),
+                                    feed_name=feed_name,
+                                    category=category,
+                                )
+                                if only_new and index.is_reported(canonical, content_hash):
+                                    num_skipped_reported += 1
+                                    continue
+                            filtered_per_feed.append((dt or datetime.now(), e))
+
+                    filtered_per_feed.sort(key=lambda x: x[0], reverse=True)
+
+                    for dt, e in filtered_per_feed[:limit_per_feed]:
+                        category_entries.append((dt, feed_name, e))
+
+                except Exception:
+                    continue
+
+            # Sort all entries for the category by date
+            category_entries.sort(key=lambda x: x[0], reverse=True)
+
+            processed_entries: list[tuple[str, object]] = [(feed_name, e) for dt, feed_name, e in category_entries]
+
+            # 量が多いのでZenn と Qiita は最新1件に絞る
+            # →やっぱり量が多いので、すべてのカテゴリで最新1件だけに絞る
+            if True:
+                if processed_entries:
+                    # category_entries は新しい順にソート済み → 先頭を採用
+                    processed_entries = processed_entries[:1]
+
+            for feed_name, e in processed_entries:
+                url = getattr(e, "link", None)
+                if not url:
+                    continue
+                title = getattr(e, "title", "無題")
+                published_at = _parse_entry_datetime(e)
+                if index is not None:
+                    canonical = canonicalize_url(url)
+                    content_hash = _entry_content_hash(e)
+                    text = index.cached_text(canonical, content_hash)
+                    if text is None:
+                        text = _extract_article_text(e, url, http_client)
+                        index.record(
+                            canonical,
+                            entry_id=getattr(e, "id", None),
+                            content_hash=content_hash,
+                            title=title,
+                            feed_name=feed_name,
+                            category=category,
+                            text=text,
+                        )
+                else:
+                    text = _extract_article_text(e, url, http_client)
+
+                sources.append(
+                    {
+                        "feed_name": feed_name,
+                        "category": category,
+                        "title": title,
+                        "url": url,
+                        "date": published_at.strftime("%Y-%m-%dT%H:%M:%S") if published_at else None,
+                        "text": text,
+                    }
+                )
 
-    session = requests.Session()
-    session.headers.update(
-        {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36"
+        now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        result: Dict[str, object] = {
+            "generated_at": now_utc,
+            "site": "tech-blogs/rss-sources",
+            "num_articles": len(sources),
+            "sources": sources,
         }
+        if index is not None:
+            result["previous_run_at"] = previous_run
+            result["num_new_since_last_run"] = len(index.new_since(previous_run))
+            result["num_skipped_reported"] = num_skipped_reported
+            result["num_feeds_skipped"] = len(skipped_feeds)
+        return result
+    finally:
+        if owns_client and http_client is not None:
+            http_client.close()
+        if index is not None and index is not seen_index:
+            index.close()
+
+
+def mark_sources_reported(
+    seen_index: Union[str, Path, SeenEntryIndex],
+    sources: Iterable[Dict[str, object]],
+) -> int:
+    """
+    レポートに載せた sources（collect_rss_sources の結果の "sources" か、"url" を持つ dict）を
+    レポート済みとして記録し、記録した件数を返す。レポートを書き終えた後に呼ぶ。
+    """
+    urls = [canonicalize_url(str(s["url"])) for s in sources if s.get("url")]
+    index = seen_index if isinstance(seen_index, SeenEntryIndex) else SeenEntryIndex(seen_index)
+    try:
+        index.mark_reported(urls)
+    finally:
+        if index is not seen_index:
+            index.close()
+    return len(urls)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="RSS ソースを収集して JSON で出力する")
+    parser.add_argument("--feed-file", type=Path, default=Path(__file__).with_name("feed.toml"), help="フィード設定")
+    parser.add_argument("--days", type=int, default=2, help="収集する期間（日）")
+    parser.add_argument("--seen-index", type=Path, default=None, help="既読エントリ・取得スケジュールの SQLite")
+    parser.add_argument("--only-new", action="store_true", help="レポート済みのエントリを候補から外す")
+    parser.add_argument("--no-adaptive-polling", action="store_true", help="--only-new でもスケジュールに関係なく全フィードを取得する")
+    parser.add_argument("--show-schedule", action="store_true", help="--seen-index のフィード取得スケジュールを表示して終わる")
+    parser.add_argument(
+        "--mark-reported",
+        type=Path,
+        default=None,
+        help="書き終えたレポートに載せた記事の JSON（sources か articles の url）を --seen-index にレポート済みとして記録して終わる",
     )
-
-    cutoff = datetime.now() - timedelta(days=days)
-    sources: List[Dict[str, object]] = []
-
-    for category, feed_urls in config.items():
-        category_entries: list[tuple[datetime, str, object]] = []  # (date, feed_name, entry)
-
-        for feed_url in feed_urls:
-            try:
-                parsed = feedparser.parse(feed_url)
-                feed_name = (
-                    parsed.feed.title if hasattr(parsed, "feed") and hasattr(parsed.feed, "title") else feed_url
+    return parser.parse_args()
+
+
+def main() -> None:
+    """スタンドアロン実行用（テスト）"""
+    args = parse_args()
+    if args.show_schedule:
+        if args.seen_index is None:
+            raise SystemExit("--show-schedule には --seen-index が必要です")
+        index = SeenEntryIndex(args.seen_index)
+        try:
+            for row in index.feed_schedule():
+                interval = row["interval_sec"]
+                interval_text = f"{interval / 3600:.1f}h" if interval is not None else "-"
+                print(
+                    f"{row['next_check_at']}  interval={interval_text:>8}  "
+                    f"last_published={row['last_published'] or '-'}  {row['feed_url']}"
                 )
-                entries = list(getattr(parsed, "entries", []))
-
-                filtered_per_feed: list[tuple[datetime, object]] = []
-                for e in entries:
-                    dt = _parse_entry_datetime(e)
-                    if dt is None or dt >= cutoff:
-                        filtered_per_feed.append((dt or datetime.now(), e))
-
-                filtered_per_feed.sort(key=lambda x: x[0], reverse=True)
-
-                for dt, e in filtered_per_feed[:limit_per_feed]:
-                    category_entries.append((dt, feed_name, e))
-
-            except Exception:
-                continue
-
-        # Sort all entries for the category by date
-        category_entries.sort(key=lambda x: x[0], reverse=True)
-
-        processed_entries: list[tuple[str, object]] = [(feed_name, e) for dt, feed_name, e in category_entries]
-
-        # 量が多いのでZenn と Qiita は最新1件に絞る
-        # →やっぱり量が多いので、すべてのカテゴリで最新1件だけに絞る
-        if True:
-            if processed_entries:
-                # category_entries は新しい順にソート済み → 先頭を採用
-                processed_entries = processed_entries[:1]
-
-        for feed_name, e in processed_entries:
-            url = getattr(e, "link", None)
-            if not url:
-                continue
-            title = getattr(e, "title", "無題")
-            published_at = _parse_entry_datetime(e)
-            text = _extract_article_text(e, url, session)
-
-            sources.append(
-                {
-                    "feed_name": feed_name,
-                    "category": category,
-                    "title": title,
-                    "url": url,
-                    "date": published_at.strftime("%Y-%m-%dT%H:%M:%S") if published_at else None,
-                    "text": text,
-                }
-            )
+        finally:
+            index.close()
+        return
+
+    if args.mark_reported is not None:
+        if args.seen_index is None:
+            raise SystemExit("--mark-reported には --seen-index が必要です")
+        data = json.loads(args.mark_reported.read_text(encoding="utf-8"))
+        count = mark_sources_reported(args.seen_index, data.get("sources") or data.get("articles") or [])
+        print(f"[INFO] marked {count} sources as reported", file=sys.stderr)
+        return
+
+    result = collect_rss_sources(
+        args.feed_file,
+        days=args.days,
+        seen_index=args.seen_index,
+        only_new=args.only_new,
+        adaptive_polling=not args.no_adaptive_polling,
+    )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
 
-    now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-    return {
-        "generated_at": now_utc,
-        "site": "tech-blogs/rss-sources",
-        "num_articles": len(sources),
-        "sources": sources,
-    }
 
+if __name__ == "__main__":
+    main()
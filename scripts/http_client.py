@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# scripts/http_client.py
+"""
+コレクタ（get_rss / get_github_trending / get_reddit / 動画スクリプトの RSS 取得）で共有する HTTP クライアント。
+
+- requests.Session を 1 つ使い回し、ホストごとに keep-alive の接続をプールする
+- 同じホストへの同時リクエスト数を per_host_limit までに制限する
+- GET のレスポンスをディスクにキャッシュする（RFC 9111 の private cache 相当の最小限）
+  - Cache-Control: max-age / Expires の期限内ならネットワークに出ずにキャッシュを返す
+  - 期限切れでも ETag / Last-Modified があれば条件付きリクエストを送り、304 ならキャッシュの本文を返す
+  - no-store は保存しない。no-cache は毎回再検証する。Vary のリクエストヘッダが違えば使わない
+- stream=True のレスポンスは、最後まで読み切ったときだけ保存する（途中でやめた本文は保存しない）
+  - 本文を読み切るか close するまでは同じホストの同時接続数に数える
+
+どのように返したかは response.cache_status（"hit" / "revalidated" / "miss" / "bypass"）で分かる。
+
+使い方:
+    try:
+        from http_client import get_default_client
+    except ImportError:
+        from scripts.http_client import get_default_client
+
+    resp = get_default_client().get(url, headers={"User-Agent": "..."}, timeout=30)
+"""
+
+from __future__ import annotations
+
+import email.utils
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "codex_common_news_http"
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36"
+)
+# これより大きい本文はキャッシュしない
+CACHE_MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# 本文を展開して保存するので、転送に関するヘッダは落とす
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+# 304 で届いたら保存済みのヘッダを更新するもの
+_REVALIDATION_HEADERS = ("cache-control", "expires", "date", "etag", "last-modified", "age", "vary")
+
+
+def _parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else None
+    return directives
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _freshness_lifetime(headers) -> float:
+    """max-age、無ければ Expires - Date（秒）。どちらも無ければ 0（毎回再検証する）。"""
+    directives = _parse_cache_control(headers.get("Cache-Control"))
+    if "max-age" in directives:
+        try:
+            return max(float(directives["max-age"] or 0), 0.0)
+        except ValueError:
+            return 0.0
+    expires = _parse_http_date(headers.get("Expires"))
+    if expires is None:
+        return 0.0
+    date = _parse_http_date(headers.get("Date")) or time.time()
+    return max(expires - date, 0.0)
+
+
+class HttpCache:
+    """URL ごとに {key}.json（ヘッダ等）と {key}.body（展開済みの本文）を置くディスクキャッシュ。"""
+
+    def __init__(self, cache_dir: Union[str, Path]) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    def load(self, url: str) -> Optional[tuple[dict, bytes]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        return meta, body
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def store(self, url: str, meta: dict, body: Optional[bytes] = None) -> None:
+        """meta を保存する。body=None なら本文はそのまま（304 での更新）。"""
+        meta_path, body_path = self._paths(url)
+        if body is not None:
+            self._write_atomic(body_path, body)
+        self._write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+class HttpClient:
+    """
+    接続プール・ホストごとの同時接続数の上限・ディスクキャッシュ付きの GET クライアント（スレッドセーフ）。
+
+    cache_dir=None ならキャッシュしない（条件付きリクエストも送らない）。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Union[str, Path]] = DEFAULT_CACHE_DIR,
+        per_host_limit: int = 4,
+        max_hosts: int = 32,
+        timeout: float = 30.0,
+        user_agent: str = DEFAULT_USER_AGENT,
+    ) -> None:
+        if per_host_limit < 1:
+            raise ValueError(f"per_host_limit は 1 以上を指定してください: {per_host_limit}")
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.cache = HttpCache(cache_dir) if cache_dir is not None else None
+
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": user_agent})
+        # 既定のプール（10 ホスト・1 ホスト 10 接続）だとホスト数が足りず接続が捨てられる
+        adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=per_host_limit)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.Semaphore] = {}
+        self.stats: Dict[str, int] = {"hit": 0, "revalidated": 0, "miss": 0, "bypass": 0}
+
+    def _slot(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.Semaphore(self.per_host_limit)
+            return slot
+
+    def _count(self, resp: requests.Response, status: str) -> requests.Response:
+        resp.cache_status = status
+        with self._lock:
+            self.stats[status] += 1
+        return resp
+
+    def _request_headers(self, headers: Optional[Dict[str, str]]) -> CaseInsensitiveDict:
+        merged = CaseInsensitiveDict(self.session.headers)
+        merged.update(headers or {})
+        return merged
+
+    @staticmethod
+    def _vary_matches(meta: dict, request_headers: CaseInsensitiveDict) -> bool:
+        return all(request_headers.get(name) == value for name, value in meta.get("vary", {}).items())
+
+    @staticmethod
+    def _is_fresh(meta: dict) -> bool:
+        headers = CaseInsensitiveDict(meta["headers"])
+        if "no-cache" in _parse_cache_control(headers.get("Cache-Control")):
+            return False
+        try:
+            age = float(headers.get("Age") or 0)
+        except ValueError:
+            age = 0.0
+        age += max(time.time() - meta["stored_at"], 0.0)
+        return age < _freshness_lifetime(headers)
+
+    @staticmethod
+    def _cached_response(url: str, meta: dict, body: bytes) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = meta.get("status", 200)
+        resp.reason = "OK"
+        resp.url = meta.get("final_url", url)
+        resp.headers = CaseInsensitiveDict(meta["headers"])
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        # 読み込み済みの本文として扱わせる（iter_content も使える）
+        resp._content = body
+        resp._content_consumed = True
+        return resp
+
+    def _cache_meta(
+        self, url: str, resp: requests.Response, request_headers: CaseInsensitiveDict
+    ) -> Optional[dict]:
+        """保存してよいレスポンスならメタデータを返す。"""
+        if resp.status_code != 200:
+            return None
+        directives = _parse_cache_control(resp.headers.get("Cache-Control"))
+        if "no-store" in directives:
+            return None
+        vary = [v.strip() for v in resp.headers.get("Vary", "").split(",") if v.strip()]
+        if "*" in vary:
+            return None
+        has_validator = "ETag" in resp.headers or "Last-Modified" in resp.headers
+        if not has_validator and _freshness_lifetime(resp.headers) <= 0:
+            return None
+        return {
+            "url": url,
+            "final_url": resp.url,
+            "status": resp.status_code,
+            "stored_at": time.time(),
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() not in _DROP_HEADERS},
+            "vary": {name: request_headers.get(name) for name in vary},
+        }
+
+    def _tee_stream(self, url: str, resp: requests.Response, meta: dict) -> None:
+        """stream=True のレスポンスの iter_content を包み、最後まで読まれたら本文を保存する。"""
+        original = resp.iter_content
+        cache = self.cache
+
+        def iter_content(chunk_size: int = 1, decode_unicode: bool = False) -> Iterator[bytes]:
+            parts = []
+            size = 0
+            for chunk in original(chunk_size=chunk_size, decode_unicode=decode_unicode):
+                if parts is not None and isinstance(chunk, bytes):
+                    size += len(chunk)
+                    if size <= CACHE_MAX_BODY_BYTES:
+                        parts.append(chunk)
+                    else:
+                        parts = None
+                yield chunk
+            if parts is not None:
+                cache.store(url, meta, b"".join(parts))
+
+        resp.iter_content = iter_content
+
+    @staticmethod
+    def _hold_slot(resp: requests.Response, slot: threading.Semaphore) -> None:
+        """iter_content が終わる（読み切る・途中で閉じられる）か close されたときに slot を 1 度だけ返す。"""
+        lock = threading.Lock()
+        held = [True]
+
+        def release() -> None:
+            with lock:
+                if not held[0]:
+                    return
+                held[0] = False
+            slot.release()
+
+        original_iter = resp.iter_content
+        original_close = resp.close
+
+        def iter_content(*args, **kwargs) -> Iterator[bytes]:
+            try:
+                yield from original_iter(*args, **kwargs)
+            finally:
+                release()
+
+        def close() -> None:
+            try:
+                original_close()
+            finally:
+                release()
+
+        resp.iter_content = iter_content
+        resp.close = close
+
+    def get(
+        self,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+        use_cache: bool = True,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        GET する。キャッシュが新しければネットワークに出ず、古ければ条件付きで取り直す。
+        kwargs は requests.Session.get にそのまま渡す（allow_redirects など）。
+        stream=True のレスポンスは読み切るか close する（with で使う）まで同じホストの枠を占有する。
+        """
+        timeout = self.timeout if timeout is None else timeout
+        request_headers = self._request_headers(headers)
+        cached = self.cache.load(url) if self.cache is not None and use_cache else None
+        if cached is not None and not self._vary_matches(cached[0], request_headers):
+            cached = None
+
+        if cached is not None:
+            meta, body = cached
+            if self._is_fresh(meta):
+                return self._count(self._cached_response(url, meta, body), "hit")
+            stored = CaseInsensitiveDict(meta["headers"])
+            conditional = dict(headers or {})
+            if stored.get("ETag"):
+                conditional["If-None-Match"] = stored["ETag"]
+            if stored.get("Last-Modified"):
+                conditional["If-Modified-Since"] = stored["Last-Modified"]
+            headers = conditional
+
+        slot = self._slot(url)
+        slot.acquire()
+        try:
+            resp = self.session.get(url, headers=headers, timeout=timeout, stream=stream, **kwargs)
+        except BaseException:
+            slot.release()
+            raise
+
+        if stream and not (cached is not None and resp.status_code == 304):
+            # 本文はまだ接続上にあるので、読み切るか close されるまでホストの枠を返さない
+            self._hold_slot(resp, slot)
+        else:
+            slot.release()
+
+        if cached is not None and resp.status_code == 304:
+            resp.close()
+            meta, body = cached
+            merged = CaseInsensitiveDict(meta["headers"])
+            for name in _REVALIDATION_HEADERS:
+                if name in resp.headers:
+                    merged[name] = resp.headers[name]
+            meta = {**meta, "headers": dict(merged), "stored_at": time.time()}
+            self.cache.store(url, meta)
+            return self._count(self._cached_response(url, meta, body), "revalidated")
+
+        if self.cache is None or not use_cache:
+            return self._count(resp, "bypass")
+
+        meta = self._cache_meta(url, resp, request_headers)
+        if meta is not None:
+            if stream:
+                self._tee_stream(url, resp, meta)
+            elif len(resp.content) <= CACHE_MAX_BODY_BYTES:
+                self.cache.store(url, meta, resp.content)
+        return self._count(resp, "miss")
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "HttpClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_DEFAULT_CLIENT: Optional[HttpClient] = None
+_DEFAULT_CLIENT_LOCK = threading.Lock()
+
+
+def get_default_client() -> HttpClient:
+    """プロセス内で共有する HttpClient（既定のキャッシュディレクトリを使う）。"""
+    global _DEFAULT_CLIENT
+    with _DEFAULT_CLIENT_LOCK:
+        if _DEFAULT_CLIENT is None:
+            _DEFAULT_CLIENT = HttpClient()
+        return _DEFAULT_CLIENT
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# scripts/near_duplicates.py
+"""
+複数のソースに出てくる同じニュースを MinHash / LSH でまとめる。
+
+同じ話題が ai-news.dev（AGENTS_2）、feed.toml の Hugging Face・Google AI の RSS、
+Reddit r/artificial、Google News（AGENTS_3）に重複して出てくるので、
+近い重複をクラスタにまとめて代表 1 件だけを要約に回す。
+
+- タイトル + 本文の先頭を正規化（NFKC・小文字・記号除去）し、文字 k-gram に分ける
+- k-gram のハッシュと MinHash を NumPy でまとめて計算する（Python のループは文書ごとだけ）
+- シグネチャを bands 個の帯に分け、帯が 1 つでも一致したものだけを候補にして推定 Jaccard で確かめる
+- NearDuplicateIndex は数日分のシグネチャを SQLite に保存し、起動時にメモリ上のバケットに読み込む
+  （照会はメモリ上の dict 引きと候補との比較だけなので 1 件 1 ms 未満）
+
+入力は collect_rss_sources / collect_reddit_raw_data の結果と report_*.json:
+    items = items_from_rss(rss_result) + items_from_reddit(reddit_result) + items_from_report(report)
+    with NearDuplicateIndex("~/.cache/codex_common_news_stories.sqlite") as index:
+        clusters = cluster_items(items, index=index)
+    representatives = [c.representative for c in clusters if not c.previously_seen]
+
+使い方:
+    uv run scripts/near_duplicates.py reports/2026-08-18/report_*.json --index stories.sqlite
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# (a * h + b) mod p の p（2^61 - 1）。h と a, b は 32 bit なので積は uint64 に収まる
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# k-gram のローリングハッシュの基数
+_SHINGLE_BASE = np.uint64(1_000_003)
+
+# 比べるのはタイトル + 本文の先頭だけ（長い本文でも計算量を一定にする）
+MAX_TEXT_CHARS = 2000
+
+_PUNCT_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """NFKC・小文字にして、記号と空白の並びを 1 つの空白にする。"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _PUNCT_RE.sub(" ", text).strip()
+
+
+def shingle_hashes(text: str, k: int = 4) -> np.ndarray:
+    """
+    正規化済みの文字列の文字 k-gram を 32 bit にハッシュして返す（重複なし・uint64）。
+    日本語は単語の区切りが無いので単語ではなく文字 k-gram にする。k 文字未満なら文字列全体を 1 つとする。
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    k = min(k, len(codes))
+    windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+    powers = _SHINGLE_BASE ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    # uint64 の桁あふれはそのまま（mod 2^64 のハッシュとして使う）
+    with np.errstate(over="ignore"):
+        hashes = (windows * powers).sum(axis=1, dtype=np.uint64)
+    hashes = (hashes ^ (hashes >> np.uint64(32))) & _MAX_HASH
+    return np.unique(hashes)
+
+
+class MinHasher:
+    """num_perm 個のハッシュ関数 (a * h + b) mod p による MinHash。"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 4, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(normalize_text(text)[:MAX_TEXT_CHARS], self.shingle_size)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        permuted = (self._a * hashes[None, :] + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: Iterable[str]) -> np.ndarray:
+        rows = [self.signature(t) for t in texts]
+        if not rows:
+            return np.zeros((0, self.num_perm), dtype=np.uint32)
+        return np.stack(rows)
+
+
+def similarity(sig: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """MinHash シグネチャの一致率（推定 Jaccard 係数）。others は (N, num_perm)。"""
+    return (np.atleast_2d(others) == sig).mean(axis=1)
+
+
+@dataclass
+class StoryItem:
+    """クラスタリングの単位。key はソース内で一意な識別子（URL など）。"""
+
+    key: str
+    source: str
+    title: str
+    text: str = ""
+    url: Optional[str] = None
+    payload: Optional[dict] = None
+
+    @property
+    def fingerprint_text(self) -> str:
+        return f"{self.title}\n{self.text}"
+
+
+@dataclass
+class StoryCluster:
+    representative: StoryItem
+    members: List[StoryItem] = field(default_factory=list)
+    # index に入っていた近い重複（同じ key を含む） [(key, 類似度), ...]
+    previously_seen: List[Tuple[str, float]] = field(default_factory=list)
+
+    @property
+    def sources(self) -> List[str]:
+        return sorted({m.source for m in self.members})
+
+
+def items_from_rss(result: dict) -> List[StoryItem]:
+    """collect_rss_sources の結果から。"""
+    return [
+        StoryItem(
+            key=s.get("url") or s.get("title") or "",
+            source=f"rss:{s.get('feed_name') or s.get('category')}",
+            title=s.get("title") or "",
+            text=s.get("text") or "",
+            url=s.get("url"),
+            payload=s,
+        )
+        for s in result.get("sources", [])
+    ]
+
+
+# collect_reddit_raw_data の結果のうち、グループ（投稿のリスト）ではないキー
+_REDDIT_META_KEYS = {"fetched_at", "deltas", "num_unchanged", "num_comment_requests"}
+
+
+def _reddit_groups(result: dict) -> List[Tuple[str, List[dict]]]:
+    """
+    collect_reddit_raw_data の結果から (グループ名, 投稿のリスト) を取り出す。
+    グループ名は groups 引数しだいなので固定せず、投稿のリストか {"new": [...], ...} のものをグループとみなす。
+    post_store 指定時の "deltas"（既知の投稿の score の変化だけ）は新しい記事ではないので使わない。
+    """
+    groups: List[Tuple[str, List[dict]]] = []
+    for name, value in result.items():
+        if name in _REDDIT_META_KEYS:
+            continue
+        if isinstance(value, dict):
+            value = value.get("new")
+        if isinstance(value, list):
+            groups.append((name, [post for post in value if isinstance(post, dict)]))
+    return groups
+
+
+def items_from_reddit(result: dict) -> List[StoryItem]:
+    """collect_reddit_raw_data の結果から（全グループ）。本文は無いのでタイトルで比べる。"""
+    items: List[StoryItem] = []
+    for _, posts in _reddit_groups(result):
+        for post in posts:
+            permalink = post.get("permalink") or ""
+            items.append(
+                StoryItem(
+                    key=f"https://www.reddit.com{permalink}" if permalink else post.get("url") or "",
+                    source=f"reddit:r/{post.get('subreddit')}",
+                    title=post.get("title") or "",
+                    url=post.get("url"),
+                    payload=post,
+                )
+            )
+    return items
+
+
+def items_from_report(report: dict) -> List[StoryItem]:
+    """report_*.json（AGENTS_1〜3 の成果物）の articles から。executive_summary を本文として使う。"""
+    items: List[StoryItem] = []
+    for article in report.get("articles", []):
+        summary = article.get("executive_summary") or []
+        if isinstance(summary, list):
+            summary = "\n".join(str(s) for s in summary)
+        items.append(
+            StoryItem(
+                key=article.get("url") or article.get("title") or "",
+                source=f"report:{report.get('site')}",
+                title=article.get("title") or "",
+                text=str(summary),
+                url=article.get("url"),
+                payload=article,
+            )
+        )
+    return items
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class NearDuplicateIndex:
+    """
+    MinHash シグネチャの LSH 索引。path を渡すと SQLite に保存し、retention_days 日分を読み込み直す。
+
+    bands * rows_per_band == num_perm。帯が 1 つ一致する確率が 1/2 になる類似度はおよそ
+    (1 / bands) ** (1 / rows_per_band)（既定の 32 x 4 で約 0.42）で、そこから threshold 以上のものに絞る。
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        *,
+        threshold: float = 0.5,
+        bands: int = 32,
+        hasher: Optional[MinHasher] = None,
+        retention_days: float = 7.0,
+    ) -> None:
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands != 0:
+            raise ValueError(f"num_perm={self.hasher.num_perm} は bands={bands} で割り切れません")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = self.hasher.num_perm // bands
+
+        self.keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._signatures = np.zeros((0, self.hasher.num_perm), dtype=np.uint32)
+        self._pending: List[np.ndarray] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            path = Path(path).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path))
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS stories (
+                        key TEXT PRIMARY KEY,
+                        source TEXT,
+                        title TEXT,
+                        added_at TEXT NOT NULL,
+                        signature BLOB NOT NULL
+                    )
+                    """
+                )
+                cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+                self._conn.execute(
+                    "DELETE FROM stories WHERE added_at < ?", (cutoff.strftime("%Y-%m-%dT%H:%M:%SZ"),)
+                )
+            for key, blob in self._conn.execute("SELECT key, signature FROM stories ORDER BY added_at"):
+                sig = np.frombuffer(blob, dtype=np.uint32)
+                if len(sig) == self.hasher.num_perm:
+                    self._insert(key, sig)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __enter__(self) -> "NearDuplicateIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _band_keys(self, sig: np.ndarray) -> List[Tuple[int, bytes]]:
+        r = self.rows_per_band
+        return [(b, sig[b * r:(b + 1) * r].tobytes()) for b in range(self.bands)]
+
+    def _insert(self, key: str, sig: np.ndarray) -> None:
+        if key in self._positions:
+            return
+        position = len(self.keys)
+        self.keys.append(key)
+        self._positions[key] = position
+        self._pending.append(sig)
+        for band_key in self._band_keys(sig):
+            self._buckets.setdefault(band_key, []).append(position)
+
+    def _matrix(self) -> np.ndarray:
+        if self._pending:
+            self._signatures = np.vstack([self._signatures, np.stack(self._pending)])
+            self._pending = []
+        return self._signatures
+
+    def query(self, sig: np.ndarray, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        """sig と推定 Jaccard が threshold 以上の登録済みキーを、類似度の高い順に返す。"""
+        threshold = self.threshold if threshold is None else threshold
+        candidates = set()
+        for band_key in self._band_keys(sig):
+            candidates.update(self._buckets.get(band_key, ()))
+        if not candidates:
+            return []
+        positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        sims = similarity(sig, self._matrix()[positions])
+        hits = [(self.keys[p], float(s)) for p, s in zip(positions.tolist(), sims.tolist()) if s >= threshold]
+        return sorted(hits, key=lambda x: -x[1])
+
+    def add(self, item: StoryItem, sig: Optional[np.ndarray] = None) -> None:
+        if item.key in self._positions:
+            return
+        sig = self.hasher.signature(item.fingerprint_text) if sig is None else sig
+        self._insert(item.key, sig)
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO stories (key, source, title, added_at, signature) VALUES (?, ?, ?, ?, ?)",
+                    (item.key, item.source, item.title, _utc_now_iso(), sig.astype(np.uint32).tobytes()),
+                )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _pick_representative(members: Sequence[StoryItem]) -> StoryItem:
+    """本文の最も長いもの（同じなら入力順で先のもの）。要約に回す情報が多い方を残す。"""
+    return max(members, key=lambda m: len(m.text))
+
+
+def cluster_items(
+    items: Sequence[StoryItem],
+    index: Optional[NearDuplicateIndex] = None,
+    *,
+    threshold: Optional[float] = None,
+    update_index: bool = True,
+) -> List[StoryCluster]:
+    """
+    items を近い重複ごとにまとめる（入力順で最初に出た位置の順に返す）。
+
+    index を渡すと、index に入っている項目（以前の実行で追加したもの）と近いクラスタに
+    previously_seen を付け、update_index=True なら今回の項目を index に追加する。
+    同じ日に実行し直すと今回の項目も previously_seen になるので、やり直すときは update_index=False で試す。
+    """
+    if threshold is None:
+        threshold = index.threshold if index is not None else 0.5
+    # 今回の items どうしの比較用（保存しない）
+    own_index = NearDuplicateIndex(
+        threshold=threshold,
+        bands=index.bands if index is not None else 32,
+        hasher=index.hasher if index is not None else None,
+    )
+    hasher = own_index.hasher
+
+    signatures = hasher.signatures(item.fingerprint_text for item in items)
+    parent = list(range(len(items)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # 同じ key は同じ記事として最初から 1 つにまとめる
+    first_by_key: Dict[str, int] = {}
+    for i, item in enumerate(items):
+        if item.key in first_by_key:
+            parent[find(i)] = find(first_by_key[item.key])
+            continue
+        first_by_key[item.key] = i
+        for key, _ in own_index.query(signatures[i], threshold):
+            parent[find(i)] = find(first_by_key[key])
+        own_index._insert(item.key, signatures[i])
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(items)):
+        groups.setdefault(find(i), []).append(i)
+
+    clusters: List[StoryCluster] = []
+    for members in sorted(groups.values(), key=lambda g: g[0]):
+        member_items = [items[i] for i in members]
+        seen: Dict[str, float] = {}
+        if index is not None:
+            for i in members:
+                for key, sim in index.query(signatures[i], threshold):
+                    seen[key] = max(seen.get(key, 0.0), sim)
+        clusters.append(
+            StoryCluster(
+                representative=_pick_representative(member_items),
+                members=member_items,
+                previously_seen=sorted(seen.items(), key=lambda x: -x[1]),
+            )
+        )
+
+    if index is not None and update_index:
+        for i, item in enumerate(items):
+            index.add(item, signatures[i])
+    return clusters
+
+
+def _items_from_file(path: Path) -> List[StoryItem]:
+    """JSON の形から collect_rss_sources / collect_reddit_raw_data / report_*.json を見分ける。"""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if "sources" in data:
+        return items_from_rss(data)
+    if "articles" in data:
+        return items_from_report(data)
+    if "fetched_at" in data or "tech" in data or "news" in data:
+        return items_from_reddit(data)
+    print(f"[WARNING] unknown JSON layout, skipped: {path}", file=sys.stderr)
+    return []
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="RSS・Reddit・レポート JSON の近い重複をまとめる")
+    parser.add_argument("inputs", nargs="+", type=Path, help="collect_rss_sources / collect_reddit_raw_data / report_*.json の JSON")
+    parser.add_argument("--index", type=Path, default=None, help="数日分のシグネチャを保存する SQLite")
+    parser.add_argument("--threshold", type=float, default=0.5, help="同じ話題とみなす推定 Jaccard 係数")
+    parser.add_argument("--retention-days", type=float, default=7.0, help="index に残す日数")
+    parser.add_argument("--dry-run", action="store_true", help="index を更新しない")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    items: List[StoryItem] = []
+    for path in args.inputs:
+        items.extend(_items_from_file(path))
+
+    index = (
+        NearDuplicateIndex(args.index, threshold=args.threshold, retention_days=args.retention_days)
+        if args.index is not None
+        else None
+    )
+    try:
+        started = time.perf_counter()
+        clusters = cluster_items(items, index=index, threshold=args.threshold, update_index=not args.dry_run)
+        elapsed = time.perf_counter() - started
+    finally:
+        if index is not None:
+            index.close()
+
+    print(
+        f"[INFO] {len(items)} items -> {len(clusters)} clusters in {elapsed * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    for cluster in clusters:
+        rep = cluster.representative
+        mark = " (seen before)" if cluster.previously_seen else ""
+        print(f"- {rep.title} [{rep.source}]{mark}")
+        for member in cluster.members:
+            if member is not rep:
+                print(f"    ~ {member.title} [{member.source}]")
+
+
+if __name__ == "__main__":
+    main()
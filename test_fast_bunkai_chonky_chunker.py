@@ -0,0 +1,324 @@
+"""fast_bunkai_chonky_chunker のモデルを使わない部分の単体テスト。"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from fast_bunkai_chonky_chunker import (
+    FastBunkaiChonkyChunker,
+    IncrementalChunker,
+    SentenceSpan,
+    SeparatorScoreCache,
+    TokenScores,
+)
+
+
+def _random_windows(rng: random.Random, n_tokens: int, window: int, stride: int):
+    """連続した token span を stride 付きウィンドウに切ったダミーの推論結果を作る。"""
+    spans = []
+    pos = 0
+    for _ in range(n_tokens):
+        width = rng.randint(1, 4)
+        spans.append((pos, pos + width))
+        pos += width + rng.randint(0, 1)
+
+    offset_mappings, special_masks, window_probs = [], [], []
+    start = 0
+    while True:
+        body = spans[start:start + window]
+        offset_mappings.append([(0, 0)] + body + [(0, 0)])
+        special_masks.append([1] + [0] * len(body) + [1])
+        window_probs.append(np.array([rng.random() for _ in range(len(body) + 2)], dtype=np.float32))
+        if start + window >= len(spans):
+            break
+        start += window - stride
+    return spans, offset_mappings, special_masks, window_probs
+
+
+def test_aggregate_token_scores_matches_dict_max() -> None:
+    rng = random.Random(0)
+    _, offsets, specials, probs = _random_windows(rng, n_tokens=200, window=32, stride=8)
+
+    expected: dict[tuple[int, int], float] = {}
+    for offs, mask, ps in zip(offsets, specials, probs):
+        for (s, e), sp, p in zip(offs, mask, ps.tolist()):
+            if sp or s == e:
+                continue
+            expected[(s, e)] = max(expected.get((s, e), 0.0), p)
+
+    tokens = FastBunkaiChonkyChunker._aggregate_token_scores(offsets, specials, probs)
+    got = {
+        (s, e): p
+        for s, e, p in zip(tokens.starts.tolist(), tokens.ends.tolist(), tokens.probs.tolist())
+    }
+    assert got == expected
+    assert np.all(np.diff(tokens.starts) > 0)
+
+
+def test_align_sentences_matches_brute_force() -> None:
+    rng = random.Random(1)
+    _, offsets, specials, probs = _random_windows(rng, n_tokens=300, window=40, stride=10)
+    tokens = FastBunkaiChonkyChunker._aggregate_token_scores(offsets, specials, probs)
+    text_len = int(tokens.ends[-1]) + 5
+
+    cuts = sorted(rng.sample(range(1, text_len), 25))
+    bounds = [0] + cuts + [text_len]
+    sentences = [SentenceSpan("", s, e) for s, e in zip(bounds[:-1], bounds[1:])]
+
+    counts = FastBunkaiChonkyChunker._align_sentences(sentences, tokens)
+
+    triples = list(zip(tokens.starts.tolist(), tokens.ends.tolist(), tokens.probs.tolist()))
+    for sent, count in zip(sentences, counts):
+        overlapping = [p for s, e, p in triples if s < sent.end and e > sent.start]
+        assert count == max(len(overlapping), 1)
+        assert sent.separator_score == max(overlapping, default=0.0)
+
+
+def test_normalize_newlines_with_offsets_matches_normalize_newlines() -> None:
+    rng = random.Random(2)
+    alphabet = ["a", "あ", " ", "\t", "\u3000", "\n", "\r", "\r\n", "\u2028", "。"]
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        kwargs = {
+            "max_consecutive_blank_lines": rng.choice([0, 1, 2]),
+            "strip_line_trailing_spaces": rng.random() < 0.7,
+            "merge_soft_linebreaks": rng.random() < 0.3,
+        }
+        normalized, offsets = FastBunkaiChonkyChunker.normalize_newlines_with_offsets(text, **kwargs)
+        assert normalized == FastBunkaiChonkyChunker.normalize_newlines(text, **kwargs)
+        assert len(offsets) == len(normalized)
+        assert np.all(np.diff(offsets) > 0)
+        for ch, raw_idx in zip(normalized, offsets.tolist()):
+            if ch not in "\n ":
+                assert text[raw_idx] == ch
+
+
+def test_load_model_false_splits_without_model() -> None:
+    chunker = FastBunkaiChonkyChunker(load_model=False)
+    assert chunker.model is None and chunker.tokenizer is None
+
+    sentences = chunker.split_sentences("今日は晴れです。明日は雨です。")
+    assert [s.text for s in sentences] == ["今日は晴れです。", "明日は雨です。"]
+
+    with pytest.raises(RuntimeError):
+        chunker.chunk("今日は晴れです。明日は雨です。")
+
+
+def _char_separator_scores(text: str) -> TokenScores:
+    """文脈に依存しないダミーの推論結果（空白以外の 1 文字 = 1 token、句点で高い確率）。"""
+    starts = np.array([i for i, ch in enumerate(text) if not ch.isspace()], dtype=np.int32)
+    probs = np.array([0.9 if text[i] in "。!?" else 0.1 for i in starts.tolist()], dtype=np.float32)
+    return TokenScores(starts=starts, ends=starts + 1, probs=probs)
+
+
+def test_incremental_chunker_matches_full_chunk() -> None:
+    rng = random.Random(3)
+    pieces = ["今日は晴れです。", "明日は雨。", "Hello world. ", "It is fine! ", "\n", "\n\n\n", "  ", "\r\n", "あ", "b"]
+    for _ in range(100):
+        chunker = FastBunkaiChonkyChunker(
+            load_model=False,
+            max_chunk_tokens=rng.choice([None, 8, 30]),
+            max_consecutive_blank_lines=rng.choice([0, 1, 2]),
+            merge_soft_linebreaks=rng.random() < 0.3,
+        )
+        chunker._token_separator_scores = _char_separator_scores
+        incremental = IncrementalChunker(chunker)
+        text = ""
+        view: list[str] = []
+        for _ in range(rng.randint(1, 20)):
+            piece = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 5)))
+            text += piece
+            for index, chunk_text in incremental.append(piece):
+                if index < len(view):
+                    view[index] = chunk_text
+                else:
+                    view.append(chunk_text)
+            del view[len(incremental.chunks):]
+
+            assert incremental.chunks == chunker.chunk(text)
+            assert view == incremental.chunks
+        assert chunker.chunk_spans(incremental.doc) == chunker.chunk_spans(text)
+
+
+def test_incremental_chunker_cost_follows_appended_text() -> None:
+    chunker = FastBunkaiChonkyChunker(load_model=False, stride=4, max_chunk_tokens=30)
+    chunker._token_separator_scores = _char_separator_scores
+    normalize = chunker._maybe_normalize_with_offsets
+    normalized_lengths: list[int] = []
+
+    def recording_normalize(text: str):
+        normalized_lengths.append(len(text))
+        return normalize(text)
+
+    chunker._maybe_normalize_with_offsets = recording_normalize
+    incremental = IncrementalChunker(chunker)
+    # 改行の無い 1 行の字幕
+    pieces = [f"字幕の{i}番目の文です。" for i in range(300)]
+    tokenized: list[int] = []
+    for piece in pieces:
+        incremental.append(piece)
+        tokenized.append(incremental.last_tokenized_chars)
+
+    assert max(normalized_lengths) <= 2 * max(len(p) for p in pieces)
+    assert max(tokenized) < 100
+    assert incremental.chunks == chunker.chunk("".join(pieces))
+
+
+def _context_separator_scores(text: str) -> TokenScores:
+    """文脈で確率が変わるダミーの推論結果（句点以外の確率がウィンドウのテキストごとにばらつく）。"""
+    tokens = _char_separator_scores(text)
+    rng = random.Random(zlib.crc32(text.encode("utf-8")))
+    noise = np.array([rng.random() * 0.4 for _ in range(len(tokens))], dtype=np.float32)
+    probs = np.where(tokens.probs > 0.5, tokens.probs, noise).astype(np.float32)
+    return TokenScores(starts=tokens.starts, ends=tokens.ends, probs=probs)
+
+
+def test_incremental_chunker_scores_do_not_drift_with_appends() -> None:
+    chunker = FastBunkaiChonkyChunker(load_model=False, stride=16)
+    chunker._token_separator_scores = _context_separator_scores
+    incremental = IncrementalChunker(chunker)
+    text = "".join(f"字幕の{i}番目の少し長めの文です。" for i in range(200))
+    # 文の途中で切れる短い追記（同じ token が何度も推論し直される）
+    for i in range(0, len(text), 5):
+        incremental.append(text[i:i + 5])
+
+    full = chunker.score(text)
+    incremental_probs = incremental.token_scores.probs
+    assert np.array_equal(incremental.token_scores.starts, full.token_scores.starts)
+    # 1 回分の推論のばらつき（平均 0.2 前後）の範囲に収まり、max の積み重ねで上に偏らない
+    non_period = full.token_scores.probs < 0.5
+    drift = float(incremental_probs[non_period].mean() - full.token_scores.probs[non_period].mean())
+    assert abs(drift) < 0.02, drift
+
+
+def _cache_key(text: str, **overrides) -> str:
+    params = {"model_name": "m", "backend": "torch", "dtype": "float32", "max_length": 1024, "stride": 128}
+    params.update(overrides)
+    return SeparatorScoreCache.make_key(text=text, **params)
+
+
+def test_separator_score_cache_round_trip_and_keys() -> None:
+    tokens = _char_separator_scores("今日は 晴れ。")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scores.sqlite"
+        cache = SeparatorScoreCache(path)
+        key = _cache_key("今日は 晴れ。")
+        assert cache.get(key) is None
+        cache.put(key, tokens)
+        cache.close()
+
+        # 開き直しても同じ配列が返る
+        cache = SeparatorScoreCache(path)
+        got = cache.get(key)
+        cache.close()
+    assert got.starts.dtype == np.int32 and got.probs.dtype == np.float32
+    for name in ("starts", "ends", "probs"):
+        assert np.array_equal(getattr(got, name), getattr(tokens, name))
+
+    variants = [
+        _cache_key("今日は 晴れ。 "),
+        _cache_key("今日は 晴れ。", model_name="other"),
+        _cache_key("今日は 晴れ。", backend="onnx"),
+        _cache_key("今日は 晴れ。", dtype="bfloat16"),
+        _cache_key("今日は 晴れ。", max_length=512),
+        _cache_key("今日は 晴れ。", stride=64),
+    ]
+    assert len({key, *variants}) == len(variants) + 1
+
+
+def test_separator_score_cache_evicts_least_recently_used() -> None:
+    tokens = _char_separator_scores("あいうえおかきくけこ")  # 10 token = 120 bytes
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SeparatorScoreCache(Path(tmp) / "scores.sqlite", max_bytes=3 * 120)
+        keys = [_cache_key(str(i)) for i in range(4)]
+        for key in keys[:3]:
+            cache.put(key, tokens)
+            time.sleep(0.01)
+        # 0 番目を読んで最近使ったことにすると、追い出されるのは 1 番目
+        assert cache.get(keys[0]) is not None
+        time.sleep(0.01)
+        cache.put(keys[3], tokens)
+        present = [cache.get(key) is not None for key in keys]
+        cache.close()
+    assert present == [True, False, True, True]
+
+
+def test_score_cache_is_not_shared_across_dtypes() -> None:
+    text = "今日は晴れです。明日は雨です。"
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SeparatorScoreCache(Path(tmp) / "scores.sqlite")
+        scored: list[str] = []
+
+        def recording_scores(text: str) -> TokenScores:
+            scored.append(text)
+            return _char_separator_scores(text)
+
+        chunkers = []
+        for dtype in ("float32", "bfloat16"):
+            chunker = FastBunkaiChonkyChunker(load_model=False, score_cache=cache)
+            chunker.dtype = dtype  # プロファイルで bf16 にしたチャンカー相当
+            chunker._token_separator_scores = recording_scores
+            chunkers.append(chunker)
+
+        fp32, bf16 = chunkers
+        assert fp32._score_cache_key(text) != bf16._score_cache_key(text)
+        fp32.score(text)
+        bf16.score(text)
+        assert len(scored) == 2
+        fp32.score(text)
+        bf16.score(text)
+        assert len(scored) == 2
+        cache.close()
+
+
+def test_iter_chunks_matches_chunk() -> None:
+    chunker = FastBunkaiChonkyChunker(load_model=False, max_length=32, stride=8, max_chunk_tokens=None)
+    chunker._token_separator_scores = _char_separator_scores
+    text = "".join(f"これは{i}番目の文です。" * (i % 3 + 1) for i in range(40))
+    pieces = [text[i:i + 7] for i in range(0, len(text), 7)]
+
+    streamed = list(chunker.iter_chunks(pieces))
+    assert len(streamed) > 1
+    assert streamed == chunker.chunk(text)
+
+
+def test_iter_chunks_bounds_buffer_without_sentence_end() -> None:
+    chunker = FastBunkaiChonkyChunker(load_model=False, max_length=32, stride=8, max_chunk_tokens=None)
+    scored_lengths: list[int] = []
+
+    def recording_scores(text: str) -> TokenScores:
+        scored_lengths.append(len(text))
+        return _char_separator_scores(text)
+
+    chunker._token_separator_scores = recording_scores
+    # 句読点も改行もない字幕
+    pieces = ["あいうえおかきくけこ"] * 200
+
+    streamed = list(chunker.iter_chunks(pieces))
+    assert "".join(streamed) == "".join(pieces)
+    assert len(streamed) > 1
+    budget = chunker.max_length + chunker.stride
+    assert max(scored_lengths) <= 2 * budget
+
+
+if __name__ == "__main__":
+    test_aggregate_token_scores_matches_dict_max()
+    test_align_sentences_matches_brute_force()
+    test_normalize_newlines_with_offsets_matches_normalize_newlines()
+    test_load_model_false_splits_without_model()
+    test_incremental_chunker_matches_full_chunk()
+    test_incremental_chunker_cost_follows_appended_text()
+    test_incremental_chunker_scores_do_not_drift_with_appends()
+    test_separator_score_cache_round_trip_and_keys()
+    test_separator_score_cache_evicts_least_recently_used()
+    test_score_cache_is_not_shared_across_dtypes()
+    test_iter_chunks_matches_chunk()
+    test_iter_chunks_bounds_buffer_without_sentence_end()
+    print("all tests passed")
@@ -0,0 +1,74 @@
+"""fast_bunkai_chonky_pool の単体テスト（モデルの代わりに score_cache に入れたダミーの推論結果を使う）。"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker, TokenScores
+from fast_bunkai_chonky_pool import ChunkerPool, assign_lpt
+
+
+def test_assign_lpt_assigns_each_index_once_and_balances() -> None:
+    rng = random.Random(0)
+    for _ in range(200):
+        weights = [rng.randint(1, 1000) for _ in range(rng.randint(0, 60))]
+        num_bins = rng.randint(1, 8)
+        bins = assign_lpt(weights, num_bins)
+
+        assert sorted(i for indices in bins for i in indices) == list(range(len(weights)))
+        assert all(indices and indices == sorted(indices) for indices in bins)
+        assert len(bins) == min(num_bins, len(weights))
+        if len(bins) == num_bins:
+            # 最後に入れた文書はその時点で最も軽いビンに入るので、差は最大の重み以内に収まる
+            loads = [sum(weights[i] for i in indices) for indices in bins]
+            assert max(loads) - min(loads) <= max(weights)
+
+    # 大きい文書が 1 つのワーカーに偏らない
+    loads = [sum([8, 7, 6, 5, 4, 3, 2, 1][i] for i in b) for b in assign_lpt([8, 7, 6, 5, 4, 3, 2, 1], 2)]
+    assert loads == [18, 18]
+
+
+def _char_separator_scores(text: str) -> TokenScores:
+    """空白以外の 1 文字 = 1 token、句点で高い確率。"""
+    starts = np.array([i for i, ch in enumerate(text) if not ch.isspace()], dtype=np.int32)
+    probs = np.array([0.9 if text[i] in "。." else 0.1 for i in starts.tolist()], dtype=np.float32)
+    return TokenScores(starts=starts, ends=starts + 1, probs=probs)
+
+
+def test_chunker_pool_matches_single_process() -> None:
+    texts = [
+        "".join(f"{i}番目の文書の{j}文目です。" for j in range(i % 7 + 1)) + "\n\nSecond part. It ends here."
+        for i in range(12)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = Path(tmp) / "scores.sqlite"
+        single = FastBunkaiChonkyChunker(load_model=False, score_cache=cache_path, max_chunk_tokens=12)
+        single._token_separator_scores = _char_separator_scores
+        # 1 プロセスで score してダミーの結果を score_cache に入れておき、ワーカーはキャッシュから読む
+        expected_docs = [single.score(text) for text in texts]
+        expected_chunks = [single.chunk(text) for text in texts]
+        single.score_cache.close()
+
+        with ChunkerPool(
+            num_workers=3, start_method="fork", load_model=False, score_cache=cache_path, max_chunk_tokens=12
+        ) as pool:
+            assert pool.chunk_many(texts) == expected_chunks
+            docs = pool.score_many(texts)
+            assert pool.last_batch_stats.num_cache_hits == len(texts)
+
+    assert [doc.text for doc in docs] == [doc.text for doc in expected_docs]
+    for doc, expected in zip(docs, expected_docs):
+        assert [(s.start, s.end, s.separator_score) for s in doc.sentences] == [
+            (s.start, s.end, s.separator_score) for s in expected.sentences
+        ]
+        assert np.array_equal(doc.token_scores.probs, expected.token_scores.probs)
+
+
+if __name__ == "__main__":
+    test_assign_lpt_assigns_each_index_once_and_balances()
+    test_chunker_pool_matches_single_process()
+    print("all tests passed")
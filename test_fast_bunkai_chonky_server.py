@@ -0,0 +1,137 @@
+"""fast_bunkai_chonky_server の単体テスト（モデルの代わりに文脈に依存しないダミーの推論結果を使う）。"""
+
+from __future__ import annotations
+
+import json
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+from urllib import error, request
+
+import numpy as np
+import pytest
+
+from fast_bunkai_chonky_chunker import FastBunkaiChonkyChunker, TokenScores
+from fast_bunkai_chonky_server import ChunkerClient, LatencyHistogram, ScoreBatcher, make_handler
+
+TEXT = "今日は晴れです。明日は雨です。"
+
+
+def _char_separator_scores(text: str) -> TokenScores:
+    """空白以外の 1 文字 = 1 token、句点で高い確率。"""
+    starts = np.array([i for i, ch in enumerate(text) if not ch.isspace()], dtype=np.int32)
+    probs = np.array([0.9 if text[i] == "。" else 0.1 for i in starts.tolist()], dtype=np.float32)
+    return TokenScores(starts=starts, ends=starts + 1, probs=probs)
+
+
+class _FakeChunker(FastBunkaiChonkyChunker):
+    """score_many に渡された文書数を記録し、"boom" を含む文書があれば失敗するチャンカー。"""
+
+    def __init__(self) -> None:
+        super().__init__(load_model=False)
+        self._token_separator_scores = _char_separator_scores
+        self.batches: list[list[str]] = []
+
+    def score_many(self, texts, **kwargs):
+        texts = list(texts)
+        self.batches.append(texts)
+        if any("boom" in text for text in texts):
+            raise RuntimeError("boom")
+        return [self.score(text) for text in texts]
+
+
+def test_score_batcher_batches_concurrent_requests() -> None:
+    chunker = _FakeChunker()
+    batcher = ScoreBatcher(chunker, max_batch_docs=2, batch_wait_ms=200)
+    futures = [batcher.submit(f"{i}番目の文です。") for i in range(3)]
+    docs = [future.result(timeout=5) for future in futures]
+
+    assert [doc.text for doc in docs] == [f"{i}番目の文です。" for i in range(3)]
+    assert [len(batch) for batch in chunker.batches] == [2, 1]
+
+
+def test_score_batcher_fails_only_the_broken_document() -> None:
+    chunker = _FakeChunker()
+    batcher = ScoreBatcher(chunker, batch_wait_ms=200)
+    futures = [batcher.submit(text) for text in ("一つ目。", "boom", "三つ目。")]
+
+    assert futures[0].result(timeout=5).text == "一つ目。"
+    with pytest.raises(RuntimeError, match="boom"):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5).text == "三つ目。"
+    # まとめた 1 回が失敗し、1 件ずつやり直した
+    assert [len(batch) for batch in chunker.batches] == [3, 1, 1, 1]
+
+
+def test_latency_histogram_buckets_and_mean() -> None:
+    metrics = LatencyHistogram(buckets_ms=(10, 100))
+    for elapsed_ms in (1.0, 10.0, 50.0, 500.0):
+        metrics.observe("chunk", elapsed_ms)
+    metrics.observe("score", 3.0)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["chunk"] == {
+        "count": 4,
+        "mean_ms": 140.25,
+        "buckets": {"le_10ms": 2, "le_100ms": 1, "le_inf": 1},
+    }
+    assert snapshot["score"]["count"] == 1
+
+
+@contextmanager
+def _serve(chunker):
+    metrics = LatencyHistogram()
+    batcher = ScoreBatcher(chunker, batch_wait_ms=1)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(chunker, batcher, metrics))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _get_json(url: str) -> dict:
+    with request.urlopen(url, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def _post_status(url: str, body: bytes) -> int:
+    req = request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with request.urlopen(req, timeout=5) as resp:
+            return resp.status
+    except error.HTTPError as exc:
+        return exc.code
+
+
+def test_request_handler_endpoints() -> None:
+    chunker = _FakeChunker()
+    with _serve(chunker) as base:
+        client = ChunkerClient(base, timeout=5, fallback=False)
+        assert client.chunk(TEXT) == chunker.chunk(TEXT)
+        assert client.chunk(TEXT, threshold=0.95) == [TEXT]
+        assert [row["sentence"] for row in client.debug(TEXT)] == ["今日は晴れです。", "明日は雨です。"]
+        scored = client.score(TEXT)
+        assert scored["text"] == TEXT
+        assert [row["token_count"] for row in scored["sentences"]] == [8, 7]
+
+        assert _post_status(f"{base}/chunk", b'{"threshold": 0.5}') == 400
+        assert _post_status(f"{base}/chunk", b'{"text": "boom"}') == 500
+        assert _post_status(f"{base}/unknown", b"{}") == 404
+        with pytest.raises(RuntimeError, match="HTTP 400"):
+            client.chunk(TEXT, threshold="high")
+
+        assert _get_json(f"{base}/health")["status"] == "ok"
+        latency = _get_json(f"{base}/metrics")["latency"]
+        assert latency["chunk"]["count"] == 5
+        assert latency["debug"]["count"] == 1 and latency["score"]["count"] == 1
+
+
+if __name__ == "__main__":
+    test_score_batcher_batches_concurrent_requests()
+    test_score_batcher_fails_only_the_broken_document()
+    test_latency_histogram_buckets_and_mean()
+    test_request_handler_endpoints()
+    print("all tests passed")
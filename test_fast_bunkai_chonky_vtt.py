@@ -0,0 +1,56 @@
+"""fast_bunkai_chonky_vtt の字幕パース・重複除去・時刻対応の単体テスト。"""
+
+from __future__ import annotations
+
+from fast_bunkai_chonky_vtt import iter_vtt_cues, load_transcript
+
+ROLLING_VTT = """WEBVTT
+Kind: captions
+Language: ja
+
+00:00:03.919 --> 00:00:04.590 align:start position:0%
+ 
+こんばんは。<00:00:04.359><c>BR</c>
+
+00:00:04.590 --> 00:00:04.600 align:start position:0%
+こんばんは。BR
+ 
+
+00:00:04.600 --> 00:00:06.749 align:start position:0%
+こんばんは。BR
+講師の星です。
+
+00:00:06.749 --> 00:00:06.759 align:start position:0%
+ 
+ 
+
+00:00:06.759 --> 00:00:09.030 align:start position:0%
+講師の星です。
+Hello<00:00:07.319><c> world.</c>
+"""
+
+
+def test_iter_vtt_cues_strips_inline_tags() -> None:
+    cues = list(iter_vtt_cues(ROLLING_VTT.splitlines(keepends=True)))
+    assert len(cues) == 5
+    text, marks = cues[0].lines[0]
+    assert text == "こんばんは。BR"
+    assert marks == [(0, 3.919), (6, 4.359)]
+    assert cues[3].lines == []
+
+
+def test_load_transcript_removes_rolling_duplicates() -> None:
+    transcript = load_transcript(ROLLING_VTT.splitlines(keepends=True))
+    assert transcript.text == "こんばんは。BR講師の星です。Hello world."
+
+    assert transcript.time_span(0, 6) == (3.919, 4.359)
+    start = transcript.text.index("講師")
+    assert transcript.time_span(start, start + 2) == (4.6, 6.749)
+    start = transcript.text.index("world")
+    assert transcript.time_span(start, len(transcript.text)) == (7.319, 9.03)
+
+
+if __name__ == "__main__":
+    test_iter_vtt_cues_strips_inline_tags()
+    test_load_transcript_removes_rolling_duplicates()
+    print("all tests passed")
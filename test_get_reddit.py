@@ -0,0 +1,235 @@
+"""scripts/get_reddit.py のレート制限・投稿ストア・コメント取得の単体テスト（ネットワークには出ない）。"""
+
+from __future__ import annotations
+
+import io
+import json
+import sys
+import time
+from email.utils import formatdate
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+
+import get_reddit  # noqa: E402
+from get_reddit import (  # noqa: E402
+    RedditPostStore,
+    RedditRateLimiter,
+    RedditRequestBudget,
+    _collect_comments,
+    _retry_after_seconds,
+)
+
+
+def _response(headers: dict[str, str], status_code: int = 200) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.headers.update(headers)
+    return resp
+
+
+def _elapsed_for_waits(limiter: RedditRateLimiter, count: int) -> float:
+    started = time.monotonic()
+    for _ in range(count):
+        limiter.wait()
+    return time.monotonic() - started
+
+
+def test_rate_limiter_paces_when_remaining_is_low() -> None:
+    limiter = RedditRateLimiter()
+    assert _elapsed_for_waits(limiter, 3) < 0.05
+
+    # 残り 5 回 / リセットまで 0.5 秒 → 0.1 秒間隔
+    limiter.update(_response({"x-ratelimit-remaining": "5", "x-ratelimit-reset": "0.5"}))
+    elapsed = _elapsed_for_waits(limiter, 4)
+    assert 0.25 <= elapsed < 1.0
+
+    # 残りが十分にあれば間隔を空けない
+    limiter.update(_response({"x-ratelimit-remaining": "500", "x-ratelimit-reset": "60"}))
+    assert _elapsed_for_waits(limiter, 3) < 0.15
+
+
+def test_rate_limiter_blocks_until_reset_when_exhausted() -> None:
+    limiter = RedditRateLimiter()
+    limiter.update(_response({"x-ratelimit-remaining": "0", "x-ratelimit-reset": "0.3"}))
+    assert 0.25 <= _elapsed_for_waits(limiter, 1) < 1.0
+
+
+def test_retry_after_seconds_and_block_for() -> None:
+    assert _retry_after_seconds(_response({"Retry-After": "2"}, 429)) == 2.0
+    assert _retry_after_seconds(_response({}, 429)) is None
+    assert _retry_after_seconds(_response({"Retry-After": "soon"}, 429)) is None
+    http_date = _retry_after_seconds(_response({"Retry-After": formatdate(time.time() + 30, usegmt=True)}, 429))
+    assert 25 <= http_date <= 31
+
+    limiter = RedditRateLimiter()
+    limiter.block_for(0.3)
+    # 短い方の block_for で待ち時間が縮まない
+    limiter.block_for(0.01)
+    assert 0.25 <= _elapsed_for_waits(limiter, 1) < 1.0
+
+
+def _post(post_id: str, score: int, num_comments: int = 0, created_utc: float = 0.0) -> dict:
+    return {
+        "id": post_id,
+        "title": f"post {post_id}",
+        "permalink": f"/r/test/comments/{post_id}/",
+        "subreddit": "test",
+        "score": score,
+        "num_comments": num_comments,
+        "created_utc": created_utc,
+    }
+
+
+def test_post_store_apply_splits_new_and_deltas() -> None:
+    store = RedditPostStore(":memory:")
+    try:
+        t0 = 1_800_000_000.0
+        new, deltas, unchanged = store.apply("tech", [_post("a", 10), _post("b", 5)], observed_at=t0)
+        assert [p["id"] for p in new] == ["a", "b"] and deltas == [] and unchanged == 0
+
+        new, deltas, unchanged = store.apply(
+            "tech", [_post("a", 25, num_comments=3), _post("b", 5), _post("c", 1)], observed_at=t0 + 3600
+        )
+        assert [p["id"] for p in new] == ["c"]
+        assert unchanged == 1
+        assert len(deltas) == 1
+        assert deltas[0]["id"] == "a"
+        assert (deltas[0]["score_delta"], deltas[0]["num_comments_delta"]) == (15, 3)
+        assert deltas[0]["since"].startswith("2027-01-15T08:00:00")
+    finally:
+        store.close()
+
+
+def test_post_store_top_by_velocity() -> None:
+    store = RedditPostStore(":memory:")
+    try:
+        now = 1_800_000_000.0
+        # a: 期間前からある投稿（2 時間で +100）、b: 1 時間前に作られた投稿（1 時間で 300）、c: 伸びていない
+        store.apply("tech", [_post("a", 50, created_utc=now - 86400), _post("c", 7, created_utc=now - 86400)],
+                    observed_at=now - 7200)
+        store.apply("news", [_post("b", 300, created_utc=now - 3600)], observed_at=now)
+        store.apply("tech", [_post("a", 150, created_utc=now - 86400), _post("c", 7, created_utc=now - 86400)],
+                    observed_at=now)
+
+        ranked = store.top_by_velocity(hours=6, limit=10, now=now)
+        assert [(p["id"], p["score_velocity"]) for p in ranked] == [("b", 300.0), ("a", 50.0), ("c", 0.0)]
+        assert [p["id"] for p in store.top_by_velocity(hours=6, limit=1, now=now)] == ["b"]
+        assert [p["id"] for p in store.top_by_velocity(hours=6, group_name="tech", now=now)] == ["a", "c"]
+        # 期間外の観測しか無い投稿は出さない
+        assert store.top_by_velocity(hours=6, now=now + 86400) == []
+    finally:
+        store.close()
+
+
+def _comment(body: str, replies: list | None = None, kind: str = "t1") -> dict:
+    data = {"author": "user", "score": 1, "body": body}
+    if replies is not None:
+        data["replies"] = {"kind": "Listing", "data": {"children": replies}}
+    return {"kind": kind, "data": data}
+
+
+COMMENT_TREE = [
+    {"kind": "t3", "data": {"title": "投稿本体"}},
+    _comment("a", [_comment("a.1", [_comment("a.1.1")]), _comment("a.2")]),
+    {"kind": "more", "data": {"children": ["x", "y"]}},
+    _comment("[deleted]"),
+    _comment("b", [{"kind": "more", "data": {"children": ["z"]}}]),
+]
+
+
+def test_collect_comments_depth_count_and_more() -> None:
+    flat = _collect_comments(COMMENT_TREE, max_depth=2, max_comments=10, token_budget=1000)
+    assert [(c["body"], c["depth"]) for c in flat] == [("a", 0), ("a.1", 1), ("a.1.1", 2), ("a.2", 1), ("b", 0)]
+
+    flat = _collect_comments(COMMENT_TREE, max_depth=0, max_comments=10, token_budget=1000)
+    assert [c["body"] for c in flat] == ["a", "b"]
+
+    flat = _collect_comments(COMMENT_TREE, max_depth=2, max_comments=3, token_budget=1000)
+    assert [c["body"] for c in flat] == ["a", "a.1", "a.1.1"]
+
+
+def test_collect_comments_token_budget_and_truncation() -> None:
+    # 見積もりは 1 文字のコメントで 1 token
+    flat = _collect_comments(COMMENT_TREE, max_depth=2, max_comments=10, token_budget=2)
+    assert [c["body"] for c in flat] == ["a"]
+
+    long_body = "x" * (get_reddit.COMMENT_MAX_BODY_CHARS + 100)
+    (comment,) = _collect_comments([_comment(long_body)], max_depth=0, max_comments=10, token_budget=10_000)
+    assert comment["body"] == "x" * get_reddit.COMMENT_MAX_BODY_CHARS + "…"
+
+
+class _RedditClient:
+    """top.json には投稿 2 件、コメントには最初の 1 回だけ 429 を返す HttpClient の代わり。"""
+
+    def __init__(self) -> None:
+        self.comment_requests: list[str] = []
+
+    def get(self, url: str, headers=None, timeout=None, stream=False) -> requests.Response:
+        if "/top.json" in url:
+            children = [
+                {"kind": "t3", "data": {"id": f"p{i}", "permalink": f"/r/test/comments/p{i}/", "score": 1}}
+                for i in range(2)
+            ]
+            return self._json({"data": {"children": children}})
+        self.comment_requests.append(url)
+        if len(self.comment_requests) == 1:
+            resp = _response({"Retry-After": "0"}, status_code=429)
+            resp.raw = io.BytesIO(b"")
+            return resp
+        return self._json([{"data": {"children": []}}, {"data": {"children": [_comment("nice")]}}])
+
+    @staticmethod
+    def _json(payload) -> requests.Response:
+        resp = _response({"Content-Type": "application/json"})
+        resp.raw = io.BytesIO(json.dumps(payload).encode("utf-8"))
+        return resp
+
+
+def _collect_with_comments(budget) -> tuple[dict, _RedditClient]:
+    client = _RedditClient()
+    original = get_reddit.get_default_client
+    get_reddit.get_default_client = lambda: client
+    try:
+        result = get_reddit.collect_reddit_raw_data(
+            groups={"test": ["test"]},
+            fetch_comments=True,
+            comment_request_budget=budget,
+            comment_workers=1,
+        )
+    finally:
+        get_reddit.get_default_client = original
+    return result, client
+
+
+def test_comment_budget_counts_retries() -> None:
+    # 1 件目は 429 の再試行で 2 回、2 件目で 1 回
+    result, client = _collect_with_comments(3)
+    assert [post.get("comments", [{}])[0].get("body") for post in result["test"]] == ["nice", "nice"]
+    assert result["num_comment_requests"] == len(client.comment_requests) == 3
+
+    # 再試行で予算を使い切ると 2 件目は取りに行かない
+    budget = RedditRequestBudget(2)
+    result, client = _collect_with_comments(budget)
+    assert "comments" in result["test"][0] and "comments" not in result["test"][1]
+    assert result["num_comment_requests"] == len(client.comment_requests) == 2
+    assert budget.remaining == 0
+
+    # 再試行の途中で使い切ったら、その投稿はあきらめる
+    result, client = _collect_with_comments(1)
+    assert all("comments" not in post for post in result["test"])
+    assert result["num_comment_requests"] == len(client.comment_requests) == 1
+
+
+if __name__ == "__main__":
+    test_rate_limiter_paces_when_remaining_is_low()
+    test_rate_limiter_blocks_until_reset_when_exhausted()
+    test_retry_after_seconds_and_block_for()
+    test_post_store_apply_splits_new_and_deltas()
+    test_post_store_top_by_velocity()
+    test_collect_comments_depth_count_and_more()
+    test_collect_comments_token_budget_and_truncation()
+    test_comment_budget_counts_retries()
+    print("all tests passed")
@@ -0,0 +1,363 @@
+"""scripts/get_rss.py のフィードのストリーミングパースの単体テスト（ネットワークには出ない）。"""
+
+from __future__ import annotations
+
+import io
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+
+import feedparser
+import requests
+from requests.utils import get_encoding_from_headers
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+
+import get_rss  # noqa: E402
+from get_rss import (  # noqa: E402
+    FEED_CUTOFF_LOOKAHEAD,
+    SeenEntryIndex,
+    _extract_article_text,
+    _fetch_feeds,
+    _next_feed_check,
+    _stream_parse_feed,
+    canonicalize_url,
+    collect_rss_sources,
+)
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+# 新しい順: 期間内 2 件、期間外 6 件
+AGES = [timedelta(hours=1), timedelta(hours=2)] + [timedelta(days=10 + i) for i in range(6)]
+# cutoff で止めたときに読んでいるエントリ（期間内 2 件と、最初の期間外のエントリ + 先読みの分）
+READ_UNTIL_CUTOFF = [f"post {i}" for i in range(3 + FEED_CUTOFF_LOOKAHEAD)]
+CUTOFF = (NOW - timedelta(days=2)).replace(tzinfo=None)
+
+
+def _response(body: bytes, url: str, content_type: str = "application/xml") -> requests.Response:
+    """body を少しずつ読ませる（iter_content が raw から読む）Response。"""
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.url = url
+    resp.headers["Content-Type"] = content_type
+    resp.raw = io.BytesIO(body)
+    return resp
+
+
+def _rss(ages=AGES) -> bytes:
+    items = "".join(
+        f"<item><title>post {i}</title><link>https://example.com/{i}</link>"
+        f"<pubDate>{format_datetime(NOW - age)}</pubDate></item>"
+        for i, age in enumerate(ages)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Example</title>{items}</channel></rss>'.encode()
+
+
+def _atom(ages=AGES) -> bytes:
+    entries = "".join(
+        f'<entry><title>post {i}</title><link href="/{i}"/><id>urn:{i}</id>'
+        f"<updated>{(NOW - age).isoformat()}</updated></entry>"
+        for i, age in enumerate(ages)
+    )
+    return (
+        f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>Example</title>{entries}</feed>'
+    ).encode()
+
+
+def test_stream_parse_feed_stops_at_cutoff() -> None:
+    for body in (_rss(), _atom()):
+        parsed = _stream_parse_feed(_response(body, "https://example.com/feed"), CUTOFF, None, chunk_size=64)
+        assert parsed.feed.title == "Example"
+        assert [e.title for e in parsed.entries] == READ_UNTIL_CUTOFF
+        assert parsed.entries[1].link == "https://example.com/1"
+        assert parsed.stopped_early
+
+
+def test_stream_parse_feed_stops_at_limit() -> None:
+    for body in (_rss(), _atom()):
+        parsed = _stream_parse_feed(_response(body, "https://example.com/feed"), CUTOFF, 1, chunk_size=64)
+        assert [e.title for e in parsed.entries] == ["post 0"]
+        assert parsed.stopped_early
+
+
+def test_stream_parse_feed_reads_all_when_not_sorted() -> None:
+    # 2 件目で新しい順でないと分かるので、期間外のエントリがあっても最後まで読む
+    ages = [AGES[1], AGES[0], AGES[3], AGES[2]]
+    for body in (_rss(ages), _atom(ages)):
+        parsed = _stream_parse_feed(_response(body, "https://example.com/feed"), CUTOFF, None, chunk_size=64)
+        assert len(parsed.entries) == 4
+        assert not parsed.stopped_early
+
+
+def test_stream_parse_feed_keeps_newer_entry_after_cutoff() -> None:
+    # 固定表示・更新された記事が期間外のエントリの後ろに 1 件だけ紛れている
+    ages = AGES[:3] + [timedelta(hours=3)] + AGES[3:]
+    for body in (_rss(ages), _atom(ages)):
+        parsed = _stream_parse_feed(_response(body, "https://example.com/feed"), CUTOFF, None, chunk_size=64)
+        assert len(parsed.entries) == len(ages)
+        assert parsed.entries[3].title == "post 3"
+        assert not parsed.stopped_early
+
+
+def test_stream_parse_feed_rejects_non_feed() -> None:
+    resp = _response(b"<html><body>not a feed</body></html>", "https://example.com/", "text/html")
+    assert _stream_parse_feed(resp, CUTOFF, None) is None
+
+
+class _SlowFeedClient:
+    """URL に "slow" を含むフィードだけ release されるまで返さない HttpClient の代わり。"""
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        if "slow" in url:
+            self.release.wait(10)
+        return _response(_rss(), url)
+
+
+def test_fetch_feeds_skips_feeds_past_deadline() -> None:
+    client = _SlowFeedClient()
+    urls = ["https://a.example.com/feed", "https://slow.example.com/feed", "https://b.example.com/feed"]
+    started = time.monotonic()
+    try:
+        fetched = _fetch_feeds(urls, client, max_workers=3, timeout=5, deadline_sec=0.5, cutoff=CUTOFF)
+    finally:
+        client.release.set()
+    assert time.monotonic() - started < 5
+    assert sorted(fetched) == [urls[0], urls[2]]
+    assert [e.title for e in fetched[urls[0]].entries] == READ_UNTIL_CUTOFF
+
+
+class _PageClient:
+    """決まった本文と Content-Type を返す HttpClient の代わり。"""
+
+    def __init__(self, body: bytes, content_type: str) -> None:
+        self.body = body
+        self.content_type = content_type
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        resp = _response(self.body, url, self.content_type)
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        return resp
+
+
+def test_extract_article_text_decodes_charset() -> None:
+    paragraph = "日本語の本文です。"
+    entry = feedparser.FeedParserDict()
+    cases = [
+        # Content-Type の charset
+        (f"<html><body><p>{paragraph}</p></body></html>".encode("shift_jis"), "text/html; charset=Shift_JIS"),
+        # ヘッダに charset が無ければ <meta charset>
+        (
+            f'<html><head><meta charset="euc-jp"></head><body><p>{paragraph}</p></body></html>'.encode("euc_jp"),
+            "text/html",
+        ),
+        # http-equiv の content 内の charset
+        (
+            f'<html><head><meta http-equiv="Content-Type" content="text/html; charset=Shift_JIS"></head>'
+            f"<body><p>{paragraph}</p></body></html>".encode("shift_jis"),
+            "text/html",
+        ),
+        # どちらも無ければ UTF-8
+        (f"<html><body><p>{paragraph}</p></body></html>".encode("utf-8"), "text/html"),
+    ]
+    for body, content_type in cases:
+        text = _extract_article_text(entry, "https://example.com/a", _PageClient(body, content_type))
+        assert text == paragraph, (content_type, text)
+
+
+def test_extract_article_text_skips_non_html() -> None:
+    entry = feedparser.FeedParserDict()
+    client = _PageClient(b"%PDF-1.7 ...", "application/pdf")
+    assert _extract_article_text(entry, "https://example.com/a.pdf", client) == ""
+
+
+def test_canonicalize_url() -> None:
+    assert canonicalize_url(" HTTPS://Example.COM/a/b/?utm_source=x&b=2&a=1&fbclid=y#top ") == (
+        "https://example.com/a/b?a=1&b=2"
+    )
+    assert canonicalize_url("https://example.com") == "https://example.com/"
+    assert canonicalize_url("https://example.com/?ref=rss") == canonicalize_url("https://example.com/")
+    # トラッキング以外のクエリと空の値は残す
+    assert canonicalize_url("https://example.com/p?id=3&q=") == "https://example.com/p?id=3&q="
+
+
+def test_seen_entry_index_record_keeps_text_until_content_changes() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SeenEntryIndex(Path(tmp) / "seen.sqlite")
+        url = "https://example.com/a"
+        index.record(url, entry_id="1", content_hash="h1", title="t1")
+        first_seen = index.get(url)["first_seen"]
+        index.record(url, entry_id="1", content_hash="h1", title="t1", text="本文")
+        # 本文を渡さない記録でも、内容が同じなら本文を残す
+        index.record(url, entry_id="1", content_hash="h1", title="t1 (renamed)")
+        assert index.cached_text(url, "h1") == "本文"
+        assert index.get(url)["title"] == "t1 (renamed)"
+        # 内容が変わったら古い本文は捨てる
+        index.record(url, entry_id="1", content_hash="h2", title="t2")
+        assert index.cached_text(url, "h2") is None
+        assert index.cached_text(url, "h1") is None
+        assert index.get(url)["first_seen"] == first_seen
+        index.close()
+
+
+def test_seen_entry_index_reported_and_new_since() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SeenEntryIndex(Path(tmp) / "seen.sqlite")
+        assert index.start_run() is None
+        index.record("https://example.com/a", entry_id="a", content_hash="h1")
+        index.record("https://example.com/b", entry_id="b", content_hash="h1")
+        assert [r["canonical_url"] for r in index.new_since(None)] == [
+            "https://example.com/a",
+            "https://example.com/b",
+        ]
+        first_seen = index.get("https://example.com/a")["first_seen"]
+        assert index.new_since(first_seen) == []
+        assert [r["entry_id"] for r in index.new_since("2000-01-01T00:00:00Z")] == ["a", "b"]
+
+        assert not index.is_reported("https://example.com/a", "h1")
+        index.mark_reported(["https://example.com/a"])
+        assert index.is_reported("https://example.com/a", "h1")
+        assert not index.is_reported("https://example.com/b", "h1")
+        # 内容が更新されたらレポート済みではなくなる
+        index.record("https://example.com/a", entry_id="a", content_hash="h2")
+        assert not index.is_reported("https://example.com/a", "h2")
+        index.close()
+
+
+class _FeedClient:
+    """どの URL にも同じフィードを返す HttpClient の代わり（取得した URL を記録する）。"""
+
+    def __init__(self) -> None:
+        self.requested: list[str] = []
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        self.requested.append(url)
+        return _response(_rss(), url)
+
+    def close(self) -> None:
+        pass
+
+
+def test_collect_rss_sources_closes_index_on_error() -> None:
+    closed: list[bool] = []
+
+    class _FailingIndex(SeenEntryIndex):
+        def record_feed_check(self, *args, **kwargs) -> None:
+            raise sqlite3.OperationalError("database is locked")
+
+        def close(self) -> None:
+            closed.append(True)
+            super().close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        feed_file = Path(tmp) / "feed.toml"
+        feed_file.write_text('tech = ["https://example.com/feed"]\n', encoding="utf-8")
+        original = get_rss.SeenEntryIndex
+        get_rss.SeenEntryIndex = _FailingIndex
+        try:
+            collect_rss_sources(feed_file, seen_index=Path(tmp) / "seen.sqlite", http_client=_FeedClient())
+        except sqlite3.OperationalError:
+            pass
+        else:
+            raise AssertionError("record_feed_check の例外が伝わっていません")
+        finally:
+            get_rss.SeenEntryIndex = original
+    assert closed == [True]
+
+
+def test_next_feed_check_table() -> None:
+    checked = datetime(2026, 10, 18, 12, 0, 0)
+    hour = timedelta(hours=1)
+    force = timedelta(hours=24)
+    cases = [
+        # (公開時刻の checked からの差, 推定間隔, 次に取得する時刻の checked からの差)
+        ([], None, timedelta(0)),
+        # 1 つだけなら経過時間が間隔。見込み（公開 + 間隔 = 今）を過ぎているので間隔の 1/4 後
+        ([-4 * hour], 4 * hour, hour),
+        # 2 時間おき、最新が 30 分前 → 次の見込みの 1.5 時間後
+        ([-4.5 * hour, -2.5 * hour, -0.5 * hour], 2 * hour, 1.5 * hour),
+        # 間隔は中央値（1 回だけの長い空白に引きずられない）
+        ([-12 * hour, -11 * hour, -10 * hour, -1 * hour], hour, 0.25 * hour),
+        # 週 1 回のフィードでも force_refresh までには取り直す
+        ([-14 * 24 * hour, -7 * 24 * hour, -24 * hour], 7 * 24 * hour, force),
+        # 同じ時刻しか無ければ毎回取得する
+        ([-hour, -hour], timedelta(0), timedelta(0)),
+    ]
+    for offsets, interval, next_offset in cases:
+        published = [checked + offset for offset in offsets]
+        assert _next_feed_check(published, checked, force) == (interval, checked + next_offset), offsets
+
+
+def test_record_feed_check_ignores_future_timestamps() -> None:
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SeenEntryIndex(Path(tmp) / "seen.sqlite")
+        index.record_feed_check("https://example.com/feed", [now - timedelta(hours=2), now + timedelta(days=5)])
+        (schedule,) = index.feed_schedule()
+        index.close()
+    assert schedule["last_published"] == (now - timedelta(hours=2)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    assert abs(schedule["interval_sec"] - 2 * 3600) <= 5
+
+
+def test_due_feeds_skips_feeds_not_due_yet() -> None:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    quiet, unknown, undated = (f"https://{name}.example.com/feed" for name in ("quiet", "unknown", "undated"))
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SeenEntryIndex(Path(tmp) / "seen.sqlite")
+        # 1 日おきに更新され、最新は 1 時間前 → 次は約 23 時間後
+        index.record_feed_check(quiet, [now - timedelta(hours=h) for h in (1, 25, 49)])
+        # 公開時刻の無いフィードは毎回取得する
+        index.record_feed_check(undated, [])
+        due, skipped = index.due_feeds([quiet, undated, unknown, quiet])
+        index.close()
+    assert due == [unknown, undated]
+    assert skipped == [quiet]
+
+
+def test_collect_rss_sources_skips_not_due_feeds_only_when_only_new() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        feed_file = Path(tmp) / "feed.toml"
+        feed_file.write_text('tech = ["https://example.com/feed"]\n', encoding="utf-8")
+        seen = Path(tmp) / "seen.sqlite"
+        client = _FeedClient()
+
+        def feed_requests() -> int:
+            return client.requested.count("https://example.com/feed")
+
+        collect_rss_sources(feed_file, seen_index=seen, only_new=True, http_client=client)
+        assert feed_requests() == 1
+
+        # 最新のエントリが 1 時間前なので次の見込みはまだ先
+        result = collect_rss_sources(feed_file, seen_index=seen, only_new=True, http_client=client)
+        assert result["num_feeds_skipped"] == 1
+        assert feed_requests() == 1
+
+        result = collect_rss_sources(feed_file, seen_index=seen, http_client=client)
+        assert result["num_feeds_skipped"] == 0
+        assert feed_requests() == 2
+
+
+if __name__ == "__main__":
+    test_stream_parse_feed_stops_at_cutoff()
+    test_stream_parse_feed_stops_at_limit()
+    test_stream_parse_feed_reads_all_when_not_sorted()
+    test_stream_parse_feed_keeps_newer_entry_after_cutoff()
+    test_stream_parse_feed_rejects_non_feed()
+    test_fetch_feeds_skips_feeds_past_deadline()
+    test_extract_article_text_decodes_charset()
+    test_extract_article_text_skips_non_html()
+    test_canonicalize_url()
+    test_seen_entry_index_record_keeps_text_until_content_changes()
+    test_seen_entry_index_reported_and_new_since()
+    test_collect_rss_sources_closes_index_on_error()
+    test_next_feed_check_table()
+    test_record_feed_check_ignores_future_timestamps()
+    test_due_feeds_skips_feeds_not_due_yet()
+    test_collect_rss_sources_skips_not_due_feeds_only_when_only_new()
+    print("all tests passed")
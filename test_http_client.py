@@ -0,0 +1,134 @@
+"""scripts/http_client.py のキャッシュと接続数制限の単体テスト（ローカルの http.server に対して動かす）。"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+
+from http_client import HttpClient  # noqa: E402
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 05 Oct 2026 00:00:00 GMT"
+BIG_BODY = b"x" * (256 * 1024)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # パスごとに (304 を返した回数を含む) リクエスト数を数える
+    counts: dict[str, int] = {}
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, headers: dict[str, str], body: bytes = b"") -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        _Handler.counts[self.path] = _Handler.counts.get(self.path, 0) + 1
+        if self.path == "/fresh":
+            self._send(200, {"Cache-Control": "max-age=60"}, b"fresh body")
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == ETAG:
+                self._send(304, {"ETag": ETAG, "Cache-Control": "max-age=0"})
+            else:
+                self._send(200, {"ETag": ETAG, "Cache-Control": "max-age=0"}, b"etag body")
+        elif self.path == "/last-modified":
+            if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                self._send(304, {"Last-Modified": LAST_MODIFIED})
+            else:
+                self._send(200, {"Last-Modified": LAST_MODIFIED}, b"last-modified body")
+        elif self.path == "/no-store":
+            self._send(200, {"Cache-Control": "no-store, max-age=60"}, b"secret")
+        elif self.path == "/big":
+            self._send(200, {"Cache-Control": "max-age=60"}, BIG_BODY)
+        else:
+            self._send(404, {})
+
+
+@contextmanager
+def _serve():
+    _Handler.counts = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fresh_response_is_served_from_cache() -> None:
+    with _serve() as base, tempfile.TemporaryDirectory() as cache_dir, HttpClient(cache_dir=cache_dir) as client:
+        first = client.get(f"{base}/fresh")
+        second = client.get(f"{base}/fresh")
+        assert (first.cache_status, second.cache_status) == ("miss", "hit")
+        assert second.content == b"fresh body"
+        assert _Handler.counts["/fresh"] == 1
+
+
+def test_stale_response_is_revalidated_with_etag_and_last_modified() -> None:
+    with _serve() as base, tempfile.TemporaryDirectory() as cache_dir, HttpClient(cache_dir=cache_dir) as client:
+        for path, body in (("/etag", b"etag body"), ("/last-modified", b"last-modified body")):
+            first = client.get(f"{base}{path}")
+            second = client.get(f"{base}{path}")
+            assert (first.cache_status, second.cache_status) == ("miss", "revalidated")
+            assert second.status_code == 200 and second.content == body
+            assert _Handler.counts[path] == 2
+
+
+def test_no_store_is_not_cached() -> None:
+    with _serve() as base, tempfile.TemporaryDirectory() as cache_dir, HttpClient(cache_dir=cache_dir) as client:
+        client.get(f"{base}/no-store")
+        assert client.get(f"{base}/no-store").cache_status == "miss"
+        assert _Handler.counts["/no-store"] == 2
+
+
+def test_partially_read_stream_is_not_stored() -> None:
+    with _serve() as base, tempfile.TemporaryDirectory() as cache_dir, HttpClient(cache_dir=cache_dir) as client:
+        with client.get(f"{base}/big", stream=True) as resp:
+            next(resp.iter_content(chunk_size=1024))
+        with client.get(f"{base}/big", stream=True) as resp:
+            assert resp.cache_status == "miss"
+
+        with client.get(f"{base}/big", stream=True) as resp:
+            assert b"".join(resp.iter_content(chunk_size=16 * 1024)) == BIG_BODY
+        cached = client.get(f"{base}/big")
+        assert cached.cache_status == "hit" and cached.content == BIG_BODY
+
+
+def test_stream_holds_host_slot_until_closed() -> None:
+    with _serve() as base, HttpClient(cache_dir=None, per_host_limit=1) as client:
+        slot = client._slot(f"{base}/big")
+
+        resp = client.get(f"{base}/big", stream=True)
+        assert not slot.acquire(blocking=False)
+        resp.close()
+        assert slot.acquire(blocking=False)
+        slot.release()
+
+        resp = client.get(f"{base}/big", stream=True)
+        assert not slot.acquire(blocking=False)
+        assert resp.content == BIG_BODY
+        assert slot.acquire(blocking=False)
+        slot.release()
+
+
+if __name__ == "__main__":
+    test_fresh_response_is_served_from_cache()
+    test_stale_response_is_revalidated_with_etag_and_last_modified()
+    test_no_store_is_not_cached()
+    test_partially_read_stream_is_not_stored()
+    test_stream_holds_host_slot_until_closed()
+    print("all tests passed")
@@ -0,0 +1,92 @@
+"""scripts/near_duplicates.py の MinHash / LSH とクラスタリングの単体テスト。"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+
+from near_duplicates import (  # noqa: E402
+    MinHasher,
+    NearDuplicateIndex,
+    StoryItem,
+    cluster_items,
+    items_from_reddit,
+    similarity,
+)
+
+SAME_STORY_A = StoryItem(
+    key="https://example.com/a",
+    source="rss:example",
+    title="OpenAI が新しい推論モデルを発表、数学とコードのベンチマークで大幅に性能向上",
+    text="OpenAI は新しい推論モデルを発表した。数学とコーディングのベンチマークで従来モデルを大きく上回る。",
+)
+SAME_STORY_B = StoryItem(
+    key="https://www.reddit.com/r/technology/comments/abc/",
+    source="reddit:r/technology",
+    title="OpenAI が新しい推論モデルを発表、数学とコードのベンチマークで大幅に性能向上！",
+    text="OpenAI は新しい推論モデルを発表した。数学とコーディングのベンチマークで従来モデルを大きく上回る。",
+)
+OTHER_STORY = StoryItem(
+    key="https://example.com/c",
+    source="rss:other",
+    title="Rust 2026 エディションの安定化スケジュールが公開",
+    text="Rust チームは次のエディションの安定化までの予定と主な言語変更の一覧を公開した。",
+)
+
+
+def test_minhash_similarity_separates_near_duplicates() -> None:
+    hasher = MinHasher()
+    sigs = hasher.signatures(item.fingerprint_text for item in (SAME_STORY_A, SAME_STORY_B, OTHER_STORY))
+    sims = similarity(sigs[0], sigs[1:])
+    assert sims[0] >= 0.7
+    assert sims[1] <= 0.2
+    # 同じ seed なら同じシグネチャ
+    assert (MinHasher().signature(SAME_STORY_A.fingerprint_text) == sigs[0]).all()
+
+
+def test_cluster_items_groups_near_duplicate_pair() -> None:
+    clusters = cluster_items([SAME_STORY_A, OTHER_STORY, SAME_STORY_B])
+    assert [[m.key for m in c.members] for c in clusters] == [
+        [SAME_STORY_A.key, SAME_STORY_B.key],
+        [OTHER_STORY.key],
+    ]
+    assert clusters[0].sources == ["reddit:r/technology", "rss:example"]
+
+
+def test_near_duplicate_index_reports_previously_seen() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "stories.sqlite"
+        index = NearDuplicateIndex(path)
+        cluster_items([SAME_STORY_A], index)
+        index.close()
+
+        index = NearDuplicateIndex(path)
+        clusters = cluster_items([SAME_STORY_B, OTHER_STORY], index, update_index=False)
+        index.close()
+    assert [key for key, _ in clusters[0].previously_seen] == [SAME_STORY_A.key]
+    assert clusters[1].previously_seen == []
+
+
+def test_items_from_reddit_reads_all_groups_and_skips_deltas() -> None:
+    post = {"permalink": "/r/rust/comments/xyz/", "subreddit": "rust", "title": "Rust 2026", "url": "https://x"}
+    result = {
+        "programming": [post],
+        "ai": {"new": [{**post, "permalink": "/r/ml/comments/q/", "subreddit": "ml"}]},
+        "deltas": {"programming": [{"id": "old", "score": 10, "score_delta": 3}]},
+        "num_unchanged": {"programming": 2},
+        "fetched_at": "2026-10-18T00:00:00+00:00",
+    }
+    items = items_from_reddit(result)
+    assert [item.source for item in items] == ["reddit:r/rust", "reddit:r/ml"]
+    assert items[0].key == "https://www.reddit.com/r/rust/comments/xyz/"
+
+
+if __name__ == "__main__":
+    test_minhash_similarity_separates_near_duplicates()
+    test_cluster_items_groups_near_duplicate_pair()
+    test_near_duplicate_index_reports_previously_seen()
+    test_items_from_reddit_reads_all_groups_and_skips_deltas()
+    print("all tests passed")